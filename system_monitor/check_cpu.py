@@ -3,6 +3,7 @@
 Script để kiểm tra và giám sát tình trạng CPU.
 """
 
+import heapq
 import psutil
 import time
 import datetime
@@ -11,6 +12,11 @@ import os
 import sys
 import logging
 
+from log_sink import SinkHandler
+from proc_snapshot import get_snapshot
+from sample_store import open_history, format_stats
+from scheduler import FixedRateScheduler
+
 # Cấu hình logging cơ bản ra console cho các lỗi trong quá trình thiết lập
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
@@ -34,6 +40,120 @@ def get_cpu_usage(interval=1.0, per_cpu=False):
     # chính xác hơn trong khoảng thời gian đó.
     return psutil.cpu_percent(interval=interval, percpu=per_cpu)
 
+class CpuTimesSampler:
+    """
+    Lấy mẫu mức sử dụng CPU không chặn, dựa trên chênh lệch psutil.cpu_times(percpu=True)
+    giữa hai lần gọi liên tiếp.
+
+    Mỗi lần sample() chỉ đọc cpu_times một lần và trả về mức sử dụng trung bình thực sự
+    trong toàn bộ khoảng thời gian kể từ lần gọi trước (thay vì một ảnh chụp 0.1s),
+    kèm phân rã user/system/iowait/steal/irq cho từng lõi.
+    """
+
+    # irq bao gồm cả softirq; các trường không có trên nền tảng hiện tại được tính là 0
+    BREAKDOWN_FIELDS = ("user", "system", "iowait", "steal", "irq")
+
+    def __init__(self):
+        self._last = psutil.cpu_times(percpu=True)
+        self._last_time = time.monotonic()
+
+    @staticmethod
+    def _core_usage(previous, current):
+        """Tính % sử dụng và phân rã cho một lõi từ hai mẫu cpu_times."""
+        deltas = {field: max(0.0, getattr(current, field) - getattr(previous, field)) for field in current._fields}
+        # Trên Linux thời gian guest đã được tính trong user/nice
+        total = sum(deltas.values()) - deltas.get("guest", 0.0) - deltas.get("guest_nice", 0.0)
+        usage = {field: 0.0 for field in CpuTimesSampler.BREAKDOWN_FIELDS}
+        if total <= 0:
+            return 0.0, usage, 0.0
+        idle = deltas.get("idle", 0.0) + deltas.get("iowait", 0.0)
+        for field in CpuTimesSampler.BREAKDOWN_FIELDS:
+            value = deltas.get(field, 0.0)
+            if field == "irq":
+                value += deltas.get("softirq", 0.0)
+            usage[field] = value / total * 100
+        return max(0.0, (total - idle) / total * 100), usage, total
+
+    def sample(self, min_interval=0.1):
+        """
+        Lấy mẫu so với lần gọi trước.
+
+        Args:
+            min_interval (float): Nếu lần gọi trước cách chưa đến min_interval giây (ví dụ
+                                  ngay sau khi khởi tạo), ngủ phần còn thiếu để mẫu có ý nghĩa.
+
+        Returns:
+            dict: {"percent": tổng %, "per_cpu": list % từng lõi,
+                   "times": phân rã % tổng, "per_cpu_times": list phân rã % từng lõi}
+        """
+        elapsed = time.monotonic() - self._last_time
+        if elapsed < min_interval:
+            time.sleep(min_interval - elapsed)
+        current = psutil.cpu_times(percpu=True)
+        previous, self._last = self._last, current
+        self._last_time = time.monotonic()
+
+        per_cpu = []
+        per_cpu_times = []
+        busy_total = 0.0
+        time_total = 0.0
+        times_total = {field: 0.0 for field in self.BREAKDOWN_FIELDS}
+        # Số lõi thay đổi (CPU hotplug): zip chỉ so sánh các lõi có ở cả hai mẫu
+        for prev_core, cur_core in zip(previous, current):
+            percent, usage, core_total = self._core_usage(prev_core, cur_core)
+            per_cpu.append(percent)
+            per_cpu_times.append(usage)
+            # Tổng thể được tính có trọng số theo thời gian của từng lõi
+            busy_total += percent * core_total
+            time_total += core_total
+            for field in self.BREAKDOWN_FIELDS:
+                times_total[field] += usage[field] * core_total
+
+        if time_total > 0:
+            percent_total = busy_total / time_total
+            times_total = {field: value / time_total for field, value in times_total.items()}
+        else:
+            percent_total = 0.0
+        return {"percent": percent_total, "per_cpu": per_cpu, "times": times_total, "per_cpu_times": per_cpu_times}
+
+class ProcessCpuSampler:
+    """
+    Top process theo CPU giữa hai lần gọi sample(), tính từ ảnh chụp process dùng chung
+    (proc_snapshot): mỗi lần chỉ một lượt quét /proc, tên process lấy từ cache của ảnh chụp.
+    """
+
+    def __init__(self):
+        self._previous = None # (thời điểm, {(pid, start_time): giây CPU})
+
+    def sample(self, num_processes=5):
+        """
+        Returns:
+            list: Dict (pid, name, cpu_percent) của num_processes process dùng nhiều CPU nhất kể
+                  từ lần gọi trước (% của một lõi, giống top). Lần gọi đầu tiên trả về danh sách rỗng.
+        """
+        snapshot = get_snapshot()
+        snapshot.refresh(force=True)
+        now = time.monotonic()
+        current = {(info.pid, info.start_time): info.cpu_user + info.cpu_system for info in snapshot.processes()}
+        previous, self._previous = self._previous, (now, current)
+        if previous is None or now <= previous[0]:
+            return []
+        elapsed = now - previous[0]
+        last_times = previous[1]
+        # Process mới xuất hiện được tính từ 0 (đã chạy trọn trong chu kỳ này)
+        busiest = heapq.nlargest(num_processes, ((cpu - last_times.get(key, 0.0), key) for key, cpu in current.items()))
+        return [{"pid": pid, "name": snapshot.name(pid, default="?"), "cpu_percent": used * 100 / elapsed}
+                for used, (pid, _) in busiest if used > 0]
+
+
+def format_top_processes(processes):
+    return ", ".join(f"{proc['name']} (PID {proc['pid']}) {proc['cpu_percent']:.1f}%" for proc in processes)
+
+
+def format_cpu_times(times):
+    """Định dạng phân rã thời gian CPU thành chuỗi ngắn gọn."""
+    return ", ".join(f"{field} {times[field]:.1f}%" for field in CpuTimesSampler.BREAKDOWN_FIELDS)
+
 def get_cpu_info():
     """
     Lấy thông tin chi tiết của CPU.
@@ -80,14 +200,19 @@ def setup_logger(log_file):
             logging.error(f"Không thể tạo thư mục log {log_dir}: {e}")
             return None # Không thể tiếp tục ghi log vào file
 
-    file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8') # Thêm encoding='utf-8'
+    # Ghi qua thread nền (AsyncLogSink) để vòng giám sát không phải chờ đĩa
+    try:
+        file_handler = SinkHandler(log_file, encoding='utf-8')
+    except OSError as e:
+        logging.error(f"Không thể mở file log {log_file}: {e}")
+        return None
     file_formatter = logging.Formatter('%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
     file_handler.setFormatter(file_formatter)
 
     logger = logging.getLogger('CPUMonitor')
     logger.setLevel(logging.INFO)
     # Tránh thêm handler nhiều lần nếu hàm được gọi lại (mặc dù không mong đợi ở đây)
-    if not any(isinstance(h, logging.FileHandler) and h.baseFilename == file_handler.baseFilename for h in logger.handlers):
+    if not any(isinstance(h, SinkHandler) and h.baseFilename == file_handler.baseFilename for h in logger.handlers):
         logger.addHandler(file_handler)
         # Ngăn không cho lan truyền log lên logger gốc (ghi ra console)
         logger.propagate = False
@@ -96,7 +221,7 @@ def setup_logger(log_file):
     return logger
 
 
-def monitor_cpu(duration=60, interval=5, threshold=80, log_file=None, per_cpu=False):
+def monitor_cpu(duration=60, interval=5, threshold=80, log_file=None, per_cpu=False, jitter=0.0, breakdown=False, history_dir=None, sample_log=None, top_procs=0):
     """
     Giám sát việc sử dụng CPU trong một khoảng thời gian xác định.
 
@@ -106,6 +231,11 @@ def monitor_cpu(duration=60, interval=5, threshold=80, log_file=None, per_cpu=Fa
         threshold (int): Ngưỡng cảnh báo sử dụng CPU (%).
         log_file (str, optional): Đường dẫn đến file log. Mặc định là None (không ghi log file).
         per_cpu (bool): Có giám sát và ghi log cho từng lõi CPU hay không.
+        jitter (float): Độ lệch pha ngẫu nhiên tối đa (giây) của lần lấy mẫu đầu tiên.
+        breakdown (bool): Có hiển thị phân rã user/system/iowait/steal/irq hay không.
+        history_dir (str, optional): Thư mục lưu lịch sử mẫu (mmap) để giữ lại giữa các lần chạy.
+        sample_log (str, optional): File log mẫu nhị phân (xem sample_log.py) để ghi thêm mọi mẫu.
+        top_procs (int): Số process dùng nhiều CPU nhất trong chu kỳ được in khi có cảnh báo (0 = tắt).
     """
     if interval <= 0:
         print("Lỗi: Khoảng thời gian giám sát phải lớn hơn 0.", file=sys.stderr)
@@ -114,7 +244,8 @@ def monitor_cpu(duration=60, interval=5, threshold=80, log_file=None, per_cpu=Fa
         print("Lỗi: Thời gian giám sát phải lớn hơn 0.", file=sys.stderr)
         sys.exit(1)
 
-    end_time = time.time() + duration
+    scheduler = FixedRateScheduler(interval, duration, jitter=jitter)
+    history = open_history(history_dir, duration, interval, sample_log)
     alerts = 0
 
     # Thiết lập file logger nếu được chỉ định
@@ -134,11 +265,21 @@ def monitor_cpu(duration=60, interval=5, threshold=80, log_file=None, per_cpu=Fa
         file_logger.info(f"--- Giám sát CPU bắt đầu (Ngưỡng: {threshold}%) ---")
 
     try:
-        while time.time() < end_time:
-            # Sử dụng interval=0.1 (hoặc giá trị nhỏ tương tự) cho psutil để lấy ảnh chụp nhanh.
-            # Việc điều chỉnh tốc độ chính được xử lý bởi time.sleep().
-            # Sử dụng interval=interval trong psutil sẽ làm vòng lặp mất khoảng interval*2 giây.
-            current_usage = get_cpu_usage(interval=0.1, per_cpu=per_cpu) # Interval ngắn để lấy snapshot
+        # Mỗi tick chỉ đọc cpu_times một lần và so với tick trước: không chặn vòng lặp,
+        # và giá trị là trung bình thực sự của cả chu kỳ thay vì ảnh chụp 0.1s.
+        sampler = CpuTimesSampler()
+        proc_sampler = ProcessCpuSampler() if top_procs > 0 else None
+        if proc_sampler:
+            proc_sampler.sample(top_procs)
+        for tick in scheduler:
+            if tick.missed:
+                print(f"Cảnh báo: Bỏ lỡ {tick.missed} lần kiểm tra do vòng lặp chạy chậm hơn chu kỳ.", file=sys.stderr)
+            sample = sampler.sample()
+            current_usage = sample["per_cpu"] if per_cpu else sample["percent"]
+            history.record("cpu", sample["percent"])
+            if per_cpu:
+                for i, percent in enumerate(sample["per_cpu"]):
+                    history.record(f"cpu.core{i}", percent)
             timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             log_messages = []
@@ -149,8 +290,7 @@ def monitor_cpu(duration=60, interval=5, threshold=80, log_file=None, per_cpu=Fa
                 # Đảm bảo current_usage là list khi per_cpu=True
                 if not isinstance(current_usage, list):
                      print(f"Lỗi: Không nhận được danh sách sử dụng từng core.", file=sys.stderr)
-                     # Có thể thử lại hoặc bỏ qua lần này
-                     time.sleep(interval)
+                     # Bỏ qua lần này, thử lại ở tick tiếp theo
                      continue
 
                 for i, percent in enumerate(current_usage):
@@ -158,15 +298,18 @@ def monitor_cpu(duration=60, interval=5, threshold=80, log_file=None, per_cpu=Fa
                     if percent >= threshold:
                         core_status = "CẢNH BÁO" # "ALERT"
                         core_alerts += 1
-                    usage_str_parts.append(f"Lõi {i}: {percent:.1f}% ({core_status})")
+                    core_str = f"Lõi {i}: {percent:.1f}% ({core_status})"
+                    if breakdown and i < len(sample["per_cpu_times"]):
+                        core_str += f" [{format_cpu_times(sample['per_cpu_times'][i])}]"
+                    usage_str_parts.append(core_str)
 
                 overall_status = "CẢNH BÁO" if core_alerts > 0 else "Bình thường" # "ALERT" if core_alerts > 0 else "OK"
                 usage_str = ", ".join(usage_str_parts)
-                message = f"[{timestamp}] Sử dụng từng lõi: {usage_str} - Tổng thể: {overall_status}"
+                content = f"Sử dụng từng lõi: {usage_str} - Tổng thể: {overall_status}"
                 if core_alerts > 0:
                     alerts += 1 # Đếm khoảng thời gian này là có cảnh báo nếu bất kỳ lõi nào cao
-                log_messages.append(message)
-                print(message) # In trạng thái chi tiết từng lõi
+                log_messages.append(content)
+                print(f"[{timestamp}] {content}") # In trạng thái chi tiết từng lõi
 
             else: # Tổng mức sử dụng CPU
                 total_percent = current_usage
@@ -175,40 +318,36 @@ def monitor_cpu(duration=60, interval=5, threshold=80, log_file=None, per_cpu=Fa
                     status = "CẢNH BÁO" # "ALERT"
                     alerts += 1
 
-                message = f"[{timestamp}] Tổng sử dụng CPU: {total_percent:.1f}% - Trạng thái: {status}"
-                log_messages.append(message)
-                print(message)
+                content = f"Tổng sử dụng CPU: {total_percent:.1f}% - Trạng thái: {status}"
+                if breakdown:
+                    content += f" [{format_cpu_times(sample['times'])}]"
+                log_messages.append(content)
+                print(f"[{timestamp}] {content}")
+
+            # Top process của cả chu kỳ: lấy mẫu mỗi tick để chênh lệch luôn so với tick trước
+            if proc_sampler:
+                top = proc_sampler.sample(top_procs)
+                is_alert = (core_alerts > 0) if per_cpu else (current_usage >= threshold)
+                if is_alert and top:
+                    content = f"  -> Top process theo CPU: {format_top_processes(top)}"
+                    log_messages.append(content)
+                    print(content)
 
             # Ghi thông điệp log vào file nếu logger đang hoạt động
+            # (log_messages không kèm timestamp vì logger tự thêm timestamp của nó)
             if file_logger:
-                for msg in log_messages:
-                   # Xóa tiền tố timestamp [YYYY-MM-DD HH:MM:SS] khỏi msg vì logger tự thêm timestamp của nó
-                   log_msg_content = msg.split("] ", 1)[1]
-                   file_logger.info(log_msg_content)
-
-            # Tính toán thời gian ngủ chính xác
-            current_loop_time = time.time()
-            time_spent = current_loop_time % interval
-            sleep_time = interval - time_spent
-
-            # Đảm bảo thời gian ngủ không âm hoặc quá nhỏ
-            sleep_time = max(0.1, sleep_time)
-
-            # Kiểm tra xem thời gian còn lại có ít hơn thời gian ngủ không
-            remaining_time = end_time - current_loop_time
-            if remaining_time <= 0:
-                 break # Đã hết giờ
-                 
-            # Ngủ cho đến lần kiểm tra tiếp theo, nhưng không vượt quá thời gian còn lại
-            actual_sleep = min(sleep_time, remaining_time)
-            time.sleep(actual_sleep)
-
+                for content in log_messages:
+                   file_logger.info(content)
 
     except KeyboardInterrupt:
         print("\nGiám sát bị người dùng ngắt.")
     finally:
         summary = f"\nKết thúc giám sát CPU. Tổng số lần kiểm tra có cảnh báo: {alerts}"
         print(summary)
+        print(f"Lập lịch: {scheduler.summary()}")
+        for name in history.names():
+            print(f"  {name}: {format_stats(history.stats(name), lambda v: f'{v:.1f}%')}")
+        history.close()
         if file_logger:
             file_logger.info(f"--- Giám sát CPU kết thúc ---")
             file_logger.info(f"Tổng số lần kiểm tra có cảnh báo: {alerts}")
@@ -217,6 +356,8 @@ def monitor_cpu(duration=60, interval=5, threshold=80, log_file=None, per_cpu=Fa
             for handler in list(file_logger.handlers): # Dùng list copy để tránh thay đổi dict đang duyệt
                 handler.close()
                 file_logger.removeHandler(handler)
+                if isinstance(handler, SinkHandler) and handler.sink.dropped:
+                    print(f"Cảnh báo: {handler.sink.dropped} bản ghi log bị bỏ do ghi file không kịp.", file=sys.stderr)
 
 
 def display_cpu_info(show_per_cpu=False):
@@ -238,39 +379,35 @@ def display_cpu_info(show_per_cpu=False):
          print("Thông tin tần số không có sẵn.")
 
     print("\n=== Mức sử dụng CPU hiện tại ===")
-    # Sử dụng interval nhỏ để lấy snapshot nhanh
+    # Một lần ngủ ngắn giữa hai lần đọc cpu_times là đủ cho cả tổng và từng lõi
     usage_interval = 0.2
 
-    if show_per_cpu:
-        print("  Đang lấy mức sử dụng từng lõi...")
-        try:
-             # Lần gọi đầu có thể trả về 0.0, gọi lại sau một chút
-             get_cpu_usage(interval=0.1, per_cpu=True) # Lần gọi khởi tạo
-             time.sleep(usage_interval)
-             cpu_percents = get_cpu_usage(interval=None, per_cpu=True) # Lấy mức sử dụng từ lần gọi trước
-             if isinstance(cpu_percents, list):
-                 for i, percent in enumerate(cpu_percents):
-                     print(f"  Lõi {i}: {percent:.1f}%")
-             else: # Phương án dự phòng nếu per_cpu vì lý do nào đó thất bại
-                 print(f"  Tổng thể: {cpu_percents:.1f}%")
-                 print("  (Không thể lấy mức sử dụng từng lõi)")
-        except Exception as e:
-            print(f"  Lỗi khi lấy mức sử dụng CPU từng lõi: {e}")
-
-    print("  Đang lấy tổng mức sử dụng CPU...")
     try:
-        # Lấy tổng mức sử dụng
-        get_cpu_usage(interval=0.1, per_cpu=False) # Lần gọi khởi tạo
+        sampler = CpuTimesSampler()
+        proc_sampler = ProcessCpuSampler()
+        proc_sampler.sample()
         time.sleep(usage_interval)
-        total_percent = get_cpu_usage(interval=None, per_cpu=False) # Lấy mức sử dụng từ lần gọi trước
-        print(f"Tổng sử dụng CPU: {total_percent:.1f}%")
-
-        # Kiểm tra ngưỡng đơn giản để hiển thị ngay lập tức
-        if total_percent >= 80:
-            print("CẢNH BÁO: Mức sử dụng CPU cao!")
+        sample = sampler.sample()
+        top = proc_sampler.sample()
     except Exception as e:
-        print(f"  Lỗi khi lấy tổng mức sử dụng CPU: {e}")
+        print(f"  Lỗi khi lấy mức sử dụng CPU: {e}")
+        return
+
+    if show_per_cpu:
+        for i, percent in enumerate(sample["per_cpu"]):
+            print(f"  Lõi {i}: {percent:.1f}% [{format_cpu_times(sample['per_cpu_times'][i])}]")
+
+    total_percent = sample["percent"]
+    print(f"Tổng sử dụng CPU: {total_percent:.1f}%")
+    print(f"Phân rã: {format_cpu_times(sample['times'])}")
+    if top:
+        print("\n=== Process dùng nhiều CPU nhất ===")
+        for i, proc in enumerate(top):
+            print(f"  {i + 1}. {proc['name']} (PID: {proc['pid']}) - {proc['cpu_percent']:.1f}%")
 
+    # Kiểm tra ngưỡng đơn giản để hiển thị ngay lập tức
+    if total_percent >= 80:
+        print("CẢNH BÁO: Mức sử dụng CPU cao!")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -293,6 +430,16 @@ def main():
                         help="Đường dẫn đến file log để ghi kết quả giám sát. Dùng với -m.")
     parser.add_argument("-p", "--per-cpu", action="store_true",
                         help="Hiển thị/Giám sát mức sử dụng cho từng lõi CPU riêng biệt.")
+    parser.add_argument("-b", "--breakdown", action="store_true",
+                        help="Hiển thị phân rã user/system/iowait/steal/irq khi giám sát. Dùng với -m.")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="Độ lệch pha ngẫu nhiên tối đa (giây) của lần kiểm tra đầu tiên, tránh nhiều máy lấy mẫu cùng lúc. Dùng với -m.")
+    parser.add_argument("--history-dir", metavar="DIR",
+                        help="Thư mục lưu lịch sử mẫu dạng bộ đệm vòng (mmap), giữ lại giữa các lần chạy. Dùng với -m.")
+    parser.add_argument("--sample-log", metavar="FILE",
+                        help="Ghi mọi mẫu vào log nhị phân nén theo block (đọc lại bằng sample_log.py). Dùng với -m.")
+    parser.add_argument("--top-procs", type=int, default=0, metavar="N",
+                        help="Khi có cảnh báo, in N process dùng nhiều CPU nhất trong chu kỳ (0 = tắt). Dùng với -m.")
 
     args = parser.parse_args()
 
@@ -318,7 +465,12 @@ def main():
             interval=args.interval,
             threshold=args.threshold,
             log_file=args.log,
-            per_cpu=args.per_cpu
+            per_cpu=args.per_cpu,
+            jitter=args.jitter,
+            breakdown=args.breakdown,
+            history_dir=args.history_dir,
+            sample_log=args.sample_log,
+            top_procs=args.top_procs
         )
 
 if __name__ == "__main__":
@@ -10,8 +10,24 @@ import datetime
 import argparse
 import sys
 import logging
+import functools
+import errno
+import select
+import stat
+import threading
+import queue
+import heapq
+import sqlite3
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from tabulate import tabulate
 
+import inotify
+from counter_table import CounterTable, HAVE_NUMPY, np
+from log_sink import SinkHandler
+from sample_store import open_history, format_stats
+from scheduler import FixedRateScheduler
+
 # --- Constants ---
 DEFAULT_THRESHOLD_PERCENT = 80
 DEFAULT_MONITOR_INTERVAL_SEC = 5
@@ -19,6 +35,29 @@ DEFAULT_MONITOR_DURATION_SEC = 60
 DEFAULT_LARGE_FILES_COUNT = 10
 DEFAULT_LARGE_FILES_MIN_SIZE_MB = 10
 BYTES_PER_MB = 1024 * 1024
+# Quét thư mục chủ yếu chờ I/O (đặc biệt trên NFS) nên dùng nhiều thread hơn số lõi
+DEFAULT_SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+DEFAULT_WATCH_RESCAN_SEC = 60 # Chu kỳ quét lại thư mục không đặt được inotify watch
+# Bộ đếm I/O chi tiết (Documentation/admin-guide/iostats.rst)
+DISKSTATS_PATH = "/proc/diskstats"
+SYS_BLOCK_DIR = "/sys/block"
+SECTOR_SIZE = 512 # diskstats luôn tính theo sector 512 byte
+DEFAULT_HOT_DEVICES = 3
+IO_ACTIVE_MIN_BPS = 1 # Ngưỡng coi là có hoạt động I/O đáng kể
+IO_ACTIVE_MIN_IOPS = 0.1
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+DEFAULT_USAGE_TIMEOUT = 2.0 # giây chờ tối đa cho disk_usage của mỗi mountpoint
+USAGE_BACKOFF_MAX = 300 # giây giữa hai lần cảnh báo tối đa với mount bị treo
+USAGE_WORKERS = 4 # thread dùng lại cho statvfs của mount mạng/FUSE
+# Chỉ các loại này (và mọi fuse.*) mới có thể treo statvfs vô hạn; hệ thống file cục bộ được gọi trực tiếp
+REMOTE_FSTYPES = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ceph', 'glusterfs', '9p', 'afs', 'davfs', 'lustre', 'gpfs', 'beegfs'}
+DEFAULT_IGNORE_FSTYPES = ['tmpfs', 'devtmpfs', 'squashfs', 'iso9660', 'udf'] # Các loại thường muốn bỏ qua
+DEFAULT_FORECAST_WINDOW = 600 # giây mẫu dùng cho hồi quy dự báo đầy
+DEFAULT_FORECAST_HORIZON = 3600 # cảnh báo nếu dự báo đầy trong khoảng này (giây)
+FORECAST_MIN_SAMPLES = 3
+DiskStats = namedtuple("DiskStats", ["reads", "reads_merged", "sectors_read", "read_ms",
+                                     "writes", "writes_merged", "sectors_written", "write_ms",
+                                     "in_flight", "io_ms", "weighted_io_ms"])
 
 # --- Logging Setup ---
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
@@ -53,7 +92,8 @@ def setup_file_logging(log_file):
         log_dir = os.path.dirname(log_file)
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir)
-        file_handler = logging.FileHandler(log_file, mode='a')
+        # Ghi qua thread nền để bảng giám sát và cảnh báo không phải chờ đĩa
+        file_handler = SinkHandler(log_file)
         file_handler.setFormatter(log_formatter)
         logger.addHandler(file_handler)
         logger.info(f"--- Bắt đầu phiên làm việc mới ---")
@@ -63,42 +103,276 @@ def setup_file_logging(log_file):
 
 # --- Core Functions ---
 
-def get_disk_info(ignore_fstypes=None, include_devices=None):
+class MountTable:
+    """
+    Bảng phân vùng đã lọc theo fstype/device, chỉ đọc lại khi danh sách mount thay đổi.
+
+    Kernel báo POLLPRI|POLLERR trên /proc/self/mountinfo mỗi khi có mount/umount trong
+    namespace hiện tại, nên mỗi lần gọi chỉ tốn một poll(0) thay vì psutil.disk_partitions
+    và lọc lại toàn bộ. Nếu không poll được (không phải Linux) thì đọc lại mỗi lần như cũ.
+    """
+
+    def __init__(self, ignore_fstypes=None, include_devices=None):
+        if ignore_fstypes is None:
+            ignore_fstypes = DEFAULT_IGNORE_FSTYPES
+        # Bộ lọc tính sẵn một lần: tra set và str.startswith(tuple) thay cho vòng lặp lồng nhau
+        self.ignore_fstypes = frozenset(fstype.lower() for fstype in ignore_fstypes)
+        self.include_prefixes = tuple(include_devices) if include_devices else None
+        self.refreshes = 0
+        self._partitions = None
+        self._mountinfo = None
+        self._poller = None
+        try:
+            self._mountinfo = open(MOUNTINFO_PATH, "rb")
+            self._poller = select.poll()
+            self._poller.register(self._mountinfo, select.POLLPRI | select.POLLERR)
+        except (OSError, AttributeError): # Không có mountinfo hoặc select.poll
+            self.close()
+
+    def _changed(self):
+        if self._partitions is None or self._poller is None:
+            return True
+        return bool(self._poller.poll(0)) # Trạng thái báo được xóa ngay trong lần poll này
+
+    def _refresh(self):
+        partitions = []
+        for partition in psutil.disk_partitions(all=False): # all=False thường bỏ qua các disk ảo/cdrom
+            if partition.fstype.lower() in self.ignore_fstypes:
+                logger.debug(f"Bỏ qua phân vùng {partition.device} (mountpoint: {partition.mountpoint}) do fstype: {partition.fstype}")
+                continue
+            if self.include_prefixes and not partition.device.startswith(self.include_prefixes):
+                logger.debug(f"Bỏ qua phân vùng {partition.device} do không khớp include_devices: {list(self.include_prefixes)}")
+                continue
+            partitions.append(partition)
+        self._partitions = partitions
+        self.refreshes += 1
+
+    def partitions(self):
+        """Danh sách phân vùng (psutil sdiskpart) đã lọc, đọc lại nếu bảng mount đã đổi."""
+        if self._changed():
+            self._refresh()
+        return self._partitions
+
+    def close(self):
+        if self._mountinfo is not None:
+            self._mountinfo.close()
+        self._mountinfo = None
+        self._poller = None
+
+
+_mount_tables = {}
+
+def get_mount_table(ignore_fstypes=None, include_devices=None):
+    """MountTable dùng chung cho mỗi bộ lọc (ignore_fstypes, include_devices)."""
+    key = (tuple(ignore_fstypes) if ignore_fstypes is not None else None,
+           tuple(include_devices) if include_devices else None)
+    table = _mount_tables.get(key)
+    if table is None:
+        table = _mount_tables[key] = MountTable(ignore_fstypes, include_devices)
+    return table
+
+class _UsageProbe:
+    """Một lần gọi disk_usage; ghi lại lúc bắt đầu chạy và lúc xong (time.monotonic)."""
+
+    def __init__(self, mountpoint):
+        self.mountpoint = mountpoint
+        self.done = threading.Event()
+        self.usage = None
+        self.error = None
+        self.started_at = None # None khi còn nằm trong hàng đợi
+        self.finished_at = None
+
+    def run(self):
+        self.started_at = time.monotonic()
+        try:
+            self.usage = psutil.disk_usage(self.mountpoint)
+        except Exception as e:
+            self.error = e
+        self.finished_at = time.monotonic()
+        self.done.set()
+
+    def result(self):
+        return self.error if self.error is not None else self.usage
+
+
+class _ProbePool:
+    """
+    Vài thread daemon dùng lại để chạy _UsageProbe của mount mạng/FUSE.
+
+    Thread kẹt trong statvfs bị treo không nhận việc mới được, nên pool chỉ bù thêm
+    thread khi không còn thread rảnh: tổng số thread tối đa là workers + số mount đang
+    treo (mỗi mount có tối đa một probe đang chạy). Thread daemon không chặn lúc thoát.
+    """
+
+    def __init__(self, workers=USAGE_WORKERS):
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = 0
+        self._busy = 0
+
+    def submit(self, probe, hung=0):
+        with self._lock:
+            if self._threads - self._busy <= self._queue.qsize() and self._threads < self.workers + hung:
+                self._threads += 1
+                threading.Thread(target=self._worker, name=f"statvfs-{self._threads}", daemon=True).start()
+        self._queue.put(probe)
+
+    def _worker(self):
+        while True:
+            probe = self._queue.get()
+            with self._lock:
+                self._busy += 1
+            probe.run()
+            with self._lock:
+                self._busy -= 1
+
+    @property
+    def threads(self):
+        return self._threads
+
+
+def _is_remote_fstype(fstype):
+    return fstype is None or fstype in REMOTE_FSTYPES or fstype.startswith("fuse")
+
+
+class UsageProber:
+    """
+    Gọi disk_usage (statvfs) cho nhiều mountpoint, mỗi lần có hạn chờ.
+
+    Hệ thống file cục bộ được gọi trực tiếp; mount mạng/FUSE chạy trên một pool nhỏ
+    dùng lại (_ProbePool). Lời gọi statvfs bị treo không thể hủy, nên mỗi mountpoint có
+    tối đa một probe đang chạy: mount chưa trả lời trong hạn bị đánh dấu treo (stale),
+    cảnh báo được lặp lại với khoảng cách tăng gấp đôi (tối đa backoff_max giây) trong
+    suốt thời gian treo. Khi probe cũ cuối cùng trả lời, kết quả chỉ được dùng nếu xong
+    sau lần gọi trước (còn thuộc chu kỳ hiện tại), ngược lại mount được probe lại ngay;
+    mount chỉ hết bị đánh dấu treo khi một probe mới trả lời trong hạn.
+    """
+
+    def __init__(self, timeout=DEFAULT_USAGE_TIMEOUT, backoff_max=USAGE_BACKOFF_MAX, workers=USAGE_WORKERS):
+        self.timeout = timeout
+        self.backoff_max = backoff_max
+        self._pool = _ProbePool(workers)
+        self._pending = {} # mountpoint -> _UsageProbe chưa trả lời trong hạn
+        self._stale = {} # mountpoint -> (số lần bị phát hiện treo, thời điểm cảnh báo tiếp theo)
+        self._last_call = float("-inf")
+
+    def _mark_hung(self, mountpoint, timeout, now):
+        failures, next_warning = self._stale.get(mountpoint, (0, now))
+        if now < next_warning:
+            return
+        failures += 1
+        retry_in = min(self.backoff_max, timeout * 2 ** failures)
+        self._stale[mountpoint] = (failures, now + retry_in)
+        logger.warning(f"Mountpoint {mountpoint} không phản hồi sau {timeout:g}s (lần {failures}), kiểm tra lại sau {retry_in:g}s.")
+
+    def probe(self, mountpoints, timeout=None, fstypes=None):
+        """
+        Args:
+            mountpoints (list): Các mountpoint cần lấy usage.
+            timeout (float, optional): Hạn chờ (giây), mặc định self.timeout.
+            fstypes (dict, optional): {mountpoint: fstype}; mountpoint không rõ fstype được coi là mount mạng.
+
+        Returns:
+            dict: {mountpoint: psutil sdiskusage | Exception | None}. None nghĩa là không
+                  truy cập được (quá hạn hoặc probe trước vẫn đang treo).
+        """
+        timeout = self.timeout if timeout is None else timeout
+        fstypes = fstypes or {}
+        now = time.monotonic()
+        last_call, self._last_call = self._last_call, now
+        results = {}
+        remote = []
+        local = []
+        for mountpoint in mountpoints:
+            pending = self._pending.get(mountpoint)
+            if pending is not None:
+                if not pending.done.is_set():
+                    results[mountpoint] = None # Probe cũ vẫn chạy: không tạo thêm probe
+                    if pending.started_at is not None and now - pending.started_at >= timeout:
+                        self._mark_hung(mountpoint, timeout, now)
+                    continue
+                del self._pending[mountpoint]
+                if pending.finished_at >= last_call:
+                    results[mountpoint] = pending.result()
+                    continue
+                # Kết quả từ các chu kỳ trước: bỏ, probe lại ngay
+            probe = _UsageProbe(mountpoint)
+            (remote if _is_remote_fstype(fstypes.get(mountpoint)) else local).append(probe)
+
+        hung = sum(1 for probe in self._pending.values() if probe.started_at is not None and not probe.done.is_set())
+        for probe in remote:
+            self._pool.submit(probe, hung)
+        deadline = time.monotonic() + timeout
+        for probe in local:
+            probe.run()
+
+        for probe in local + remote:
+            mountpoint = probe.mountpoint
+            if probe.done.wait(max(0.0, deadline - time.monotonic())):
+                if self._stale.pop(mountpoint, None) is not None:
+                    logger.info(f"Mountpoint {mountpoint} đã phản hồi trở lại.")
+                results[mountpoint] = probe.result()
+                continue
+            self._pending[mountpoint] = probe
+            results[mountpoint] = None
+            # Probe còn nằm trong hàng đợi (pool đang bận) chưa phải là mount treo
+            if probe.started_at is not None:
+                self._mark_hung(mountpoint, timeout, time.monotonic())
+        return results
+
+    def stale_mountpoints(self):
+        return list(self._stale)
+
+
+_usage_prober = UsageProber()
+
+def get_disk_info(ignore_fstypes=None, include_devices=None, mountpoints=None, usage_timeout=None):
     """
     Lấy thông tin chi tiết các phân vùng ổ cứng, có lọc theo fstype và device.
 
+    Danh sách phân vùng lấy từ MountTable dùng chung (chỉ đọc lại khi mount thay đổi);
+    disk_usage (statvfs) chỉ được gọi cho các mountpoint thực sự cần; mount mạng/FUSE chạy
+    trên pool thread dùng lại và có hạn chờ (UsageProber) để một mount bị treo không làm
+    treo cả vòng giám sát.
+
     Args:
         ignore_fstypes (list, optional): Danh sách các loại fstype cần bỏ qua.
         include_devices (list, optional): Danh sách các pattern tên device cần bao gồm (ví dụ: ['/dev/sd', '/dev/nvme']).
+        mountpoints (list, optional): Chỉ lấy usage cho các mountpoint này (mặc định: tất cả).
+        usage_timeout (float, optional): Hạn chờ disk_usage mỗi mountpoint (giây), mặc định DEFAULT_USAGE_TIMEOUT.
 
     Returns:
-        list: Danh sách thông tin các phân vùng đã lọc.
+        list: Danh sách thông tin các phân vùng đã lọc. Phân vùng không phản hồi có
+              "unreachable": True và các trường dung lượng là None.
     """
-    partitions = psutil.disk_partitions(all=False) # all=False thường bỏ qua các disk ảo/cdrom
+    wanted = set(mountpoints) if mountpoints else None
+    partitions = [partition for partition in get_mount_table(ignore_fstypes, include_devices).partitions()
+                  if wanted is None or partition.mountpoint in wanted]
+    usages = _usage_prober.probe([partition.mountpoint for partition in partitions], usage_timeout,
+                                 {partition.mountpoint: partition.fstype for partition in partitions})
     disk_info = []
 
-    if ignore_fstypes is None:
-        ignore_fstypes = ['tmpfs', 'devtmpfs', 'squashfs', 'iso9660', 'udf'] # Các loại thường muốn bỏ qua
-
     for partition in partitions:
-        # Lọc theo fstype
-        if partition.fstype.lower() in ignore_fstypes:
-            logger.debug(f"Bỏ qua phân vùng {partition.device} (mountpoint: {partition.mountpoint}) do fstype: {partition.fstype}")
-            continue
-
-        # Lọc theo device pattern (nếu được cung cấp)
-        if include_devices:
-            included = False
-            for pattern in include_devices:
-                if partition.device.startswith(pattern):
-                    included = True
-                    break
-            if not included:
-                logger.debug(f"Bỏ qua phân vùng {partition.device} do không khớp include_devices: {include_devices}")
-                continue
-
-        try:
-            usage = psutil.disk_usage(partition.mountpoint)
+        usage = usages.get(partition.mountpoint)
+        if isinstance(usage, PermissionError):
+            logger.warning(f"Không có quyền truy cập thông tin usage cho {partition.mountpoint}. Bỏ qua.")
+        elif isinstance(usage, FileNotFoundError):
+             logger.warning(f"Mountpoint {partition.mountpoint} không tồn tại (có thể đã unmount?). Bỏ qua.")
+        elif isinstance(usage, Exception):
+            logger.error(f"Lỗi không xác định khi lấy usage cho {partition.mountpoint}: {usage}. Bỏ qua.")
+        elif usage is None:
+            disk_info.append({
+                "device": partition.device,
+                "mountpoint": partition.mountpoint,
+                "fstype": partition.fstype,
+                "total": None,
+                "used": None,
+                "free": None,
+                "percent": None,
+                "unreachable": True
+            })
+        else:
             disk_info.append({
                 "device": partition.device,
                 "mountpoint": partition.mountpoint,
@@ -106,14 +380,9 @@ def get_disk_info(ignore_fstypes=None, include_devices=None):
                 "total": usage.total,
                 "used": usage.used,
                 "free": usage.free,
-                "percent": usage.percent
+                "percent": usage.percent,
+                "unreachable": False
             })
-        except PermissionError:
-            logger.warning(f"Không có quyền truy cập thông tin usage cho {partition.mountpoint}. Bỏ qua.")
-        except FileNotFoundError:
-             logger.warning(f"Mountpoint {partition.mountpoint} không tồn tại (có thể đã unmount?). Bỏ qua.")
-        except Exception as e:
-            logger.error(f"Lỗi không xác định khi lấy usage cho {partition.mountpoint}: {e}. Bỏ qua.")
 
     return disk_info
 
@@ -132,12 +401,274 @@ def get_io_stats():
         logger.error(f"Lỗi khi lấy thông tin I/O: {e}")
         return None
 
+def _whole_disk_names():
+    """Tên các đĩa nguyên (không phải phân vùng) theo /sys/block; None nếu không đọc được."""
+    try:
+        return set(os.listdir(SYS_BLOCK_DIR))
+    except OSError:
+        return None
+
+def read_diskstats(whole_disks_only=False):
+    """
+    Đọc bộ đếm I/O của mọi thiết bị bằng một lần đọc /proc/diskstats.
+
+    Args:
+        whole_disks_only (bool): Chỉ giữ đĩa nguyên (có trong /sys/block), bỏ các phân vùng.
+
+    Returns:
+        dict: {tên thiết bị: DiskStats}, hoặc None nếu hệ thống không có /proc/diskstats.
+    """
+    try:
+        with open(DISKSTATS_PATH) as f:
+            data = f.read()
+    except OSError:
+        return None
+    whole_disks = _whole_disk_names() if whole_disks_only else None
+    stats = {}
+    for line in data.splitlines():
+        parts = line.split()
+        if len(parts) < 14:
+            continue
+        name = parts[2]
+        if whole_disks is not None and name not in whole_disks:
+            continue
+        # Trường 4-14: reads ... weighted_io_ms (các trường discard/flush ở kernel mới bị bỏ qua)
+        stats[name] = DiskStats(*map(int, parts[3:14]))
+    return stats
+
+def _psutil_diskstats(whole_disks_only=False):
+    """Dự phòng khi không có /proc/diskstats: quy đổi disk_io_counters của psutil sang DiskStats."""
+    io_stats = get_io_stats()
+    if not io_stats:
+        return None
+    whole_disks = _whole_disk_names() if whole_disks_only else None
+    return {
+        name: DiskStats(io.read_count, getattr(io, "read_merged_count", 0), io.read_bytes // SECTOR_SIZE, io.read_time,
+                        io.write_count, getattr(io, "write_merged_count", 0), io.write_bytes // SECTOR_SIZE, io.write_time,
+                        0, getattr(io, "busy_time", 0), 0)
+        for name, io in io_stats.items()
+        if whole_disks is None or name in whole_disks
+    }
+
+def get_extended_io_counters(whole_disks_only=False):
+    """Bộ đếm I/O chi tiết: /proc/diskstats nếu có, ngược lại psutil (không có in-flight/queue)."""
+    stats = read_diskstats(whole_disks_only)
+    return stats if stats is not None else _psutil_diskstats(whole_disks_only)
+
+def compute_extended_io(previous, current, elapsed):
+    """
+    Tính các chỉ số kiểu iostat -x giữa hai lần đọc bộ đếm.
+
+    Args:
+        previous (dict), current (dict): {tên thiết bị: DiskStats}.
+        elapsed (float): Khoảng thời gian giữa hai lần đọc (giây).
+
+    Returns:
+        dict: {tên thiết bị: {"read_bps", "write_bps", "read_iops", "write_iops", "await_ms",
+               "r_await_ms", "w_await_ms", "avg_request_kb", "queue_depth", "in_flight", "util"}}
+    """
+    elapsed_ms = elapsed * 1000
+    metrics = {}
+    for name, cur in current.items():
+        prev = previous.get(name)
+        if prev is None:
+            continue
+        # Bộ đếm giảm (thiết bị bị gỡ rồi gắn lại): bộ đếm đã reset, tính từ 0
+        d = [c - p if c >= p else c for c, p in zip(cur, prev)]
+        reads, writes = d[0], d[4]
+        ios = reads + writes
+        sectors = d[2] + d[6]
+        metrics[name] = {
+            "read_bps": d[2] * SECTOR_SIZE / elapsed,
+            "write_bps": d[6] * SECTOR_SIZE / elapsed,
+            "read_iops": reads / elapsed,
+            "write_iops": writes / elapsed,
+            "await_ms": (d[3] + d[7]) / ios if ios else 0.0,
+            "r_await_ms": d[3] / reads if reads else 0.0,
+            "w_await_ms": d[7] / writes if writes else 0.0,
+            "avg_request_kb": sectors * SECTOR_SIZE / 1024 / ios if ios else 0.0,
+            "queue_depth": d[10] / elapsed_ms, # aqu-sz: trung bình số request đang chờ/xử lý
+            "in_flight": cur.in_flight,
+            "util": min(100.0, d[9] / elapsed_ms * 100),
+        }
+    return metrics
+
+def _is_io_active(m):
+    return (m["read_bps"] > IO_ACTIVE_MIN_BPS or m["write_bps"] > IO_ACTIVE_MIN_BPS or
+            m["read_iops"] > IO_ACTIVE_MIN_IOPS or m["write_iops"] > IO_ACTIVE_MIN_IOPS or m["in_flight"] > 0)
+
+def extended_io_metrics(previous, current, elapsed, table=None):
+    """
+    Chỉ số I/O mở rộng của các thiết bị đang hoạt động, kèm tổng tốc độ đọc/ghi của mọi thiết bị.
+
+    Với table (CounterTable, cần NumPy) toàn bộ phép trừ, chia và lọc thiết bị hoạt động là
+    các phép toán trên ma trận; chỉ thiết bị vượt ngưỡng mới được chuyển thành dict. Không có
+    table thì tính từng thiết bị bằng compute_extended_io.
+
+    Returns:
+        tuple: (metrics, total_read_bps, total_write_bps) - metrics có dạng như compute_extended_io
+               nhưng chỉ gồm thiết bị đang hoạt động.
+    """
+    if table is None:
+        metrics = compute_extended_io(previous, current, elapsed)
+        return ({name: m for name, m in metrics.items() if _is_io_active(m)},
+                sum(m["read_bps"] for m in metrics.values()),
+                sum(m["write_bps"] for m in metrics.values()))
+
+    names, d, valid = table.update(current)
+    elapsed_ms = elapsed * 1000
+    reads, writes = d[:, 0], d[:, 4]
+    ios = reads + writes
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns = {
+            "read_bps": d[:, 2] * SECTOR_SIZE / elapsed,
+            "write_bps": d[:, 6] * SECTOR_SIZE / elapsed,
+            "read_iops": reads / elapsed,
+            "write_iops": writes / elapsed,
+            "await_ms": np.where(ios > 0, (d[:, 3] + d[:, 7]) / ios, 0.0),
+            "r_await_ms": np.where(reads > 0, d[:, 3] / reads, 0.0),
+            "w_await_ms": np.where(writes > 0, d[:, 7] / writes, 0.0),
+            "avg_request_kb": np.where(ios > 0, (d[:, 2] + d[:, 6]) * SECTOR_SIZE / 1024 / ios, 0.0),
+            "queue_depth": d[:, 10] / elapsed_ms,
+            "in_flight": table.current[:, 8],
+            "util": np.minimum(100.0, d[:, 9] / elapsed_ms * 100),
+        }
+    active = valid & ((columns["read_bps"] > IO_ACTIVE_MIN_BPS) | (columns["write_bps"] > IO_ACTIVE_MIN_BPS) |
+                      (columns["read_iops"] > IO_ACTIVE_MIN_IOPS) | (columns["write_iops"] > IO_ACTIVE_MIN_IOPS) |
+                      (columns["in_flight"] > 0))
+    metrics = {}
+    for row in np.flatnonzero(active):
+        m = {key: float(values[row]) for key, values in columns.items()}
+        m["in_flight"] = int(m["in_flight"])
+        metrics[names[row]] = m
+    return (metrics,
+            float(columns["read_bps"][valid].sum()),
+            float(columns["write_bps"][valid].sum()))
+
+def rank_hot_devices(metrics, top_n=DEFAULT_HOT_DEVICES):
+    """Các thiết bị "nóng" nhất: xếp theo %util rồi độ sâu hàng đợi, bỏ thiết bị không hoạt động."""
+    active = [(name, m) for name, m in metrics.items() if m["util"] > 0 or m["read_iops"] + m["write_iops"] > 0]
+    return heapq.nlargest(top_n, active, key=lambda item: (item[1]["util"], item[1]["queue_depth"]))
+
+def format_duration(seconds):
+    """Chuỗi thời lượng ngắn gọn, ví dụ "2 ngày 3 giờ", "45 phút", "30 giây"."""
+    seconds = int(seconds)
+    days, rest = divmod(seconds, 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes, secs = divmod(rest, 60)
+    if days:
+        return f"{days} ngày {hours} giờ"
+    if hours:
+        return f"{hours} giờ {minutes} phút"
+    if minutes:
+        return f"{minutes} phút"
+    return f"{secs} giây"
+
+
+class FillTrend:
+    """
+    Hồi quy tuyến tính dung lượng đã dùng theo thời gian trên cửa sổ trượt của một mountpoint.
+
+    Giữ sẵn các tổng n, Σt, Σy, Σt², Σty: mỗi mẫu mới cộng vào, mẫu ra khỏi cửa sổ trừ đi,
+    nên mỗi lần cập nhật là O(1) dù cửa sổ dài. t và y được lấy tương đối so với mẫu gốc để
+    tránh mất độ chính xác; các tổng được tính lại từ đầu sau mỗi vòng cửa sổ để sai số do
+    cộng/trừ không tích lũy.
+    """
+
+    def __init__(self, window=DEFAULT_FORECAST_WINDOW):
+        self.window = window
+        self.samples = deque()
+        self._origin = None
+        self._reset_sums()
+
+    def _reset_sums(self):
+        self.n = 0
+        self.sum_t = self.sum_y = self.sum_tt = self.sum_ty = 0.0
+        self._evicted = 0
+
+    def _add(self, t, y, sign):
+        self.n += sign
+        self.sum_t += sign * t
+        self.sum_y += sign * y
+        self.sum_tt += sign * t * t
+        self.sum_ty += sign * t * y
+
+    def update(self, timestamp, used):
+        if self._origin is None:
+            self._origin = (timestamp, used)
+        t, y = timestamp - self._origin[0], used - self._origin[1]
+        self.samples.append((t, y))
+        self._add(t, y, 1)
+        while t - self.samples[0][0] > self.window:
+            old_t, old_y = self.samples.popleft()
+            self._add(old_t, old_y, -1)
+            self._evicted += 1
+        if self._evicted >= len(self.samples):
+            self._reset_sums()
+            for sample_t, sample_y in self.samples:
+                self._add(sample_t, sample_y, 1)
+
+    def rate(self):
+        """Tốc độ tăng dung lượng đã dùng (byte/giây), None nếu chưa đủ mẫu."""
+        if self.n < FORECAST_MIN_SAMPLES:
+            return None
+        denominator = self.n * self.sum_tt - self.sum_t * self.sum_t
+        if denominator <= 0:
+            return None
+        return (self.n * self.sum_ty - self.sum_t * self.sum_y) / denominator
+
+
+class DiskFillForecaster:
+    """Dự báo thời điểm đầy cho nhiều mountpoint, mỗi mountpoint một FillTrend."""
+
+    def __init__(self, window=DEFAULT_FORECAST_WINDOW, horizon=DEFAULT_FORECAST_HORIZON):
+        self.window = window
+        self.horizon = horizon
+        self._trends = {}
+
+    def update(self, disk, timestamp=None):
+        """
+        Thêm mẫu từ một phần tử của get_disk_info và trả về dự báo.
+
+        Returns:
+            tuple: (fill_rate byte/giây hoặc None, số giây đến khi đầy hoặc None, cảnh báo bool).
+                   Số giây là None khi dung lượng không tăng.
+        """
+        trend = self._trends.get(disk["mountpoint"])
+        if trend is None:
+            trend = self._trends[disk["mountpoint"]] = FillTrend(self.window)
+        trend.update(time.monotonic() if timestamp is None else timestamp, disk["used"])
+        rate = trend.rate()
+        if rate is None or rate <= 0:
+            return rate, None, False
+        eta = disk["free"] / rate
+        return rate, eta, bool(self.horizon) and eta <= self.horizon
+
+    def forget(self, mountpoints):
+        """Bỏ xu hướng của các mountpoint không còn được giám sát."""
+        for mountpoint in set(self._trends) - set(mountpoints):
+            del self._trends[mountpoint]
+
+def format_forecast(rate, eta):
+    """(tốc độ tăng mỗi giờ, thời gian đến khi đầy) dạng chuỗi để hiển thị."""
+    if rate is None:
+        return "-", "-"
+    return f"{'+' if rate >= 0 else '-'}{get_size(abs(rate) * 3600)}/giờ", format_duration(eta) if eta is not None else "-"
+
+
 def monitor_disk(duration=DEFAULT_MONITOR_DURATION_SEC,
                  interval=DEFAULT_MONITOR_INTERVAL_SEC,
                  threshold=DEFAULT_THRESHOLD_PERCENT,
                  mountpoint=None,
                  ignore_fstypes=None,
-                 include_devices=None):
+                 include_devices=None,
+                 jitter=0.0,
+                 history_dir=None,
+                 sample_log=None,
+                 whole_disks=False,
+                 usage_timeout=DEFAULT_USAGE_TIMEOUT,
+                 forecast_window=DEFAULT_FORECAST_WINDOW,
+                 forecast_horizon=DEFAULT_FORECAST_HORIZON):
     """
     Giám sát ổ cứng trong khoảng thời gian xác định, hiển thị cả I/O rate.
 
@@ -148,29 +679,51 @@ def monitor_disk(duration=DEFAULT_MONITOR_DURATION_SEC,
         mountpoint (str): Đường dẫn phân vùng cụ thể cần giám sát (nếu None thì giám sát tất cả đã lọc).
         ignore_fstypes (list): Danh sách fstypes cần bỏ qua.
         include_devices (list): Danh sách pattern device cần bao gồm.
+        jitter (float): Độ lệch pha ngẫu nhiên tối đa (giây) của lần kiểm tra đầu tiên.
+        history_dir (str): Thư mục lưu lịch sử mẫu (mmap) để giữ lại giữa các lần chạy (nếu có).
+        sample_log (str): File log mẫu nhị phân (xem sample_log.py) để ghi thêm mọi mẫu (nếu có).
+        whole_disks (bool): Chỉ hiển thị I/O của đĩa nguyên, bỏ các phân vùng.
+        usage_timeout (float): Hạn chờ disk_usage mỗi mountpoint (giây); mount quá hạn được báo là không truy cập được.
+        forecast_window (int): Cửa sổ mẫu (giây) cho hồi quy dự báo đầy.
+        forecast_horizon (int): Cảnh báo khi dự báo phân vùng đầy trong số giây này (0 = tắt).
     """
-    start_time = time.time()
-    end_time = start_time + duration
+    scheduler = FixedRateScheduler(interval, duration, jitter=jitter)
+    history = open_history(history_dir, duration, interval, sample_log)
 
     if mountpoint:
         logger.info(f"Bắt đầu giám sát ổ cứng tại '{mountpoint}' trong {duration}s (interval: {interval}s, ngưỡng: {threshold}%)")
     else:
         logger.info(f"Bắt đầu giám sát tất cả ổ cứng hợp lệ trong {duration}s (interval: {interval}s, ngưỡng: {threshold}%)")
 
-    # Lưu trữ trạng thái I/O trước đó để tính rate
-    last_io_stats = get_io_stats()
-    last_check_time = start_time
+    # Lưu trữ trạng thái I/O trước đó để tính rate (có NumPy: ma trận bộ đếm theo thiết bị)
+    last_io_stats = get_extended_io_counters(whole_disks)
+    io_table = None
+    if HAVE_NUMPY:
+        io_table = CounterTable(DiskStats._fields)
+        if last_io_stats:
+            io_table.update(last_io_stats)
+    last_check_time = time.monotonic()
     alerts = 0
+    forecast_alerts = 0
+    forecaster = DiskFillForecaster(forecast_window, forecast_horizon)
 
     try:
-        while time.time() < end_time:
-            current_time = time.time()
+        for tick in scheduler:
+            if tick.missed:
+                logger.warning(f"Bỏ lỡ {tick.missed} lần kiểm tra do vòng lặp chạy chậm hơn chu kỳ (trễ {tick.lag:.2f}s).")
+            current_time = time.monotonic()
             time_delta = current_time - last_check_time
-            if time_delta <= 0: # Tránh chia cho 0 nếu interval quá nhỏ hoặc lỗi time
+            if time_delta <= 0: # Tránh chia cho 0 nếu interval quá nhỏ
                  time_delta = 1
 
             # --- Disk Usage ---
-            disk_info = get_disk_info(ignore_fstypes, include_devices)
+            disk_info = get_disk_info(ignore_fstypes, include_devices, [mountpoint] if mountpoint else None, usage_timeout)
+            forecasts = {}
+            for disk in disk_info:
+                if not disk["unreachable"]:
+                    history.record(f"disk.{disk['mountpoint']}", disk["percent"])
+                    forecasts[disk["mountpoint"]] = forecaster.update(disk, current_time)
+            forecaster.forget(disk["mountpoint"] for disk in disk_info)
             logger.info(f"--- Kiểm tra lúc: {datetime.datetime.now():%Y-%m-%d %H:%M:%S} ---")
 
             if mountpoint:
@@ -179,12 +732,17 @@ def monitor_disk(duration=DEFAULT_MONITOR_DURATION_SEC,
                     if disk["mountpoint"] == mountpoint:
                         found = True
                         status = "Bình thường"
-                        if disk["percent"] >= threshold:
+                        if disk["unreachable"]:
+                            logger.warning(f"Mountpoint '{disk['mountpoint']}' ({disk['device']}) không phản hồi (có thể mount mạng bị treo).")
+                        elif disk["percent"] >= threshold:
                             status = f"CẢNH BÁO (>={threshold}%)"
                             alerts += 1
                             logger.warning(f"Mountpoint '{disk['mountpoint']}' ({disk['device']}) đạt {disk['percent']:.1f}% sử dụng.")
                         else:
                             logger.info(f"Mountpoint '{disk['mountpoint']}' ({disk['device']}): {disk['percent']:.1f}% - Used: {get_size(disk['used'])} / Total: {get_size(disk['total'])}")
+                        if disk["mountpoint"] in forecasts and forecasts[disk["mountpoint"]][0] is not None:
+                            fill_rate, eta = format_forecast(*forecasts[disk["mountpoint"]][:2])
+                            logger.info(f"Xu hướng '{disk['mountpoint']}': {fill_rate}, dự báo đầy sau: {eta}")
                         break
                 if not found:
                     logger.warning(f"Không tìm thấy thông tin cho mountpoint '{mountpoint}'. Có thể nó đã bị lọc hoặc không tồn tại.")
@@ -193,6 +751,9 @@ def monitor_disk(duration=DEFAULT_MONITOR_DURATION_SEC,
                 for disk in disk_info:
                     status = "OK"
                     log_level = logging.INFO
+                    if disk["unreachable"]:
+                        usage_data.append([disk["device"], disk["mountpoint"], "-", "-", "-", "-", "-", "KHÔNG PHẢN HỒI"])
+                        continue
                     if disk["percent"] >= threshold:
                         status = f"WARN (>={threshold}%)"
                         alerts += 1
@@ -204,6 +765,7 @@ def monitor_disk(duration=DEFAULT_MONITOR_DURATION_SEC,
                         f"{disk['percent']:.1f}%",
                         get_size(disk['used']),
                         get_size(disk['total']),
+                        *format_forecast(*forecasts[disk["mountpoint"]][:2]),
                         status
                     ])
                     # Log chi tiết hơn cho từng disk nếu muốn
@@ -211,57 +773,226 @@ def monitor_disk(duration=DEFAULT_MONITOR_DURATION_SEC,
 
                 if usage_data:
                     print("\n=== Tình trạng sử dụng ===")
-                    print(tabulate(usage_data, headers=["Thiết bị", "Mountpoint", "% Used", "Đã dùng", "Tổng", "Trạng thái"], tablefmt="pretty"))
+                    print(tabulate(usage_data, headers=["Thiết bị", "Mountpoint", "% Used", "Đã dùng", "Tổng", "Tăng", "Dự báo đầy", "Trạng thái"], tablefmt="pretty"))
                 else:
                     logger.info("Không có phân vùng nào để hiển thị sau khi lọc.")
 
+            # --- Dự báo đầy ---
+            for disk_mountpoint, (fill_rate, eta, predicted) in forecasts.items():
+                if predicted:
+                    forecast_alerts += 1
+                    logger.warning(f"DỰ BÁO: Mountpoint '{disk_mountpoint}' sẽ đầy sau khoảng {format_duration(eta)} "
+                                   f"(tăng {get_size(fill_rate * 3600)}/giờ).")
+
 
             # --- I/O Stats ---
-            current_io_stats = get_io_stats()
+            current_io_stats = get_extended_io_counters(whole_disks)
             if current_io_stats and last_io_stats:
+                io_metrics, total_read_bps, total_write_bps = extended_io_metrics(last_io_stats, current_io_stats, time_delta, io_table)
+                # Lịch sử chỉ giữ tổng của mọi thiết bị, tránh một chuỗi cho từng loop/zram
+                history.record("io.read", total_read_bps)
+                history.record("io.write", total_write_bps)
+
                 io_rate_data = []
-                for disk_name, current_stats in current_io_stats.items():
-                    last_stats = last_io_stats.get(disk_name)
-                    if last_stats:
-                        read_rate = (current_stats.read_bytes - last_stats.read_bytes) / time_delta
-                        write_rate = (current_stats.write_bytes - last_stats.write_bytes) / time_delta
-                        read_iops = (current_stats.read_count - last_stats.read_count) / time_delta
-                        write_iops = (current_stats.write_count - last_stats.write_count) / time_delta
-
-                        # Chỉ hiển thị nếu có hoạt động I/O đáng kể
-                        if read_rate > 1 or write_rate > 1 or read_iops > 0.1 or write_iops > 0.1:
-                             io_rate_data.append([
-                                disk_name,
-                                f"{get_size(read_rate)}/s",
-                                f"{read_iops:.1f}/s",
-                                f"{get_size(write_rate)}/s",
-                                f"{write_iops:.1f}/s"
-                            ])
+                # Chỉ hiển thị thiết bị có hoạt động I/O đáng kể, thiết bị bận nhất lên đầu
+                for disk_name, m in sorted(io_metrics.items(), key=lambda item: -item[1]["util"]):
+                    io_rate_data.append([
+                        disk_name,
+                        f"{get_size(m['read_bps'])}/s",
+                        f"{m['read_iops']:.1f}/s",
+                        f"{get_size(m['write_bps'])}/s",
+                        f"{m['write_iops']:.1f}/s",
+                        f"{m['await_ms']:.2f}",
+                        f"{m['avg_request_kb']:.1f}",
+                        f"{m['queue_depth']:.2f}",
+                        m["in_flight"],
+                        f"{m['util']:.1f}%"
+                    ])
 
                 if io_rate_data:
                     print("\n=== Tốc độ I/O (hiện tại) ===")
-                    print(tabulate(io_rate_data, headers=["Thiết bị", "Đọc", "Read IOPS", "Ghi", "Write IOPS"], tablefmt="pretty", floatfmt=".1f"))
+                    print(tabulate(io_rate_data, headers=["Thiết bị", "Đọc", "Read IOPS", "Ghi", "Write IOPS", "await (ms)",
+                                                          "Req TB (KB)", "Hàng đợi", "Đang xử lý", "%util"], tablefmt="pretty"))
+                    hot = rank_hot_devices(io_metrics)
+                    if hot:
+                        logger.info("Thiết bị bận nhất: " + ", ".join(
+                            f"{name} (util {m['util']:.1f}%, await {m['await_ms']:.2f}ms, hàng đợi {m['queue_depth']:.2f})"
+                            for name, m in hot))
 
             # Cập nhật trạng thái cho lần lặp sau
             last_io_stats = current_io_stats
             last_check_time = current_time
 
-            # Ngủ đến lần kiểm tra tiếp theo (trừ đi thời gian đã dùng để kiểm tra)
-            remaining_time = end_time - time.time()
-            sleep_time = max(0, min(interval - (time.time() - current_time), remaining_time))
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-
     except KeyboardInterrupt:
         logger.info("\nGiám sát bị dừng bởi người dùng.")
     finally:
-        summary = f"\nKết thúc giám sát ổ cứng. Tổng số cảnh báo dung lượng: {alerts}"
+        summary = f"\nKết thúc giám sát ổ cứng. Tổng số cảnh báo dung lượng: {alerts}, cảnh báo dự báo đầy: {forecast_alerts}"
         logger.info(summary)
+        logger.info(f"Lập lịch: {scheduler.summary()}")
+        for name in history.names():
+            formatter = (lambda v: f"{get_size(v)}/s") if name.startswith("io.") else (lambda v: f"{v:.1f}%")
+            logger.info(f"  {name}: {format_stats(history.stats(name), formatter)}")
+        history.close()
         if file_handler:
             logger.removeHandler(file_handler)
             file_handler.close()
 
-def find_large_files(path='.', top_n=DEFAULT_LARGE_FILES_COUNT, min_size_bytes=DEFAULT_LARGE_FILES_MIN_SIZE_MB * BYTES_PER_MB):
+def _scan_directory(dirpath, min_size_bytes):
+    """
+    Quét một thư mục (không đệ quy) bằng os.scandir.
+
+    DirEntry đã mang sẵn loại file (d_type) từ getdents nên is_dir/is_file với
+    follow_symlinks=False thường không tốn thêm syscall; chỉ file thường mới cần
+    một lần lstat để lấy kích thước.
+
+    Args:
+        dirpath (str): Thư mục cần quét.
+        min_size_bytes (int): Kích thước tối thiểu (bytes) của file cần giữ lại.
+
+    Returns:
+        tuple: (subdirs, (matches, dir_bytes)) - danh sách thư mục con cần duyệt tiếp,
+               danh sách các tuple (filepath, size) thỏa mãn và tổng kích thước
+               mọi file thường nằm trực tiếp trong thư mục.
+    """
+    subdirs = []
+    matches = []
+    dir_bytes = 0
+    try:
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                try:
+                    # Không đi theo symlink (giống os.walk mặc định và bỏ qua symlink tới file)
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        size = entry.stat(follow_symlinks=False).st_size
+                        dir_bytes += size
+                        if size >= min_size_bytes:
+                            matches.append((entry.path, size))
+                except FileNotFoundError:
+                    logger.debug(f"File {entry.path} không tìm thấy (có thể đã bị xóa giữa chừng).")
+                except OSError as e:
+                    logger.warning(f"Không thể lấy kích thước file '{entry.path}': {e}. Bỏ qua.")
+    except PermissionError:
+        logger.warning(f"Không có quyền truy cập thư mục: {dirpath}. Bỏ qua.")
+    except FileNotFoundError:
+        logger.debug(f"Thư mục {dirpath} không tìm thấy (có thể đã bị xóa giữa chừng).")
+    except OSError as e:
+        logger.warning(f"Không thể đọc thư mục '{dirpath}': {e}. Bỏ qua.")
+    return subdirs, (matches, dir_bytes)
+
+def _walk_tree(path, scan_func, workers=DEFAULT_SCAN_WORKERS):
+    """
+    Duyệt cây thư mục, gọi scan_func cho từng thư mục và yield kết quả.
+
+    Args:
+        path (str): Thư mục gốc.
+        scan_func (callable): Hàm nhận dirpath, trả về tuple (subdirs, payload).
+        workers (int): Số thread quét song song. <= 1 nghĩa là quét tuần tự
+                       trong thread hiện tại.
+
+    Yields:
+        tuple: (dirpath, payload) cho mỗi thư mục đã quét. Khi chạy song song
+               thứ tự không xác định.
+    """
+    if workers <= 1:
+        stack = [path]
+        while stack:
+            dirpath = stack.pop()
+            subdirs, payload = scan_func(dirpath)
+            stack.extend(reversed(subdirs))
+            yield dirpath, payload
+        return
+
+    # Chỉ giữ một số lượng giới hạn future đang chạy; phần còn lại nằm trong backlog
+    # (duyệt kiểu LIFO để backlog không phình to trên cây rộng).
+    max_in_flight = workers * 4
+    backlog = deque([path])
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="disk-scan") as executor:
+        while backlog or pending:
+            while backlog and len(pending) < max_in_flight:
+                dirpath = backlog.pop()
+                pending[executor.submit(scan_func, dirpath)] = dirpath
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dirpath = pending.pop(future)
+                subdirs, payload = future.result()
+                backlog.extend(subdirs)
+                yield dirpath, payload
+
+def _push_bounded(heap, item, limit):
+    """
+    Đưa item vào min-heap nhưng chỉ giữ lại tối đa `limit` phần tử lớn nhất.
+
+    Phần tử nhỏ nhất luôn nằm ở heap[0] nên mỗi lần thêm chỉ tốn O(log limit)
+    và bộ nhớ không vượt quá O(limit).
+    """
+    if limit <= 0:
+        return
+    if len(heap) < limit:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+def analyze_large_files(path='.', top_n=DEFAULT_LARGE_FILES_COUNT, min_size_bytes=DEFAULT_LARGE_FILES_MIN_SIZE_MB * BYTES_PER_MB,
+                        per_dir_n=0, top_dirs_n=0, workers=DEFAULT_SCAN_WORKERS):
+    """
+    Quét một lần và trả về đồng thời top file lớn nhất, top file trong từng thư mục
+    và các thư mục có tổng dung lượng file lớn nhất.
+
+    Mọi tập ứng viên đều được giữ trong min-heap có kích thước cố định nên kết quả
+    được xử lý dạng streaming, không cần sắp xếp lại toàn bộ danh sách.
+
+    Args:
+        path (str): Đường dẫn cần tìm kiếm.
+        top_n (int): Số lượng file lớn nhất cần lấy.
+        min_size_bytes (int): Kích thước tối thiểu (bytes) của file được xếp hạng.
+        per_dir_n (int): Số file lớn nhất cần giữ cho mỗi thư mục (0 = không tính).
+        top_dirs_n (int): Số thư mục có tổng dung lượng file (nằm trực tiếp trong
+                          thư mục, không tính thư mục con) lớn nhất cần lấy (0 = không tính).
+        workers (int): Số thread quét song song các cây thư mục con (1 = tuần tự).
+
+    Returns:
+        dict: {
+            "files": list các tuple (filepath, size), giảm dần theo size,
+            "per_directory": dict {dirpath: list các tuple (filepath, size)},
+            "directories": list các tuple (dirpath, total_bytes), giảm dần theo size,
+            "matched": tổng số file thỏa mãn min_size_bytes
+        }
+    """
+    top_files = []
+    dir_heaps = {}
+    top_dirs = []
+    matched = 0
+
+    scan_func = functools.partial(_scan_directory, min_size_bytes=min_size_bytes)
+    for dirpath, (matches, dir_bytes) in _walk_tree(path, scan_func, workers):
+        if top_dirs_n > 0 and dir_bytes > 0:
+            _push_bounded(top_dirs, (dir_bytes, dirpath), top_dirs_n)
+        if not matches:
+            continue
+        matched += len(matches)
+        if per_dir_n > 0:
+            dir_heap = []
+            for filepath, size in matches:
+                _push_bounded(dir_heap, (size, filepath), per_dir_n)
+            dir_heaps[dirpath] = dir_heap
+        for filepath, size in matches:
+            _push_bounded(top_files, (size, filepath), top_n)
+
+    return {
+        "files": [(filepath, size) for size, filepath in sorted(top_files, reverse=True)],
+        "per_directory": {
+            dirpath: [(filepath, size) for size, filepath in sorted(heap, reverse=True)]
+            for dirpath, heap in dir_heaps.items()
+        },
+        "directories": [(dirpath, total) for total, dirpath in sorted(top_dirs, reverse=True)],
+        "matched": matched
+    }
+
+def find_large_files(path='.', top_n=DEFAULT_LARGE_FILES_COUNT, min_size_bytes=DEFAULT_LARGE_FILES_MIN_SIZE_MB * BYTES_PER_MB,
+                     workers=DEFAULT_SCAN_WORKERS):
     """
     Tìm các file lớn trong đường dẫn chỉ định.
 
@@ -269,48 +1000,542 @@ def find_large_files(path='.', top_n=DEFAULT_LARGE_FILES_COUNT, min_size_bytes=D
         path (str): Đường dẫn cần tìm kiếm.
         top_n (int): Số lượng file lớn nhất cần hiển thị.
         min_size_bytes (int): Kích thước tối thiểu (bytes).
+        workers (int): Số thread quét song song các cây thư mục con (1 = tuần tự).
 
     Returns:
         list: Danh sách các tuple (filepath, size) của các file lớn nhất.
     """
-    large_files = []
-    logger.info(f"Bắt đầu tìm kiếm file lớn hơn {get_size(min_size_bytes)} trong '{path}'...")
-
-    for dirpath, dirnames, filenames in os.walk(path, topdown=True):
-        # Cố gắng bỏ qua các thư mục không có quyền truy cập ngay từ đầu
-        accessible_dirs = []
-        for d in list(dirnames): # Lặp trên bản sao để có thể sửa đổi list gốc
-             dir_full_path = os.path.join(dirpath, d)
-             if not os.access(dir_full_path, os.R_OK | os.X_OK):
-                 logger.warning(f"Không có quyền truy cập thư mục: {dir_full_path}. Bỏ qua.")
-                 dirnames.remove(d) # Loại bỏ khỏi danh sách duyệt tiếp theo của os.walk
-             else:
-                 accessible_dirs.append(d)
-        # dirnames[:] = accessible_dirs # Cập nhật lại (không cần thiết nếu remove hoạt động)
-
-        for filename in filenames:
-            filepath = os.path.join(dirpath, filename)
-            try:
-                # Kiểm tra xem có phải symlink không và có trỏ đến file không
-                if not os.path.islink(filepath) and os.path.isfile(filepath):
-                    size = os.path.getsize(filepath)
-                    if size >= min_size_bytes:
-                        large_files.append((filepath, size))
-                        # Tối ưu: Nếu đã có nhiều hơn N file, so sánh và giữ lại top N
-                        if len(large_files) > top_n:
-                            large_files.sort(key=lambda x: x[1], reverse=True)
-                            large_files = large_files[:top_n]
-            except FileNotFoundError:
-                logger.debug(f"File {filepath} không tìm thấy (có thể đã bị xóa giữa chừng).")
-                continue # File có thể đã bị xóa giữa lúc liệt kê và getsize
-            except OSError as e:
-                logger.warning(f"Không thể lấy kích thước file '{filepath}': {e}. Bỏ qua.")
+    logger.info(f"Bắt đầu tìm kiếm file lớn hơn {get_size(min_size_bytes)} trong '{path}' ({workers} thread)...")
+    result = analyze_large_files(path, top_n, min_size_bytes, workers=workers)
+    logger.info(f"Tìm kiếm hoàn tất. Tìm thấy {result['matched']} file thỏa mãn.")
+    return result["files"]
+
+class LargeFileWatcher:
+    """
+    Tập file lớn của một cây thư mục, cập nhật liên tục từ sự kiện inotify.
+
+    Quét đầy đủ một lần (đồng thời đặt watch cho từng thư mục), sau đó chỉ lstat lại
+    đúng các đường dẫn có sự kiện; nhiều sự kiện IN_MODIFY của cùng một file trong một
+    lượt đọc chỉ tốn một lần lstat. Thư mục không đặt được watch (vượt max_user_watches,
+    ENOSPC) được quét lại định kỳ mỗi rescan_interval giây; khi hàng đợi sự kiện của kernel
+    tràn (IN_Q_OVERFLOW) thì quét lại toàn bộ cây.
+    """
+
+    DIR_MASK = (inotify.IN_CREATE | inotify.IN_DELETE | inotify.IN_MODIFY | inotify.IN_CLOSE_WRITE
+                | inotify.IN_MOVED_FROM | inotify.IN_MOVED_TO | inotify.IN_ONLYDIR
+                | inotify.IN_DONT_FOLLOW | inotify.IN_EXCL_UNLINK)
+
+    def __init__(self, path, min_size_bytes=DEFAULT_LARGE_FILES_MIN_SIZE_MB * BYTES_PER_MB,
+                 workers=DEFAULT_SCAN_WORKERS, rescan_interval=DEFAULT_WATCH_RESCAN_SEC):
+        self.path = os.path.abspath(path)
+        self.min_size_bytes = min_size_bytes
+        self.workers = workers
+        self.rescan_interval = rescan_interval
+        self.sizes = {} # đường dẫn -> kích thước, mọi file >= min_size_bytes
+        self.unwatched = set() # thư mục phải quét lại định kỳ
+        self.watch_limit_hit = False
+        self._limit_warned = False
+        self.restats = 0
+        self.full_rescans = 0
+        self._wd_paths = {}
+        self._path_wds = {}
+        self._next_rescan = time.monotonic() + rescan_interval
+        try:
+            self._inotify = inotify.Inotify()
+        except OSError as e:
+            logger.warning(f"Không dùng được inotify ({e}); chuyển sang quét lại định kỳ mỗi {rescan_interval}s.")
+            self._inotify = None
+        self._scan_tree(self.path)
+
+    def _watch(self, dirpath):
+        if self._inotify is None or self.watch_limit_hit:
+            self.unwatched.add(dirpath)
+            return
+        try:
+            wd = self._inotify.add_watch(dirpath, self.DIR_MASK)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                self.watch_limit_hit = True
+                log = logger.debug if self._limit_warned else logger.warning
+                self._limit_warned = True
+                log(f"Vượt giới hạn inotify watch (max_user_watches={inotify.max_user_watches()}); "
+                               f"các thư mục còn lại được quét lại mỗi {self.rescan_interval}s.")
+                self.unwatched.add(dirpath)
+            else:
+                logger.debug(f"Không đặt được watch cho '{dirpath}': {e}")
+            return
+        self._wd_paths[wd] = dirpath
+        self._path_wds[dirpath] = wd
+        self.unwatched.discard(dirpath)
+
+    def _scan_and_watch(self, dirpath):
+        # Đặt watch trước khi đọc thư mục để không lỡ file được tạo trong lúc quét
+        self._watch(dirpath)
+        return _scan_directory(dirpath, self.min_size_bytes)
+
+    def _scan_tree(self, root):
+        for _, (matches, _) in _walk_tree(root, self._scan_and_watch, self.workers):
+            self.sizes.update(matches)
+
+    def _forget_tree(self, dirpath):
+        prefix = dirpath + os.sep
+        for filepath in [p for p in self.sizes if p.startswith(prefix)]:
+            del self.sizes[filepath]
+        for path in [p for p in self._path_wds if p == dirpath or p.startswith(prefix)]:
+            wd = self._path_wds.pop(path)
+            self._wd_paths.pop(wd, None)
+            if self._inotify is not None:
+                self._inotify.rm_watch(wd)
+        self.unwatched = {p for p in self.unwatched if p != dirpath and not p.startswith(prefix)}
+
+    def _restat(self, filepath):
+        self.restats += 1
+        try:
+            st = os.lstat(filepath)
+        except OSError:
+            self.sizes.pop(filepath, None)
+            return
+        if stat.S_ISREG(st.st_mode) and st.st_size >= self.min_size_bytes:
+            self.sizes[filepath] = st.st_size
+        else:
+            self.sizes.pop(filepath, None)
+
+    def full_rescan(self):
+        """Quét lại toàn bộ cây (sau khi mất sự kiện)."""
+        self.full_rescans += 1
+        self.sizes.clear()
+        self._scan_tree(self.path)
+
+    def _rescan_unwatched(self):
+        if self.watch_limit_hit and len(self._wd_paths) < (inotify.max_user_watches() or 0):
+            self.watch_limit_hit = False # Có thể đã có watch được giải phóng: thử đặt lại
+        for dirpath in list(self.unwatched):
+            if not os.path.isdir(dirpath):
+                self._forget_tree(dirpath)
+                continue
+            for filepath in [p for p in self.sizes if os.path.dirname(p) == dirpath]:
+                del self.sizes[filepath]
+            subdirs, (matches, _) = self._scan_and_watch(dirpath)
+            self.sizes.update(matches)
+            for subdir in subdirs:
+                if subdir not in self._path_wds and subdir not in self.unwatched:
+                    self._scan_tree(subdir) # Thư mục con mới xuất hiện
+
+    def process(self, timeout):
+        """
+        Xử lý sự kiện trong tối đa timeout giây (dùng làm hàm sleep của FixedRateScheduler).
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if now >= self._next_rescan:
+                if self.unwatched:
+                    self._rescan_unwatched()
+                self._next_rescan = now + self.rescan_interval
+            remaining = min(deadline, self._next_rescan) - now
+            if self._inotify is None:
+                if remaining > 0:
+                    time.sleep(remaining)
+            else:
+                self._handle_events(self._inotify.read_events(max(0.0, remaining)))
+            if time.monotonic() >= deadline:
+                return
+
+    def _handle_events(self, events):
+        dirty = set()
+        for event in events:
+            if event.mask & inotify.IN_Q_OVERFLOW:
+                logger.warning("Hàng đợi sự kiện inotify bị tràn; quét lại toàn bộ cây.")
+                self.full_rescan()
+                return
+            dirpath = self._wd_paths.get(event.wd)
+            if event.mask & inotify.IN_IGNORED:
+                if dirpath is not None:
+                    self._wd_paths.pop(event.wd, None)
+                    if self._path_wds.get(dirpath) == event.wd:
+                        del self._path_wds[dirpath]
+                continue
+            if dirpath is None or not event.name:
+                continue
+            path = os.path.join(dirpath, event.name)
+            if event.mask & inotify.IN_ISDIR:
+                if event.mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+                    self._scan_tree(path)
+                elif event.mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+                    self._forget_tree(path)
+            elif event.mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+                dirty.discard(path)
+                self.sizes.pop(path, None)
+            else:
+                dirty.add(path)
+        for path in dirty:
+            self._restat(path)
+
+    def top(self, top_n=DEFAULT_LARGE_FILES_COUNT):
+        """Danh sách (filepath, size) của top_n file lớn nhất hiện tại."""
+        return heapq.nlargest(top_n, self.sizes.items(), key=lambda item: item[1])
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+def watch_large_files(path='.', top_n=DEFAULT_LARGE_FILES_COUNT, min_size_bytes=DEFAULT_LARGE_FILES_MIN_SIZE_MB * BYTES_PER_MB,
+                      interval=DEFAULT_MONITOR_INTERVAL_SEC, duration=None, workers=DEFAULT_SCAN_WORKERS,
+                      rescan_interval=DEFAULT_WATCH_RESCAN_SEC):
+    """
+    Quét một lần rồi theo dõi file lớn bằng inotify, hiển thị lại top khi có thay đổi.
+
+    Args:
+        interval (int): Chu kỳ (giây) kiểm tra và hiển thị lại danh sách nếu thay đổi.
+        duration (int, optional): Thời gian theo dõi (giây), None = đến khi Ctrl+C.
+        rescan_interval (int): Chu kỳ quét lại các thư mục không đặt được watch.
+    """
+    logger.info(f"Quét ban đầu '{path}' (file lớn hơn {get_size(min_size_bytes)}, {workers} thread)...")
+    start = time.monotonic()
+    watcher = LargeFileWatcher(path, min_size_bytes, workers, rescan_interval)
+    logger.info(f"Quét xong sau {time.monotonic() - start:.1f}s: {len(watcher.sizes)} file thỏa mãn, "
+                f"{len(watcher._wd_paths)} thư mục được watch, {len(watcher.unwatched)} thư mục quét định kỳ.")
+    last_top = watcher.top(top_n)
+    display_large_files(last_top)
+
+    scheduler = FixedRateScheduler(interval, duration, sleep=watcher.process)
+    try:
+        for tick in scheduler:
+            if tick.index == 0:
                 continue
+            current_top = watcher.top(top_n)
+            if current_top != last_top:
+                logger.info(f"--- Thay đổi lúc: {datetime.datetime.now():%Y-%m-%d %H:%M:%S} ---")
+                display_large_files(current_top)
+                last_top = current_top
+    except KeyboardInterrupt:
+        logger.info("\nTheo dõi bị dừng bởi người dùng.")
+    finally:
+        logger.info(f"Kết thúc theo dõi: {watcher.restats} lần stat lại, {watcher.full_rescans} lần quét lại toàn bộ.")
+        watcher.close()
+
+def _disk_usage_bytes(stat_result):
+    """Dung lượng thực sự chiếm trên đĩa (block đã cấp phát), thay vì kích thước biểu kiến."""
+    blocks = getattr(stat_result, "st_blocks", None)
+    if blocks is None:  # Windows không có st_blocks
+        return stat_result.st_size
+    return blocks * 512  # st_blocks luôn tính theo đơn vị 512 bytes
+
+def _du_scan_directory(dirpath, dir_bytes, seen_inodes):
+    """
+    Quét một thư mục cho chế độ --top-dirs.
+
+    Args:
+        dirpath (str): Thư mục cần quét.
+        dir_bytes (int): Dung lượng block của chính thư mục (đã stat từ thư mục cha).
+        seen_inodes (set): Tập (st_dev, st_ino) các file có nhiều hard link đã được tính.
+
+    Returns:
+        list: Frame [dirpath, pending_subdirs, total_bytes, file_count] cho ngăn xếp duyệt.
+    """
+    frame = [dirpath, [], dir_bytes, 0]
+    try:
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                    if entry.is_dir(follow_symlinks=False):
+                        frame[1].append((entry.path, _disk_usage_bytes(st)))
+                        continue
+                    # Hard link chỉ được tính một lần; chỉ cần nhớ inode có st_nlink > 1
+                    if st.st_nlink > 1:
+                        key = (st.st_dev, st.st_ino)
+                        if key in seen_inodes:
+                            continue
+                        seen_inodes.add(key)
+                    frame[2] += _disk_usage_bytes(st)
+                    frame[3] += 1
+                except FileNotFoundError:
+                    logger.debug(f"File {entry.path} không tìm thấy (có thể đã bị xóa giữa chừng).")
+                except OSError as e:
+                    logger.warning(f"Không thể stat '{entry.path}': {e}. Bỏ qua.")
+    except PermissionError:
+        logger.warning(f"Không có quyền truy cập thư mục: {dirpath}. Bỏ qua.")
+    except FileNotFoundError:
+        logger.debug(f"Thư mục {dirpath} không tìm thấy (có thể đã bị xóa giữa chừng).")
+    except OSError as e:
+        logger.warning(f"Không thể đọc thư mục '{dirpath}': {e}. Bỏ qua.")
+    return frame
+
+def find_top_directories(path='.', top_n=DEFAULT_LARGE_FILES_COUNT):
+    """
+    Tìm các thư mục chiếm nhiều dung lượng nhất (kiểu "du"), tính cả cây con.
+
+    Duyệt theo chiều sâu (post-order) trong một lần quét: tổng của một thư mục được
+    cộng vào thư mục cha ngay khi duyệt xong cây con của nó, nên bộ nhớ chỉ phụ thuộc
+    vào các thư mục trên đường đi hiện tại và top_n kết quả trong min-heap, không giữ
+    dict của mọi thư mục. Dung lượng tính theo block đã cấp phát và mỗi hard link
+    (st_dev, st_ino) chỉ được tính một lần.
+
+    Args:
+        path (str): Thư mục gốc cần phân tích.
+        top_n (int): Số lượng thư mục lớn nhất cần lấy.
+
+    Returns:
+        list: Danh sách các tuple (dirpath, total_bytes, file_count), giảm dần theo dung lượng.
+    """
+    logger.info(f"Bắt đầu tính dung lượng thư mục (kiểu du) trong '{path}'...")
+    try:
+        root_bytes = _disk_usage_bytes(os.lstat(path))
+    except OSError as e:
+        logger.error(f"Không thể truy cập '{path}': {e}")
+        return []
+
+    seen_inodes = set()
+    top_dirs = []
+    stack = [_du_scan_directory(path, root_bytes, seen_inodes)]
+    scanned = 0
+    while stack:
+        frame = stack[-1]
+        if frame[1]:
+            subdir, subdir_bytes = frame[1].pop()
+            stack.append(_du_scan_directory(subdir, subdir_bytes, seen_inodes))
+            continue
+        # Đã duyệt xong toàn bộ cây con: chốt tổng và cộng dồn lên thư mục cha
+        stack.pop()
+        dirpath, _, total_bytes, file_count = frame
+        scanned += 1
+        _push_bounded(top_dirs, (total_bytes, file_count, dirpath), top_n)
+        if stack:
+            stack[-1][2] += total_bytes
+            stack[-1][3] += file_count
+
+    logger.info(f"Phân tích hoàn tất. Đã duyệt {scanned} thư mục.")
+    return [(dirpath, total_bytes, file_count) for total_bytes, file_count, dirpath in sorted(top_dirs, reverse=True)]
+
+class DiskUsageIndex:
+    """
+    Chỉ mục dung lượng đĩa lưu trên SQLite, dùng cho các lần --find-large lặp lại.
+
+    Chỉ mục ghi lại cho mỗi thư mục: mtime, tổng kích thước/số lượng file nằm trực
+    tiếp trong thư mục và tổng kích thước cả cây con; cùng với kích thước của các
+    file >= INDEX_MIN_FILE_BYTES. Ở lần cập nhật tiếp theo, thư mục nào có mtime
+    không đổi sẽ không bị liệt kê lại (danh sách thư mục con lấy từ chỉ mục), chỉ
+    các file lớn đã biết được stat lại để bắt kịp file tăng kích thước tại chỗ.
+
+    Lưu ý: mtime thư mục chỉ thay đổi khi thêm/xóa/đổi tên entry, nên file nhỏ
+    (< INDEX_MIN_FILE_BYTES) lớn dần trong một thư mục không đổi sẽ chỉ được cập
+    nhật khi thư mục đó thay đổi.
+    """
+
+    INDEX_MIN_FILE_BYTES = BYTES_PER_MB
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS dirs (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            mtime_ns INTEGER NOT NULL,
+            file_bytes INTEGER NOT NULL,
+            file_count INTEGER NOT NULL,
+            subtree_bytes INTEGER NOT NULL DEFAULT 0,
+            scan_id INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS dirs_subtree_bytes ON dirs(subtree_bytes);
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            dir TEXT NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_size ON files(size);
+        CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+    """
+
+    def __init__(self, db_path):
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self._SCHEMA)
 
-    # Sắp xếp lần cuối và lấy top_n (quan trọng nếu số file < top_n)
-    large_files.sort(key=lambda x: x[1], reverse=True)
-    logger.info(f"Tìm kiếm hoàn tất. Tìm thấy {len(large_files)} file thỏa mãn.")
-    return large_files[:top_n]
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _subtree_range(root):
+        """Trả về (root, lo, hi) để lọc các path nằm trong root bằng so sánh chuỗi (dùng được index)."""
+        root = os.path.abspath(root)
+        prefix = root if root.endswith(os.sep) else root + os.sep
+        # Mọi path bắt đầu bằng prefix đều nằm trong [prefix, prefix với ký tự cuối + 1)
+        return root, prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def _scan_directory(self, dirpath, known_dirs, children, known_files):
+        """
+        Quét một thư mục cho chỉ mục. Chạy trong thread của _walk_tree nên chỉ đọc
+        (không ghi) các dict trạng thái cũ.
+
+        Returns:
+            tuple: (subdirs, (mtime_ns, file_bytes, file_count, large_files, reused))
+                   hoặc (subdirs, None) nếu thư mục không đọc được.
+        """
+        try:
+            # Lấy mtime trước khi liệt kê: nếu thư mục đổi trong lúc quét, lần sau sẽ quét lại
+            mtime_ns = os.stat(dirpath).st_mtime_ns
+        except OSError as e:
+            logger.warning(f"Không thể stat thư mục '{dirpath}': {e}. Bỏ qua.")
+            return [], None
+
+        known = known_dirs.get(dirpath)
+        if known and known[0] == mtime_ns:
+            _, file_bytes, file_count = known
+            large_files = []
+            for filepath, old_size in known_files.get(dirpath, ()):
+                try:
+                    size = os.lstat(filepath).st_size
+                except OSError:
+                    # File biến mất dù mtime thư mục không đổi (hiếm, ví dụ mtime bị đặt lại thủ công)
+                    file_bytes -= old_size
+                    file_count -= 1
+                    continue
+                file_bytes += size - old_size
+                if size >= self.INDEX_MIN_FILE_BYTES:
+                    large_files.append((filepath, size))
+            return children.get(dirpath, []), (mtime_ns, file_bytes, file_count, large_files, True)
+
+        subdirs = []
+        large_files = []
+        file_bytes = 0
+        file_count = 0
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            size = entry.stat(follow_symlinks=False).st_size
+                            file_bytes += size
+                            file_count += 1
+                            if size >= self.INDEX_MIN_FILE_BYTES:
+                                large_files.append((entry.path, size))
+                    except FileNotFoundError:
+                        logger.debug(f"File {entry.path} không tìm thấy (có thể đã bị xóa giữa chừng).")
+                    except OSError as e:
+                        logger.warning(f"Không thể lấy kích thước file '{entry.path}': {e}. Bỏ qua.")
+        except PermissionError:
+            logger.warning(f"Không có quyền truy cập thư mục: {dirpath}. Bỏ qua.")
+            return [], None
+        except OSError as e:
+            logger.warning(f"Không thể đọc thư mục '{dirpath}': {e}. Bỏ qua.")
+            return [], None
+        return subdirs, (mtime_ns, file_bytes, file_count, large_files, False)
+
+    def update(self, root, workers=DEFAULT_SCAN_WORKERS):
+        """
+        Cập nhật chỉ mục cho cây thư mục root, chỉ liệt kê lại các thư mục có mtime thay đổi.
+
+        Returns:
+            dict: Thống kê lần cập nhật: scanned (số thư mục được liệt kê lại),
+                  reused (số thư mục dùng lại từ chỉ mục), removed (số thư mục đã biến mất).
+        """
+        root, lo, hi = self._subtree_range(root)
+        cur = self.conn.cursor()
+        scan_id = cur.execute("SELECT COALESCE(MAX(scan_id), 0) + 1 FROM dirs").fetchone()[0]
+        old_root_bytes = cur.execute("SELECT subtree_bytes FROM dirs WHERE path = ?", (root,)).fetchone()
+        old_root_bytes = old_root_bytes[0] if old_root_bytes else 0
+
+        # Nạp trạng thái cũ của cây vào bộ nhớ để các thread quét chỉ cần đọc dict
+        known_dirs = {}
+        children = {}
+        for path, parent, mtime_ns, file_bytes, file_count in cur.execute(
+                "SELECT path, parent, mtime_ns, file_bytes, file_count FROM dirs "
+                "WHERE path = ? OR (path >= ? AND path < ?)", (root, lo, hi)):
+            known_dirs[path] = (mtime_ns, file_bytes, file_count)
+            if path != root:
+                children.setdefault(parent, []).append(path)
+        known_files = {}
+        for dirpath, filepath, size in cur.execute(
+                "SELECT dir, path, size FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)", (root, lo, hi)):
+            known_files.setdefault(dirpath, []).append((filepath, size))
+
+        scan_func = functools.partial(self._scan_directory, known_dirs=known_dirs,
+                                      children=children, known_files=known_files)
+        seen = {}
+        stats = {"scanned": 0, "reused": 0, "removed": 0}
+        with self.conn:
+            for dirpath, payload in _walk_tree(root, scan_func, workers):
+                if payload is None:
+                    continue
+                mtime_ns, file_bytes, file_count, large_files, reused = payload
+                parent = os.path.dirname(dirpath)
+                seen[dirpath] = [parent, file_bytes]
+                stats["reused" if reused else "scanned"] += 1
+                cur.execute("INSERT OR REPLACE INTO dirs (path, parent, mtime_ns, file_bytes, file_count, scan_id) "
+                            "VALUES (?, ?, ?, ?, ?, ?)", (dirpath, parent, mtime_ns, file_bytes, file_count, scan_id))
+                if reused or dirpath in known_files:
+                    cur.execute("DELETE FROM files WHERE dir = ?", (dirpath,))
+                cur.executemany("INSERT OR REPLACE INTO files (path, dir, size) VALUES (?, ?, ?)",
+                                ((filepath, dirpath, size) for filepath, size in large_files))
+
+            # Thư mục không còn thấy trong lần quét này đã bị xóa (hoặc không còn quyền đọc)
+            removed = [path for path in known_dirs if path not in seen]
+            stats["removed"] = len(removed)
+            cur.executemany("DELETE FROM dirs WHERE path = ?", ((path,) for path in removed))
+            cur.executemany("DELETE FROM files WHERE dir = ?", ((path,) for path in removed))
+
+            # Cộng dồn kích thước cây con từ thư mục sâu nhất lên thư mục cha
+            subtree = {path: info[1] for path, info in seen.items()}
+            for path in sorted(seen, key=lambda p: p.count(os.sep), reverse=True):
+                parent = seen[path][0]
+                if parent != path and parent in subtree:
+                    subtree[parent] += subtree[path]
+            cur.executemany("UPDATE dirs SET subtree_bytes = ? WHERE path = ?",
+                            ((size, path) for path, size in subtree.items()))
+
+            # Các thư mục tổ tiên của root đã có trong chỉ mục (từ lần cập nhật một cây lớn hơn)
+            # nhận phần chênh lệch, để tổng cây con của chúng không bị cũ
+            delta = subtree.get(root, 0) - old_root_bytes
+            if delta:
+                ancestors = []
+                path = root
+                while os.path.dirname(path) != path:
+                    path = os.path.dirname(path)
+                    ancestors.append((delta, path))
+                cur.executemany("UPDATE dirs SET subtree_bytes = subtree_bytes + ? WHERE path = ?", ancestors)
+        return stats
+
+    def top_files(self, root, top_n=DEFAULT_LARGE_FILES_COUNT, min_size_bytes=DEFAULT_LARGE_FILES_MIN_SIZE_MB * BYTES_PER_MB):
+        """Trả về list các tuple (filepath, size) lớn nhất trong root, lấy trực tiếp từ chỉ mục."""
+        if min_size_bytes < self.INDEX_MIN_FILE_BYTES:
+            logger.warning(f"Chỉ mục chỉ lưu file >= {get_size(self.INDEX_MIN_FILE_BYTES)}; các file nhỏ hơn sẽ không có trong kết quả.")
+        root, lo, hi = self._subtree_range(root)
+        return self.conn.execute(
+            "SELECT path, size FROM files WHERE size >= ? AND (dir = ? OR (dir >= ? AND dir < ?)) "
+            "ORDER BY size DESC LIMIT ?", (min_size_bytes, root, lo, hi, top_n)).fetchall()
+
+    def top_files_per_directory(self, root, per_dir_n, min_size_bytes=DEFAULT_LARGE_FILES_MIN_SIZE_MB * BYTES_PER_MB):
+        """Trả về dict {dirpath: list các tuple (filepath, size)} gồm per_dir_n file lớn nhất của từng thư mục trong root."""
+        root, lo, hi = self._subtree_range(root)
+        result = {}
+        for dirpath, filepath, size in self.conn.execute(
+                "SELECT dir, path, size FROM ("
+                "  SELECT dir, path, size, ROW_NUMBER() OVER (PARTITION BY dir ORDER BY size DESC) AS rank FROM files"
+                "  WHERE size >= ? AND (dir = ? OR (dir >= ? AND dir < ?))"
+                ") WHERE rank <= ? ORDER BY dir, size DESC", (min_size_bytes, root, lo, hi, per_dir_n)):
+            result.setdefault(dirpath, []).append((filepath, size))
+        return result
+
+    def top_directories(self, root, top_n=DEFAULT_LARGE_FILES_COUNT):
+        """Trả về list các tuple (dirpath, subtree_bytes) có tổng dung lượng cây con lớn nhất trong root."""
+        root, lo, hi = self._subtree_range(root)
+        return self.conn.execute(
+            "SELECT path, subtree_bytes FROM dirs WHERE path = ? OR (path >= ? AND path < ?) "
+            "ORDER BY subtree_bytes DESC LIMIT ?", (root, lo, hi, top_n)).fetchall()
 
 def display_disk_info(disk_info_list, show_io=False):
     """Hiển thị thông tin ổ cứng và I/O dưới dạng bảng."""
@@ -322,6 +1547,10 @@ def display_disk_info(disk_info_list, show_io=False):
     disk_data = []
     warnings = []
     for disk in disk_info_list:
+        if disk["unreachable"]:
+            disk_data.append([disk["device"], disk["mountpoint"], disk["fstype"], "-", "-", "-", "Không phản hồi"])
+            warnings.append(f"CẢNH BÁO: Ổ đĩa {disk['device']} ({disk['mountpoint']}) không phản hồi (có thể mount mạng bị treo)!")
+            continue
         disk_data.append([
             disk["device"],
             disk["mountpoint"],
@@ -402,6 +1631,40 @@ def display_large_files(large_files_list):
                    tablefmt="pretty"))
 
 
+def display_directory_report(result, title="THƯ MỤC CÓ TỔNG DUNG LƯỢNG FILE LỚN NHẤT", size_header="Tổng dung lượng file"):
+     """Hiển thị top thư mục theo tổng dung lượng và top file trong từng thư mục."""
+     if result["directories"]:
+         print(f"\n=== TOP {len(result['directories'])} {title} ===")
+         dir_data = [[dirpath, get_size(total)] for dirpath, total in result["directories"]]
+         print(tabulate(dir_data,
+                       headers=["Thư mục", size_header],
+                       tablefmt="pretty"))
+
+     if result["per_directory"]:
+         print("\n=== FILE LỚN NHẤT THEO TỪNG THƯ MỤC ===")
+         per_dir_data = []
+         # Thư mục chứa file lớn nhất được hiển thị trước
+         for dirpath, files in sorted(result["per_directory"].items(), key=lambda item: item[1][0][1], reverse=True):
+             for filepath, size in files:
+                 per_dir_data.append([dirpath, os.path.basename(filepath), get_size(size)])
+         print(tabulate(per_dir_data,
+                       headers=["Thư mục", "File", "Kích thước"],
+                       tablefmt="pretty"))
+
+
+def display_top_directories(top_dirs_list):
+     """Hiển thị các thư mục chiếm nhiều dung lượng nhất (chế độ --top-dirs)."""
+     if not top_dirs_list:
+         logger.info("Không có thư mục nào để hiển thị.")
+         return
+
+     print(f"\n=== TOP {len(top_dirs_list)} THƯ MỤC CHIẾM NHIỀU DUNG LƯỢNG NHẤT ===")
+     dir_data = [[dirpath, get_size(total_bytes), f"{file_count:,}"] for dirpath, total_bytes, file_count in top_dirs_list]
+     print(tabulate(dir_data,
+                   headers=["Thư mục", "Dung lượng trên đĩa", "Số file"],
+                   tablefmt="pretty"))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Công cụ giám sát và phân tích ổ cứng.",
@@ -413,6 +1676,7 @@ def main():
     action_group.add_argument("-i", "--info", action="store_true", help="Hiển thị thông tin ổ cứng hiện tại.")
     action_group.add_argument("-m", "--monitor", action="store_true", help="Giám sát ổ cứng theo thời gian.")
     action_group.add_argument("-f", "--find-large", action="store_true", help="Tìm các file lớn trong một đường dẫn.")
+    action_group.add_argument("--top-dirs", action="store_true", help="Tìm các thư mục chiếm nhiều dung lượng nhất (tính cả cây con, kiểu du) trong --search-path.")
 
     # General options
     parser.add_argument("--io", action="store_true", help="Bao gồm thông tin I/O (tích lũy) khi hiển thị thông tin (-i).")
@@ -425,20 +1689,45 @@ def main():
     parser.add_argument("--include-device", nargs='+', default=None, # ['/dev/sd', '/dev/nvme', '/dev/vd'] might be good defaults on Linux
                         help="Chỉ bao gồm các thiết bị có đường dẫn bắt đầu bằng các pattern này (vd: /dev/sd /dev/nvme).")
 
+    parser.add_argument("--usage-timeout", type=float, default=DEFAULT_USAGE_TIMEOUT, help="Hạn chờ (giây) lấy dung lượng mỗi mountpoint; mount mạng treo quá hạn được báo là không phản hồi.")
+
     # Monitoring options
     monitor_group = parser.add_argument_group('Tùy chọn Giám sát (--monitor)')
     monitor_group.add_argument("-d", "--duration", type=int, default=DEFAULT_MONITOR_DURATION_SEC, help="Thời gian giám sát (giây).")
     monitor_group.add_argument("-n", "--interval", type=int, default=DEFAULT_MONITOR_INTERVAL_SEC, help="Khoảng thời gian giữa các lần kiểm tra (giây).")
     monitor_group.add_argument("-t", "--threshold", type=int, default=DEFAULT_THRESHOLD_PERCENT, help="Ngưỡng cảnh báo sử dụng ổ cứng (%%).")
+    monitor_group.add_argument("--jitter", type=float, default=0.0, help="Độ lệch pha ngẫu nhiên tối đa (giây) của lần kiểm tra đầu tiên, tránh nhiều máy lấy mẫu cùng lúc.")
+    monitor_group.add_argument("--history-dir", metavar="DIR", help="Thư mục lưu lịch sử mẫu dạng bộ đệm vòng (mmap), giữ lại giữa các lần chạy.")
+    monitor_group.add_argument("--whole-disks", action="store_true", help="Chỉ hiển thị I/O của đĩa nguyên (theo /sys/block), bỏ các phân vùng.")
+    monitor_group.add_argument("--sample-log", metavar="FILE", help="Ghi mọi mẫu vào log nhị phân nén theo block (đọc lại bằng sample_log.py).")
+    monitor_group.add_argument("--forecast-window", type=int, default=DEFAULT_FORECAST_WINDOW, help="Cửa sổ mẫu (giây) dùng cho hồi quy dự báo thời điểm đầy.")
+    monitor_group.add_argument("--forecast-horizon", type=int, default=DEFAULT_FORECAST_HORIZON, help="Cảnh báo khi dự báo phân vùng đầy trong số giây này (0 = tắt).")
     monitor_group.add_argument("-p", "--path", dest="monitor_path", help="Đường dẫn mountpoint cụ thể cần giám sát (nếu không chỉ định, giám sát tất cả).") # Đổi tên dest để tránh xung đột với path của find-large
 
     # Find Large Files options
-    find_group = parser.add_argument_group('Tùy chọn Tìm File Lớn (--find-large)')
+    find_group = parser.add_argument_group('Tùy chọn Tìm File Lớn (--find-large, --top-dirs)')
     find_group.add_argument("--search-path", default=".", help="Đường dẫn thư mục gốc để bắt đầu tìm kiếm file lớn.")
-    find_group.add_argument("-c", "--count", type=int, default=DEFAULT_LARGE_FILES_COUNT, help="Số lượng file lớn nhất cần hiển thị.")
+    find_group.add_argument("-c", "--count", type=int, default=DEFAULT_LARGE_FILES_COUNT, help="Số lượng file (hoặc thư mục với --top-dirs) lớn nhất cần hiển thị.")
     find_group.add_argument("-s", "--min-size", type=int, default=DEFAULT_LARGE_FILES_MIN_SIZE_MB, help="Kích thước tối thiểu của file cần tìm (MB).")
+    find_group.add_argument("--per-dir", type=int, default=0, help="Hiển thị thêm N file lớn nhất trong từng thư mục (0 = tắt).")
+    find_group.add_argument("--dir-count", type=int, default=0, help="Hiển thị thêm N thư mục có tổng dung lượng file trực tiếp lớn nhất (với --index: tổng cả cây con; 0 = tắt).")
+    find_group.add_argument("--index", metavar="FILE", help="File chỉ mục SQLite: cập nhật tăng dần (chỉ quét lại thư mục có mtime thay đổi) rồi trả lời từ chỉ mục.")
+    find_group.add_argument("--from-index", action="store_true", help="Chỉ truy vấn chỉ mục (--index), không quét lại đĩa.")
+    find_group.add_argument("--watch", action="store_true", help="Sau lần quét đầu, theo dõi thay đổi bằng inotify và hiển thị lại top file lớn khi thay đổi (chu kỳ -n, thời gian -d).")
+    find_group.add_argument("--rescan-interval", type=int, default=DEFAULT_WATCH_RESCAN_SEC, help="Chu kỳ (giây) quét lại các thư mục không đặt được inotify watch (--watch).")
+    find_group.add_argument("-w", "--workers", type=int, default=DEFAULT_SCAN_WORKERS, help="Số thread quét thư mục song song (1 = quét tuần tự).")
 
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("Số thread quét (--workers) phải lớn hơn hoặc bằng 1.")
+    if args.forecast_window <= 0 or args.forecast_horizon < 0:
+        parser.error("--forecast-window phải lớn hơn 0 và --forecast-horizon không được âm.")
+    if args.usage_timeout <= 0:
+        parser.error("Hạn chờ (--usage-timeout) phải lớn hơn 0.")
+    if args.watch and (not args.find_large or args.index):
+        parser.error("--watch chỉ dùng với --find-large và không dùng cùng --index.")
+    if args.from_index and not args.index:
+        parser.error("--from-index cần chỉ định file chỉ mục bằng --index.")
 
     # --- Setup Logging ---
     if args.debug:
@@ -458,23 +1747,75 @@ def main():
                 threshold=args.threshold,
                 mountpoint=args.monitor_path,
                 ignore_fstypes=args.ignore_fstype,
-                include_devices=args.include_device
+                include_devices=args.include_device,
+                jitter=args.jitter,
+                history_dir=args.history_dir,
+                sample_log=args.sample_log,
+                whole_disks=args.whole_disks,
+                usage_timeout=args.usage_timeout,
+                forecast_window=args.forecast_window,
+                forecast_horizon=args.forecast_horizon
             )
         elif args.find_large:
             min_size_bytes = args.min_size * BYTES_PER_MB
-            large_files_list = find_large_files(
-                path=args.search_path,
-                top_n=args.count,
-                min_size_bytes=min_size_bytes
-            )
-            display_large_files(large_files_list)
+            if args.watch:
+                watch_large_files(
+                    path=args.search_path,
+                    top_n=args.count,
+                    min_size_bytes=min_size_bytes,
+                    interval=args.interval,
+                    duration=args.duration,
+                    workers=args.workers,
+                    rescan_interval=args.rescan_interval
+                )
+            elif args.index:
+                with DiskUsageIndex(args.index) as index:
+                    if not args.from_index:
+                        logger.info(f"Cập nhật chỉ mục '{args.index}' cho '{args.search_path}' ({args.workers} thread)...")
+                        start = time.monotonic()
+                        stats = index.update(args.search_path, workers=args.workers)
+                        logger.info(f"Cập nhật chỉ mục xong sau {time.monotonic() - start:.1f}s: "
+                                    f"{stats['scanned']} thư mục quét lại, {stats['reused']} thư mục dùng lại, "
+                                    f"{stats['removed']} thư mục đã xóa.")
+                    display_large_files(index.top_files(args.search_path, args.count, min_size_bytes))
+                    if args.dir_count > 0 or args.per_dir > 0:
+                        display_directory_report(
+                            {"directories": index.top_directories(args.search_path, args.dir_count) if args.dir_count > 0 else [],
+                             "per_directory": index.top_files_per_directory(args.search_path, args.per_dir, min_size_bytes) if args.per_dir > 0 else {}},
+                            title="THƯ MỤC CÓ TỔNG DUNG LƯỢNG CÂY CON LỚN NHẤT (TỪ CHỈ MỤC)",
+                            size_header="Tổng dung lượng cây con")
+            elif args.per_dir > 0 or args.dir_count > 0:
+                # Một lần quét duy nhất cho cả top file, top file từng thư mục và top thư mục
+                logger.info(f"Bắt đầu phân tích file lớn hơn {get_size(min_size_bytes)} trong '{args.search_path}' ({args.workers} thread)...")
+                result = analyze_large_files(
+                    path=args.search_path,
+                    top_n=args.count,
+                    min_size_bytes=min_size_bytes,
+                    per_dir_n=args.per_dir,
+                    top_dirs_n=args.dir_count,
+                    workers=args.workers
+                )
+                logger.info(f"Phân tích hoàn tất. Tìm thấy {result['matched']} file thỏa mãn.")
+                display_large_files(result["files"])
+                display_directory_report(result)
+            else:
+                large_files_list = find_large_files(
+                    path=args.search_path,
+                    top_n=args.count,
+                    min_size_bytes=min_size_bytes,
+                    workers=args.workers
+                )
+                display_large_files(large_files_list)
+        elif args.top_dirs:
+            top_dirs_list = find_top_directories(path=args.search_path, top_n=args.count)
+            display_top_directories(top_dirs_list)
         elif args.info:
-            disk_info_list = get_disk_info(args.ignore_fstype, args.include_device)
+            disk_info_list = get_disk_info(args.ignore_fstype, args.include_device, usage_timeout=args.usage_timeout)
             display_disk_info(disk_info_list, show_io=args.io)
         else:
             # Default action: Show info (without IO unless specified)
             logger.info("Không có action cụ thể nào được chọn. Hiển thị thông tin ổ cứng cơ bản.")
-            disk_info_list = get_disk_info(args.ignore_fstype, args.include_device)
+            disk_info_list = get_disk_info(args.ignore_fstype, args.include_device, usage_timeout=args.usage_timeout)
             display_disk_info(disk_info_list, show_io=args.io) # Vẫn tôn trọng --io nếu có
 
     except Exception as e:
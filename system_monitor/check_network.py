@@ -8,12 +8,24 @@ Yeu cau cai dat thu vien: pip install psutil
 
 import os
 import socket
-import subprocess
 import time
 import platform
-import re # Them module re de phan tich output ping
+import argparse
+import asyncio
+import collections
+import errno
+import functools
+import ipaddress
+import itertools
+import math
+import struct
 from datetime import datetime
 
+from counter_table import CounterTable, HAVE_NUMPY, np
+from proc_snapshot import get_snapshot
+from sample_store import open_history, format_stats
+from scheduler import FixedRateScheduler
+
 # Thu kiem tra xem psutil da duoc cai dat chua
 try:
     import psutil
@@ -22,6 +34,45 @@ except ImportError:
     print("Vui long chay: pip install psutil")
     exit()
 
+# So ket noi TCP dong thoi toi da khi quet cong
+DEFAULT_SCAN_CONCURRENCY = 1000
+
+# Do do tre (ping) trong tien trinh
+ICMP_ECHO_REQUEST = {socket.AF_INET: 8, socket.AF_INET6: 128}
+ICMP_ECHO_REPLY = {socket.AF_INET: 0, socket.AF_INET6: 129}
+DEFAULT_TCP_PROBE_PORT = 53 # Cong dung khi khong the gui ICMP (giong check_connection)
+
+# Doc ket noi TCP truc tiep tu /proc/net (trang thai duoi dang hex, 01 = ESTABLISHED)
+PROC_NET_TCP_FILES = (("/proc/net/tcp", socket.AF_INET), ("/proc/net/tcp6", socket.AF_INET6))
+TCP_STATE_ESTABLISHED = "01"
+# info: dict cac truong tcp_info (chi co khi doc qua netlink), None voi cac backend khac
+TcpConnection = collections.namedtuple("TcpConnection", ["family", "laddr", "raddr", "inode", "pid", "info"], defaults=(None, None))
+CONNECTION_BACKENDS = ("auto", "netlink", "proc", "psutil")
+
+# Netlink sock_diag (linux/sock_diag.h, linux/inet_diag.h)
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+INET_DIAG_INFO = 2
+TCP_ESTABLISHED = 1
+NLMSG_HEADER = struct.Struct("=IHHII") # len, type, flags, seq, pid
+INET_DIAG_REQ_V2 = struct.Struct("=BBBxI48s") # family, protocol, ext, states, sockid (de trong = moi socket)
+INET_DIAG_MSG = struct.Struct("=BBBB2s2s16s16sI8sIIIII") # family, state, timer, retrans, sport, dport, src, dst, if, cookie, expires, rqueue, wqueue, uid, inode
+RTATTR_HEADER = struct.Struct("=HH") # len, type
+# struct tcp_info: 8 truong u8 roi den cac truong u32 (rto, ato, ... total_retrans la truong u32 thu 24)
+TCP_INFO_U8 = struct.Struct("=8B")
+TCP_INFO_U32 = struct.Struct("=24I")
+
+# Mac dinh cho che do giam sat (--monitor)
+DEFAULT_MONITOR_DURATION = 60
+DEFAULT_MONITOR_INTERVAL = 5
+DEFAULT_ERROR_THRESHOLD = 1.0 # goi loi/huy moi giay
+NIC_COUNTER_FIELDS = ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv",
+                      "errin", "errout", "dropin", "dropout")
+
 def check_connection(host="8.8.8.8", port=53, timeout=3):
     """Kiem tra ket noi internet bang cach ket noi den Google DNS"""
     try:
@@ -34,76 +85,184 @@ def check_connection(host="8.8.8.8", port=53, timeout=3):
         # print(f"Loi ket noi: {e}")
         return False
 
-def get_ping_stats(host="8.8.8.8", count=4):
+def _icmp_checksum(data):
+    """Tinh checksum Internet (RFC 1071) cho goi ICMP"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+def _percentile(sorted_values, percent):
+    """Phan vi (noi suy tuyen tinh) tren danh sach da sap xep"""
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def _summarize_rtts(host, method, rtts):
     """
-    Lay thong ke ping va phan tich ket qua.
-    Tra ve mot dictionary chua cac thong so hoac None neu loi.
+    Tong hop ket qua cac lan do (list RTT tinh bang giay, None = mat goi) thanh dict thong ke.
+    Giu cac khoa cu cua get_ping_stats (min_rtt, avg_rtt, max_rtt, packets_*) va bo sung
+    mdev_rtt, jitter (trung binh do lech giua hai lan do lien tiep) va cac phan vi p50/p90/p99.
     """
-    system = platform.system().lower()
-    command = []
+    received = [rtt * 1000 for rtt in rtts if rtt is not None]
+    sent = len(rtts)
+    stats = {
+        "host": host,
+        "method": method,
+        "packets_sent": sent,
+        "packets_received": len(received),
+        "packets_lost": sent - len(received),
+        "packet_loss_percent": round((sent - len(received)) * 100 / sent) if sent else 0
+    }
+    if not received:
+        return stats
+
+    avg = sum(received) / len(received)
+    ordered = sorted(received)
+    stats.update({
+        "min_rtt": round(ordered[0], 3),
+        "avg_rtt": round(avg, 3),
+        "max_rtt": round(ordered[-1], 3),
+        # mdev giong lenh ping: do lech chuan cua cac RTT
+        "mdev_rtt": round(math.sqrt(max(0.0, sum(r * r for r in received) / len(received) - avg * avg)), 3),
+        "jitter": round(sum(abs(b - a) for a, b in zip(received, received[1:])) / (len(received) - 1), 3) if len(received) > 1 else 0.0,
+        "p50_rtt": round(_percentile(ordered, 50), 3),
+        "p90_rtt": round(_percentile(ordered, 90), 3),
+        "p99_rtt": round(_percentile(ordered, 99), 3)
+    })
+    return stats
+
+async def _icmp_probes(loop, family, ip, count, interval, timeout):
+    """
+    Do RTT bang ICMP echo qua socket datagram (khong can quyen root tren Linux khi
+    net.ipv4.ping_group_range cho phep, va tren macOS).
+    Nem OSError neu he thong khong cho tao socket ICMP datagram.
+    Tra ve list RTT (giay) hoac None cho goi bi mat.
+    """
+    if family == socket.AF_INET:
+        sock = socket.socket(family, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    else:
+        sock = socket.socket(family, socket.SOCK_DGRAM, socket.IPPROTO_ICMPV6)
+    sock.setblocking(False)
+    pending = {} # seq -> (thoi diem gui, future)
+
+    async def receiver():
+        while True:
+            try:
+                data = await loop.sock_recv(sock, 2048)
+            except OSError:
+                continue # Loi ICMP (vd host unreachable) tra ve socket da connect
+            recv_time = time.perf_counter()
+            if family == socket.AF_INET and len(data) >= 20 and data[0] >> 4 == 4:
+                data = data[(data[0] & 0x0f) * 4:] # macOS tra ve ca IP header
+            if len(data) < 8 or data[0] != ICMP_ECHO_REPLY[family]:
+                continue
+            entry = pending.get(struct.unpack("!H", data[6:8])[0])
+            if entry and not entry[1].done():
+                entry[1].set_result(recv_time - entry[0])
+
     try:
-        if system == "windows":
-            command = ["ping", "-n", str(count), host]
-        else:  # Linux va macOS
-            command = ["ping", "-c", str(count), host]
-
-        # Tang timeout cho subprocess de tranh bi treo neu ping lau
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-        output, error = process.communicate(timeout=15) # Timeout 15 giay
-
-        if process.returncode != 0:
-             # Neu co loi stderr, in ra de debug
-            if error:
-                # print(f"Loi ping stderr: {error.strip()}")
-                # Co the tra ve loi cu the hon neu can
-                return {"error": f"Ping command failed with error: {error.strip()}"}
-            return {"error": f"Khong the ping den may chu {host}. Ma loi: {process.returncode}"}
-
-        # Phan tich output de lay thong tin chi tiet
-        stats = {"host": host}
-        if system == "windows":
-            loss_match = re.search(r"Lost = (\d+) \((\d+)% loss\)", output)
-            # Tim dong chua thong ke RTT (co the khac nhau tuy ngon ngu he thong)
-            rtt_match = re.search(r"Minimum = (\d+)ms, Maximum = (\d+)ms, Average = (\d+)ms", output) \
-                     or re.search(r"Thoi gian di ve vong nho nhat = (\d+)ms, Lon nhat = (\d+)ms, Trung binh = (\d+)ms", output) # Tieng Viet
-
-            if loss_match:
-                stats["packets_sent"] = count
-                stats["packets_lost"] = int(loss_match.group(1))
-                stats["packet_loss_percent"] = int(loss_match.group(2))
-                stats["packets_received"] = count - stats["packets_lost"]
-            if rtt_match:
-                stats["min_rtt"] = int(rtt_match.group(1))
-                stats["max_rtt"] = int(rtt_match.group(2))
-                stats["avg_rtt"] = int(rtt_match.group(3))
-        else: # Linux / macOS
-            loss_match = re.search(r"(\d+) packets transmitted, (\d+) received,.*? (\d+)% packet loss", output)
-            rtt_match = re.search(r"rtt min/avg/max/mdev = ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+) ms", output)
-
-            if loss_match:
-                stats["packets_sent"] = int(loss_match.group(1))
-                stats["packets_received"] = int(loss_match.group(2))
-                stats["packet_loss_percent"] = int(loss_match.group(3))
-                stats["packets_lost"] = stats["packets_sent"] - stats["packets_received"]
-            if rtt_match:
-                stats["min_rtt"] = float(rtt_match.group(1))
-                stats["avg_rtt"] = float(rtt_match.group(2))
-                stats["max_rtt"] = float(rtt_match.group(3))
-
-        # Neu khong phan tich duoc gi, tra ve output tho
-        if len(stats) <= 1: # Chi co 'host'
-             return {"raw_output": output.strip()} # Tra ve output tho neu khong phan tich duoc
+        # connect() voi socket datagram hoan tat ngay; khong dung loop.sock_connect vi no
+        # goi lai getaddrinfo voi proto ICMP (khong duoc ho tro)
+        sock.connect((ip, 0))
+        recv_task = loop.create_task(receiver())
+        try:
+            for seq in range(count):
+                if seq:
+                    await asyncio.sleep(interval)
+                # Identifier do kernel tu dat theo socket; chi can khop sequence
+                header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST[family], 0, 0, 0, seq)
+                payload = b"itsupport-toolkit"
+                checksum = _icmp_checksum(header + payload)
+                packet = header[:2] + struct.pack("!H", checksum) + header[4:] + payload
+                pending[seq] = (time.perf_counter(), loop.create_future())
+                await loop.sock_sendall(sock, packet)
 
-        return stats
+            rtts = []
+            for seq in range(count):
+                send_time, future = pending[seq]
+                remaining = send_time + timeout - time.perf_counter()
+                if not future.done() and remaining > 0:
+                    await asyncio.wait({future}, timeout=remaining)
+                rtts.append(future.result() if future.done() else None)
+            return rtts
+        finally:
+            recv_task.cancel()
+    finally:
+        sock.close()
 
-    except subprocess.TimeoutExpired:
-        return {"error": f"Lenh ping toi {host} vuot qua thoi gian cho (15s)"}
-    except FileNotFoundError:
-        return {"error": "Loi: Khong tim thay lenh 'ping'. Kiem tra PATH."}
+async def _tcp_probes(loop, family, ip, port, count, interval, timeout):
+    """
+    Do RTT bang thoi gian bat tay TCP (SYN -> SYN/ACK hoac RST).
+    Ket noi bi tu choi (RST) van la mot vong di-ve hop le.
+    """
+    async def probe():
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+            return time.perf_counter() - start
+        except ConnectionRefusedError:
+            return time.perf_counter() - start
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            sock.close()
+
+    tasks = []
+    for seq in range(count):
+        if seq:
+            await asyncio.sleep(interval)
+        tasks.append(loop.create_task(probe()))
+    return await asyncio.gather(*tasks)
+
+async def probe_latency(host, count=4, interval=0.2, timeout=1.0, port=DEFAULT_TCP_PROBE_PORT, method="auto"):
+    """
+    Do do tre toi host ngay trong tien trinh (coroutine, chay duoc song song nhieu host).
+
+    method: "icmp", "tcp" hoac "auto" (thu ICMP datagram truoc, khong duoc thi dung TCP connect toi `port`).
+    Tra ve dict thong ke (xem _summarize_rtts) hoac {"error": ...}.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        return {"host": host, "error": f"Khong the phan giai ten may {host}: {e}"}
+    family, _, _, _, sockaddr = infos[0]
+    ip = sockaddr[0]
+
+    if method in ("auto", "icmp"):
+        try:
+            return _summarize_rtts(host, "icmp", await _icmp_probes(loop, family, ip, count, interval, timeout))
+        except OSError as e:
+            if method == "icmp":
+                return {"host": host, "error": f"Khong the gui ICMP toi {host}: {e}"}
+            # Khong co quyen tao socket ICMP datagram -> chuyen sang TCP
+    return _summarize_rtts(host, f"tcp/{port}", await _tcp_probes(loop, family, ip, port, count, interval, timeout))
+
+def probe_many(hosts, count=4, interval=0.2, timeout=1.0, port=DEFAULT_TCP_PROBE_PORT, method="auto"):
+    """Do do tre dong thoi toi nhieu host tren cung mot event loop. Tra ve dict {host: thong_ke}"""
+    async def run_all():
+        results = await asyncio.gather(*(probe_latency(host, count, interval, timeout, port, method) for host in hosts))
+        return dict(zip(hosts, results))
+    return asyncio.run(run_all())
+
+def get_ping_stats(host="8.8.8.8", count=4):
+    """
+    Lay thong ke ping (do trong tien trinh, khong goi lenh ping he thong).
+    Tra ve mot dictionary chua cac thong so, hoac {"error": ...} neu khong nhan duoc phan hoi nao.
+    """
+    try:
+        stats = probe_many([host], count=count)[host]
     except Exception as e:
-        # Ghi log loi cu the (tuy chon)
-        # print(f"Loi khong mong doi khi ping: {e}")
         return {"error": f"Loi khong mong doi khi ping: {e}"}
+    if "error" not in stats and stats["packets_received"] == 0:
+        return {"error": f"Khong nhan duoc phan hoi nao tu {host} ({stats['method']})"}
+    return stats
 
 
 def get_network_interfaces():
@@ -144,63 +303,505 @@ def get_network_stats():
         print(f"Loi khi lay thong ke luu luong mang: {e}")
         return None # Tra ve None neu co loi
 
-def get_network_connections():
-    """Liet ke cac ket noi mang dang hoat dong (TCP established)"""
-    connections = []
+def get_interface_counters():
+    """
+    Lay bo dem luu luong cua tung giao dien mang (pernic).
+    Tra ve tuple (thoi_diem_monotonic, {ten_nic: counters}) hoac (thoi_diem, None) neu loi.
+    """
+    try:
+        # nowrap=False: tu xu ly tran/reset bo dem trong _counter_delta de
+        # giao dien bi go ra roi cam lai (cung ten) khong bi cong don so lieu cu
+        counters = psutil.net_io_counters(pernic=True, nowrap=False)
+        return time.monotonic(), counters
+    except Exception as e:
+        print(f"Loi khi lay thong ke luu luong tung giao dien: {e}")
+        return time.monotonic(), None
+
+def _counter_delta(current, previous):
+    """
+    Tinh do chenh lech giua hai lan doc bo dem.
+    Neu bo dem giam: gia tri cu nam o nua tren cua khoang 32-bit thi coi la tran bo dem 32-bit,
+    nguoc lai coi la bo dem bi reset (vd driver nap lai) va tinh tu 0.
+    """
+    delta = current - previous
+    if delta >= 0:
+        return delta
+    if 2**31 <= previous < 2**32:
+        return delta + 2**32
+    return current
+
+def compute_interface_rates(previous, current, elapsed):
+    """
+    Tinh toc do (tren giay) cho tung giao dien giua hai lan lay mau.
+    Giao dien moi xuat hien chi duoc ghi nhan lam moc (chua co toc do),
+    giao dien da bien mat bi bo qua.
+    Tra ve dict {ten_nic: {ten_truong: gia_tri_moi_giay}}.
+    """
+    rates = {}
+    if not previous or not current or elapsed <= 0:
+        return rates
+    for nic, counters in current.items():
+        last = previous.get(nic)
+        if last is None:
+            continue
+        rates[nic] = {
+            field: _counter_delta(getattr(counters, field), getattr(last, field)) / elapsed
+            for field in NIC_COUNTER_FIELDS
+        }
+    return rates
+
+def _interface_problems(rate, bandwidth_threshold, error_threshold):
+    """Danh sach van de (vuot nguong) cua mot giao dien tu dict toc do"""
+    problems = []
+    if bandwidth_threshold and max(rate["bytes_recv"], rate["bytes_sent"]) >= bandwidth_threshold:
+        problems.append("BANG THONG")
+    if rate["errin"] + rate["errout"] >= error_threshold:
+        problems.append("LOI")
+    if rate["dropin"] + rate["dropout"] >= error_threshold:
+        problems.append("HUY GOI")
+    return problems
+
+def evaluate_interfaces(previous, current, elapsed, bandwidth_threshold=None,
+                        error_threshold=DEFAULT_ERROR_THRESHOLD, table=None):
+    """
+    Tinh toc do va danh gia nguong canh bao cho tung giao dien.
+
+    Co table (CounterTable, can NumPy): phep tru bo dem (ke ca xu ly tran 32-bit/reset),
+    chia cho thoi gian va so sanh nguong la cac phep toan ma tran tren moi giao dien cung luc.
+    Khong co table thi dung compute_interface_rates (Python thuan).
+
+    Tra ve dict {ten_nic: (dict toc do moi giay, danh sach van de)}.
+    """
+    if table is None:
+        rates = compute_interface_rates(previous, current, elapsed)
+        return {nic: (rate, _interface_problems(rate, bandwidth_threshold, error_threshold))
+                for nic, rate in rates.items()}
+
+    if current is None:
+        return {}
+    names, delta, valid = table.update(current)
+    if elapsed <= 0:
+        return {}
+    rates = delta / elapsed
+    column = lambda field: rates[:, table.column(field)]
+    alerts = [
+        ("BANG THONG", valid & (np.maximum(column("bytes_recv"), column("bytes_sent")) >= bandwidth_threshold)
+                       if bandwidth_threshold else np.zeros(len(names), dtype=bool)),
+        ("LOI", valid & (column("errin") + column("errout") >= error_threshold)),
+        ("HUY GOI", valid & (column("dropin") + column("dropout") >= error_threshold)),
+    ]
+    return {names[row]: (dict(zip(table.fields, rates[row].tolist())),
+                         [label for label, mask in alerts if mask[row]])
+            for row in np.flatnonzero(valid)}
+
+def _decode_proc_ip(hex_ip, family):
+    """Doi dia chi IP dang hex trong /proc/net/tcp* (cac tu 32 bit little-endian) thanh chuoi"""
+    raw = bytes.fromhex(hex_ip)
+    raw = b''.join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+    return socket.inet_ntop(family, raw)
+
+# Tren may can bang tai so remote host it hon rat nhieu so socket nen cache giup
+# moi dia chi chi phai giai ma mot lan
+_decode_proc_ip_cached = functools.lru_cache(maxsize=4096)(_decode_proc_ip)
+
+def _decode_proc_addr(hex_addr, family):
+    hex_ip, hex_port = hex_addr.split(':')
+    return _decode_proc_ip_cached(hex_ip, family), int(hex_port, 16)
+
+def iter_proc_tcp_sockets(state=TCP_STATE_ESTABLISHED):
+    """
+    Doc tuan tu /proc/net/tcp va /proc/net/tcp6, loc theo trang thai ngay khi doc tung dong.
+
+    Dong khong dung trang thai bi bo qua truoc khi giai ma dia chi, nen chi phi chu yeu
+    chi con la doc file. Chu so huu (PID) khong duoc tim o day.
+
+    Yields:
+        TcpConnection: (family, laddr, raddr, inode, pid=None)
+    """
+    for path, family in PROC_NET_TCP_FILES:
+        try:
+            f = open(path)
+        except OSError:
+            continue
+        with f:
+            next(f, None) # Dong tieu de
+            for line in f:
+                # "sl local_address rem_address st ..." - chi tach 4 truong dau de kiem tra trang thai
+                fields = line.split(None, 4)
+                if len(fields) < 5 or fields[3] != state:
+                    continue
+                # Phan con lai: tx:rx tr:when retrnsmt uid timeout inode ...
+                rest = fields[4].split(None, 6)
+                yield TcpConnection(family,
+                                    _decode_proc_addr(fields[1], family),
+                                    _decode_proc_addr(fields[2], family),
+                                    int(rest[5]))
+
+def _parse_tcp_info(data):
+    """Lay cac truong huu ich tu struct tcp_info (RTT tinh bang micro giay trong kernel)"""
+    if len(data) < TCP_INFO_U8.size + TCP_INFO_U32.size:
+        return None
+    u8 = TCP_INFO_U8.unpack_from(data)
+    u32 = TCP_INFO_U32.unpack_from(data, TCP_INFO_U8.size)
+    return {"rtt_ms": u32[15] / 1000, "rttvar_ms": u32[16] / 1000,
+            "retransmits": u8[2], "total_retrans": u32[23], "snd_cwnd": u32[18]}
+
+def _sock_diag_dump(sock, family, states, with_info):
+    """Gui mot yeu cau dump SOCK_DIAG_BY_FAMILY va sinh tung ban ghi inet_diag_msg"""
+    request = INET_DIAG_REQ_V2.pack(family, socket.IPPROTO_TCP,
+                                    1 << (INET_DIAG_INFO - 1) if with_info else 0,
+                                    states, b"")
+    sock.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(request), SOCK_DIAG_BY_FAMILY,
+                                NLM_F_REQUEST | NLM_F_DUMP, family, 0) + request)
+    addr_len = 4 if family == socket.AF_INET else 16
+    while True:
+        data = sock.recv(65536)
+        offset = 0
+        while offset + NLMSG_HEADER.size <= len(data):
+            msg_len, msg_type = NLMSG_HEADER.unpack_from(data, offset)[:2]
+            if msg_len < NLMSG_HEADER.size:
+                return
+            if msg_type == NLMSG_DONE:
+                return
+            if msg_type == NLMSG_ERROR:
+                error = struct.unpack_from("=i", data, offset + NLMSG_HEADER.size)[0]
+                raise OSError(-error, os.strerror(-error))
+            body = offset + NLMSG_HEADER.size
+            (_, _, _, _, sport, dport, src, dst, _, _, _, _, _, _, inode) = INET_DIAG_MSG.unpack_from(data, body)
+            info = None
+            # Cac thuoc tinh rtattr di sau inet_diag_msg, moi cai can le 4 byte
+            attr = body + INET_DIAG_MSG.size
+            end = offset + msg_len
+            while attr + RTATTR_HEADER.size <= end:
+                attr_len, attr_type = RTATTR_HEADER.unpack_from(data, attr)
+                if attr_len < RTATTR_HEADER.size:
+                    break
+                if attr_type == INET_DIAG_INFO:
+                    info = _parse_tcp_info(data[attr + RTATTR_HEADER.size:attr + attr_len])
+                attr += (attr_len + 3) & ~3
+            yield TcpConnection(family,
+                                (socket.inet_ntop(family, src[:addr_len]), int.from_bytes(sport, "big")),
+                                (socket.inet_ntop(family, dst[:addr_len]), int.from_bytes(dport, "big")),
+                                inode, None, info)
+            offset += (msg_len + 3) & ~3
+
+def open_sock_diag():
+    """Mo socket NETLINK_SOCK_DIAG; nem OSError (hoac AttributeError ngoai Linux) neu khong ho tro"""
+    return socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_SOCK_DIAG)
+
+def iter_sock_diag_sockets(sock, states=1 << TCP_ESTABLISHED, with_info=True):
+    """
+    Liet ke socket TCP qua netlink sock_diag. Kernel tu loc theo trang thai (bitmask
+    1 << TCP_*), nen voi hang tram nghin socket chi cac ket noi ESTABLISHED duoc gui
+    ve, kem tcp_info (RTT, so lan truyen lai, cwnd) cua tung ket noi.
+
+    Yields:
+        TcpConnection: (family, laddr, raddr, inode, pid=None, info)
+    """
+    with sock:
+        yield from _sock_diag_dump(sock, socket.AF_INET, states, with_info)
+        try:
+            yield from _sock_diag_dump(sock, socket.AF_INET6, states, with_info)
+        except OSError as e:
+            # Chi bo qua khi kernel khong ho tro IPv6 diag; loi giua chung (ENOBUFS...) phai bao len
+            if e.errno not in (errno.ENOENT, errno.EPROTONOSUPPORT, errno.EOPNOTSUPP, errno.EAFNOSUPPORT):
+                raise
+
+def _iter_psutil_established():
+    """Du phong khi khong co /proc: dung psutil (chi lay TCP thay vi moi loai socket)"""
+    for conn in psutil.net_connections(kind='tcp'):
+        if conn.status == psutil.CONN_ESTABLISHED and conn.raddr:
+            yield TcpConnection(conn.family, tuple(conn.laddr), tuple(conn.raddr), None, conn.pid)
+
+def _iter_established(backend="auto"):
+    """
+    Chon nguon liet ke ket noi ESTABLISHED: netlink sock_diag -> /proc/net/tcp* -> psutil.
+    backend khac "auto" chi dinh cu the mot nguon.
+    """
+    if backend == "netlink":
+        return iter_sock_diag_sockets(open_sock_diag())
+    if backend == "auto":
+        try:
+            # Chi lay truoc ban ghi dau tien: loi ngay khi bat dau dump (thieu inet_diag, khong co
+            # quyen...) van kip chuyen sang nguon khac, con phan sau van doc dan (khong dem ca bang
+            # socket vao bo nho). Loi sau ban ghi dau tien duoc nem ra cho noi goi.
+            sockets = iter_sock_diag_sockets(open_sock_diag())
+            first = next(sockets, None)
+            return iter(()) if first is None else itertools.chain((first,), sockets)
+        except AttributeError:
+            pass # Khong phai Linux (khong co AF_NETLINK)
+        except OSError as e:
+            print(f"Canh bao: netlink sock_diag loi ({e}), chuyen sang /proc/net/tcp hoac psutil.")
+    if backend in ("auto", "proc") and os.path.exists(PROC_NET_TCP_FILES[0][0]):
+        return iter_proc_tcp_sockets(TCP_STATE_ESTABLISHED)
+    if backend == "proc":
+        raise OSError(f"Khong doc duoc {PROC_NET_TCP_FILES[0][0]}")
+    return _iter_psutil_established()
+
+def find_socket_owners(inodes):
+    """
+    Tim PID so huu cac socket inode bang cach duyet /proc/<pid>/fd.
+
+    Chi chay khi thuc su can PID va dung ngay khi da tim du, nen voi vai chuc ket noi
+    can hien thi thuong khong phai duyet het bang process. Can quyen root de thay
+    socket cua user khac.
+
+    Returns:
+        dict: {inode: pid}
+    """
+    wanted = set(inodes)
+    owners = {}
+    if not wanted:
+        return owners
     try:
-        for conn in psutil.net_connections(kind='inet'): # 'inet' bao gom ca tcp va udp, ipv4 va ipv6
-            # Loc chi cac ket noi TCP da thiet lap (ESTABLISHED)
-            if conn.type == socket.SOCK_STREAM and conn.status == psutil.CONN_ESTABLISHED:
-                process_name = "N/A" # Gia tri mac dinh
-                if conn.pid: # Chi lay ten process neu co PID
-                    try:
-                        process = psutil.Process(conn.pid)
-                        process_name = process.name()
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        process_name = "Khong truy cap duoc" # Hoac process da ket thuc
-                    except psutil.ZombieProcess:
-                        process_name = "Zombie Process"
-
-                # Xu ly truong hop raddr khong ton tai (hiem khi voi ESTABLISHED)
-                remote_addr_str = "N/A"
-                if conn.raddr and conn.raddr.ip and conn.raddr.port:
-                   remote_addr_str = f"{conn.raddr.ip}:{conn.raddr.port}"
-
-                connections.append({
-                    "local_addr": f"{conn.laddr.ip}:{conn.laddr.port}",
-                    "remote_addr": remote_addr_str,
-                    "status": conn.status, # Luon la ESTABLISHED o day
-                    "process": process_name,
-                    "pid": conn.pid if conn.pid else "N/A"
-                })
+        entries = os.listdir("/proc")
+    except OSError:
+        return owners
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        fd_dir = f"/proc/{entry}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue # Khong co quyen hoac process da ket thuc
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if target.startswith("socket:["):
+                inode = int(target[8:-1])
+                if inode in wanted:
+                    owners[inode] = int(entry)
+                    wanted.discard(inode)
+        if not wanted:
+            break
+    return owners
+
+def _process_name_for(snapshot, pid):
+    """Ten process so huu ket noi, tra cuu qua anh chup dung chung"""
+    if not pid:
+        return "N/A"
+    info = snapshot.get(pid)
+    if info is None:
+        return "Khong truy cap duoc" # Process da ket thuc
+    if info.state in ('Z', psutil.STATUS_ZOMBIE):
+        return "Zombie Process"
+    return snapshot.name(pid)
+
+def _format_connections(conns):
+    """Gan PID (chi cho cac ket noi can hien thi) va dinh dang thanh dict"""
+    owners = find_socket_owners(conn.inode for conn in conns if conn.pid is None and conn.inode)
+    snapshot = get_snapshot()
+    result = []
+    for conn in conns:
+        pid = conn.pid if conn.pid is not None else owners.get(conn.inode)
+        result.append({
+            "local_addr": f"{conn.laddr[0]}:{conn.laddr[1]}",
+            "remote_addr": f"{conn.raddr[0]}:{conn.raddr[1]}",
+            "status": psutil.CONN_ESTABLISHED,
+            "process": _process_name_for(snapshot, pid),
+            "pid": pid if pid else "N/A",
+            "tcp_info": conn.info
+        })
+    return result
+
+def get_connection_summary(limit=15, top_remotes=5, backend="auto"):
+    """
+    Mot luot doc duy nhat: dem tong so ket noi TCP ESTABLISHED, dem theo remote host
+    va chi giu lai `limit` ket noi dau tien de hien thi (chi cac ket noi nay duoc gan PID).
+
+    Returns:
+        dict: {"total", "connections", "by_remote": [(host, so ket noi), ...]} hoac None neu loi.
+    """
+    total = 0
+    kept = []
+    by_remote = collections.Counter()
+    try:
+        for conn in _iter_established(backend):
+            total += 1
+            by_remote[conn.raddr[0]] += 1
+            if limit is None or len(kept) < limit:
+                kept.append(conn)
+        return {"total": total,
+                "connections": _format_connections(kept),
+                "by_remote": by_remote.most_common(top_remotes)}
     except psutil.AccessDenied:
         print("Loi: Khong co quyen truy cap thong tin ket noi mang (can chay voi quyen admin/root?).")
     except Exception as e:
         print(f"Loi khi lay thong tin ket noi mang: {e}")
-    return connections
+    return None
 
-def get_open_ports(host='127.0.0.1', start_port=1, end_port=1024, timeout=0.2):
+def get_network_connections(limit=None, backend="auto"):
+    """
+    Liet ke cac ket noi mang dang hoat dong (TCP established), toi da `limit` ket noi neu co.
+    Voi backend netlink moi ket noi co them "tcp_info" (rtt_ms, retransmits, snd_cwnd, ...).
+    """
+    try:
+        return _format_connections(list(itertools.islice(_iter_established(backend), limit)))
+    except psutil.AccessDenied:
+        print("Loi: Khong co quyen truy cap thong tin ket noi mang (can chay voi quyen admin/root?).")
+    except Exception as e:
+        print(f"Loi khi lay thong tin ket noi mang: {e}")
+    return []
+
+@functools.lru_cache(maxsize=None)
+def get_service_name(port, protocol='tcp'):
+    """Tra ten dich vu pho bien cua cong (co cache, moi cong chi goi getservbyport mot lan)"""
+    try:
+        return socket.getservbyport(port, protocol)
+    except (OSError, socket.error):
+        # Neu khong tim thay ten dich vu pho bien
+        return "unknown"
+
+def parse_port_range(spec):
+    """
+    Phan tich chuoi cong dang "22,80,8000-8100" thanh danh sach cong (da sap xep, khong trung).
+    Nem ValueError neu chuoi khong hop le.
+    """
+    ports = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(p) for p in part.split('-', 1))
+        else:
+            start = end = int(part)
+        if not (1 <= start <= end <= 65535):
+            raise ValueError(f"Pham vi cong khong hop le: {part}")
+        ports.update(range(start, end + 1))
+    return sorted(ports)
+
+def _max_scan_concurrency(concurrency):
+    """Gioi han so socket dong thoi theo RLIMIT_NOFILE (chua lai mot it file descriptor du phong)"""
+    try:
+        import resource
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ImportError, ValueError, OSError):
+        # Windows khong co module resource
+        return max(1, concurrency)
+    if soft_limit == resource.RLIM_INFINITY:
+        return max(1, concurrency)
+    return max(1, min(concurrency, soft_limit - 64))
+
+def _expand_targets(targets, resolved_names):
+    """
+    Sinh (nhan, family, ip) cho tung dia chi can quet.
+    Ho tro IP don, dai CIDR (vd 192.168.1.0/24) va ten may da phan giai san trong resolved_names.
+    Moi dia chi chi sinh mot lan (theo nhan dau tien) du cac target chong lan nhau.
+    """
+    seen = set()
+    for target in targets:
+        try:
+            network = ipaddress.ip_network(target, strict=False)
+        except ValueError:
+            if target in resolved_names:
+                family, ip = resolved_names[target]
+                candidates = [(target, family, ip)]
+            else:
+                candidates = []
+        else:
+            family = socket.AF_INET if network.version == 4 else socket.AF_INET6
+            if network.num_addresses == 1:
+                candidates = [(target, family, str(network.network_address))]
+            else:
+                candidates = ((str(address), family, str(address)) for address in network.hosts())
+        for label, family, ip in candidates:
+            if ip not in seen:
+                seen.add(ip)
+                yield label, family, ip
+
+async def _probe_tcp_port(loop, family, ip, port, timeout):
+    """Thu ket noi TCP khong chan (non-blocking), tra ve True neu cong mo"""
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    # Tu huy bang call_later thay vi asyncio.wait_for: wait_for tao them mot task cho moi
+    # cong, ton gap doi chi phi khi quet hang chuc nghin cong bi tu choi ngay lap tuc
+    task = asyncio.current_task()
+    timed_out = False
+
+    def on_timeout():
+        nonlocal timed_out
+        timed_out = True
+        task.cancel()
+
+    timer = loop.call_later(timeout, on_timeout)
+    try:
+        await loop.sock_connect(sock, (ip, port))
+        return True
+    except OSError:
+        return False
+    except asyncio.CancelledError:
+        if not timed_out:
+            raise # Bi huy tu ben ngoai (vd Ctrl+C), khong phai do het thoi gian cho
+        if hasattr(task, "uncancel"): # Python 3.11+
+            task.uncancel()
+        return False
+    finally:
+        timer.cancel()
+        sock.close()
+
+async def _scan_ports_async(targets, ports, concurrency, timeout):
+    loop = asyncio.get_running_loop()
+
+    # Phan giai ten may mot lan truoc khi quet (IP va CIDR khong can DNS)
+    resolved_names = {}
+    for target in targets:
+        try:
+            ipaddress.ip_network(target, strict=False)
+            continue
+        except ValueError:
+            pass
+        try:
+            infos = await loop.getaddrinfo(target, None, type=socket.SOCK_STREAM)
+            family, _, _, _, sockaddr = infos[0]
+            resolved_names[target] = (family, sockaddr[0])
+        except socket.gaierror as e:
+            print(f"Loi: Khong the phan giai ten may {target}: {e}")
+
+    results = {}
+    # Generator dung chung cho moi worker: moi worker lay cong tiep theo khi xong viec,
+    # nen so ket noi dang cho luon <= concurrency ma khong phai tao truoc hang tram nghin task
+    jobs = ((label, family, ip, port)
+            for label, family, ip in _expand_targets(targets, resolved_names)
+            for port in ports)
+
+    async def worker():
+        for label, family, ip, port in jobs:
+            if await _probe_tcp_port(loop, family, ip, port, timeout):
+                results.setdefault(label, []).append(port)
+
+    await asyncio.gather(*(worker() for _ in range(_max_scan_concurrency(concurrency))))
+    return results
+
+def scan_ports(targets, ports, concurrency=DEFAULT_SCAN_CONCURRENCY, timeout=0.5):
+    """
+    Quet dong thoi cac cong TCP tren nhieu host bang asyncio.
+
+    targets: danh sach host, IP hoac dai CIDR (vd ["127.0.0.1", "10.0.0.0/28", "example.com"]).
+    ports: danh sach (hoac range) cong can quet.
+    concurrency: so ket noi dang thuc hien dong thoi toi da.
+    Tra ve dict {host: [(port, service), ...]} chi gom cac host co cong mo.
+    """
+    if isinstance(targets, str):
+        targets = [targets]
+    # Bo cong trung (vd "-p 22 22"): moi cap (ip, cong) chi thu mot lan
+    results = asyncio.run(_scan_ports_async(list(targets), list(dict.fromkeys(ports)), concurrency, timeout))
+    return {
+        host: [(port, get_service_name(port)) for port in sorted(open_ports)]
+        for host, open_ports in results.items()
+    }
+
+def get_open_ports(host='127.0.0.1', start_port=1, end_port=1024, timeout=0.2, concurrency=DEFAULT_SCAN_CONCURRENCY):
     """
     Kiem tra cac cong TCP mo tren mot host (mac dinh la localhost).
-    Tang timeout de giam kha nang bao loi sai (false negative).
-    """
-    open_ports = []
-    # print(f"Dang quet cong tu {start_port} den {end_port} tren {host}...")
-    for port in range(start_port, end_port + 1):
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout) # Tang timeout len mot chut
-        # Su dung connect_ex thay vi connect de khong nem ra exception khi cong dong
-        result = sock.connect_ex((host, port))
-        if result == 0: # Cong mo
-            try:
-                # Co gang lay ten dich vu tuong ung voi cong
-                service = socket.getservbyport(port, 'tcp') # Chi dinh ro 'tcp'
-            except (OSError, socket.error):
-                # Neu khong tim thay ten dich vu pho bien
-                service = "unknown"
-            open_ports.append((port, service))
-        sock.close() # Dong socket sau moi lan kiem tra
-    return open_ports
+    Cac cong duoc quet dong thoi (toi da `concurrency` ket noi cung luc) nen
+    tong thoi gian chi khoang (so cong / concurrency) * timeout trong truong hop xau nhat.
+    """
+    results = scan_ports([host], range(start_port, end_port + 1), concurrency=concurrency, timeout=timeout)
+    return results.get(host, [])
 
 def format_bytes(b):
     """Chuyen doi bytes thanh don vi doc duoc (KB, MB, GB)"""
@@ -220,8 +821,188 @@ def print_separator(char="=", length=50):
     """In ra dong phan cach"""
     print(char * length)
 
+def display_port_scan(targets, ports, concurrency, timeout):
+    """Quet cong TCP tren cac host/CIDR chi dinh va in ket qua"""
+    print_separator()
+    print(f"QUET CONG TCP ({len(ports)} cong, {concurrency} ket noi dong thoi, timeout {timeout}s)")
+    print_separator()
+    start = time.monotonic()
+    results = scan_ports(targets, ports, concurrency=concurrency, timeout=timeout)
+    elapsed = time.monotonic() - start
+    if results:
+        for host, open_ports in results.items():
+            print(f"\n   Host: {host}")
+            print("     " + ", ".join(f"{port} ({service})" for port, service in open_ports))
+    else:
+        print("   [i] Khong tim thay cong TCP mo nao.")
+    print(f"\nHoan tat sau {elapsed:.2f} giay.")
+    print_separator()
+
+def display_latency(hosts, count, interval, port):
+    """Do do tre dong thoi toi nhieu host va in bang ket qua"""
+    print_separator(length=100)
+    print(f"DO DO TRE ({len(hosts)} host, {count} goi/host, cach nhau {interval}s)")
+    print_separator(length=100)
+    results = probe_many(hosts, count=count, interval=interval, port=port)
+    print(f"   {'Host':<24} {'Cach':<8} {'Mat':>5} {'Min':>8} {'Avg':>8} {'Max':>8} {'Mdev':>8} {'Jitter':>8} {'P90':>8}  (ms)")
+    for host, stats in results.items():
+        if "error" in stats:
+            print(f"   {host:<24} [✗] {stats['error']}")
+        elif stats["packets_received"] == 0:
+            print(f"   {host:<24} {stats['method']:<8} {stats['packet_loss_percent']:>4}%  [✗] Khong nhan duoc phan hoi")
+        else:
+            print(f"   {host:<24} {stats['method']:<8} {stats['packet_loss_percent']:>4}% {stats['min_rtt']:>8.2f} {stats['avg_rtt']:>8.2f} "
+                  f"{stats['max_rtt']:>8.2f} {stats['mdev_rtt']:>8.2f} {stats['jitter']:>8.2f} {stats['p90_rtt']:>8.2f}")
+    print_separator(length=100)
+
+def monitor_network(duration=DEFAULT_MONITOR_DURATION, interval=DEFAULT_MONITOR_INTERVAL,
+                    bandwidth_threshold=None, error_threshold=DEFAULT_ERROR_THRESHOLD, interfaces=None, jitter=0.0,
+                    history_dir=None, sample_log=None):
+    """
+    Giam sat luu luong tung giao dien mang theo chu ky co dinh.
+
+    duration / interval: thoi gian giam sat va khoang cach giua cac lan lay mau (giay).
+    bandwidth_threshold: nguong canh bao toc do nhan hoac gui (bytes/giay), None = tat.
+    error_threshold: nguong canh bao so goi loi hoac bi huy moi giay (vao + ra).
+    interfaces: chi giam sat cac giao dien nay (None = tat ca).
+    jitter: do lech pha ngau nhien toi da (giay) cua lan lay mau dau tien.
+    history_dir: thu muc luu lich su mau dang bo dem vong (mmap), giu lai giua cac lan chay.
+    sample_log: file log mau nhi phan (xem sample_log.py) de ghi them moi mau.
+    """
+    print_separator()
+    print(f"GIAM SAT MANG trong {duration}s (chu ky {interval}s)")
+    if bandwidth_threshold:
+        print(f"Nguong bang thong: {format_bytes(bandwidth_threshold)}/s, nguong loi/huy goi: {error_threshold}/s")
+    else:
+        print(f"Nguong loi/huy goi: {error_threshold}/s")
+    print_separator()
+
+    last_time, last_counters = get_interface_counters()
+    # Co NumPy: giu bo dem moi giao dien trong mot ma tran, moi tick chi mot phep tinh vector
+    table = CounterTable(NIC_COUNTER_FIELDS, wrap_bits=32) if HAVE_NUMPY else None
+    if table is not None and last_counters is not None:
+        table.update(last_counters)
+    scheduler = FixedRateScheduler(interval, duration, jitter=jitter)
+    history = open_history(history_dir, duration, interval, sample_log)
+    alerts = 0
+    try:
+        for tick in scheduler:
+            if tick.index == 0:
+                continue # Tick dau tien trung voi lan lay moc o tren
+            if tick.missed:
+                print(f"   [!] Bo lo {tick.missed} lan lay mau do vong lap chay cham hon chu ky.")
+            now, counters = get_interface_counters()
+            if counters is None:
+                continue
+            if last_counters is not None:
+                for nic in counters.keys() - last_counters.keys():
+                    print(f"   [i] Phat hien giao dien moi: {nic}")
+                for nic in last_counters.keys() - counters.keys():
+                    print(f"   [i] Giao dien {nic} da bien mat")
+            results = evaluate_interfaces(last_counters, counters, now - last_time,
+                                          bandwidth_threshold, error_threshold, table)
+            last_time, last_counters = now, counters
+
+            print(f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]")
+            print(f"   {'Giao dien':<16} {'Nhan/s':>12} {'Gui/s':>12} {'Goi vao/s':>10} {'Goi ra/s':>10} {'Loi/s':>7} {'Huy/s':>7}  Trang thai")
+            for nic in sorted(results):
+                if interfaces and nic not in interfaces:
+                    continue
+                rate, problems = results[nic]
+                errors = rate["errin"] + rate["errout"]
+                drops = rate["dropin"] + rate["dropout"]
+                status = "CANH BAO: " + ", ".join(problems) if problems else "OK"
+                if problems:
+                    alerts += 1
+                history.record(f"net.{nic}.recv", rate["bytes_recv"])
+                history.record(f"net.{nic}.sent", rate["bytes_sent"])
+                history.record(f"net.{nic}.errors", errors)
+                history.record(f"net.{nic}.drops", drops)
+                print(f"   {nic:<16} {format_bytes(rate['bytes_recv']):>12} {format_bytes(rate['bytes_sent']):>12} "
+                      f"{rate['packets_recv']:>10.1f} {rate['packets_sent']:>10.1f} {errors:>7.1f} {drops:>7.1f}  {status}")
+    except KeyboardInterrupt:
+        print("\nGiam sat bi dung boi nguoi dung.")
+    finally:
+        print(f"\nKet thuc giam sat mang. Tong so canh bao: {alerts}")
+        print(f"Lap lich: {scheduler.ticks} tick, bo lo {scheduler.missed_ticks}, "
+              f"tre trung binh {scheduler.mean_lag * 1000:.1f}ms, toi da {scheduler.max_lag * 1000:.1f}ms")
+        for name in history.names():
+            formatter = (lambda v: f"{format_bytes(v)}/s") if name.endswith((".recv", ".sent")) else (lambda v: f"{v:.1f}/s")
+            print(f"  {name}: {format_stats(history.stats(name), formatter)}")
+        history.close()
+        print_separator()
+
 def main():
     """Ham chinh dieu khien luong thuc thi"""
+    parser = argparse.ArgumentParser(description="Cong cu kiem tra cac thong so mang.")
+    parser.add_argument("-m", "--monitor", action="store_true",
+                        help="Giam sat toc do luu luong tung giao dien mang theo thoi gian.")
+    monitor_group = parser.add_argument_group('Tuy chon giam sat (--monitor)')
+    monitor_group.add_argument("-d", "--duration", type=int, default=DEFAULT_MONITOR_DURATION,
+                               help=f"Thoi gian giam sat (giay) (mac dinh: {DEFAULT_MONITOR_DURATION}).")
+    monitor_group.add_argument("-n", "--interval", type=float, default=DEFAULT_MONITOR_INTERVAL,
+                               help=f"Khoang thoi gian giua cac lan lay mau (giay) (mac dinh: {DEFAULT_MONITOR_INTERVAL}).")
+    monitor_group.add_argument("--bandwidth-threshold", type=float, metavar="MBIT",
+                               help="Nguong canh bao toc do nhan/gui cua mot giao dien (Mbit/s).")
+    monitor_group.add_argument("--error-threshold", type=float, default=DEFAULT_ERROR_THRESHOLD,
+                               help=f"Nguong canh bao so goi loi hoac bi huy moi giay (mac dinh: {DEFAULT_ERROR_THRESHOLD}).")
+    monitor_group.add_argument("-i", "--interface", nargs='+', metavar="NIC",
+                               help="Chi giam sat cac giao dien nay (vd: eth0 wlan0).")
+    monitor_group.add_argument("--jitter", type=float, default=0.0,
+                               help="Do lech pha ngau nhien toi da (giay) cua lan lay mau dau tien.")
+    monitor_group.add_argument("--history-dir", metavar="DIR",
+                               help="Thu muc luu lich su mau dang bo dem vong (mmap), giu lai giua cac lan chay.")
+    monitor_group.add_argument("--sample-log", metavar="FILE",
+                               help="Ghi moi mau vao log nhi phan nen theo block (doc lai bang sample_log.py).")
+    ping_group = parser.add_argument_group('Tuy chon do do tre (--ping)')
+    ping_group.add_argument("--ping", nargs='+', metavar="HOST",
+                            help="Chi do do tre (ICMP, hoac TCP neu khong co quyen ICMP) toi cac host nay, dong thoi.")
+    ping_group.add_argument("-c", "--count", type=int, default=4,
+                            help="So goi do moi host (mac dinh: 4).")
+    ping_group.add_argument("--ping-interval", type=float, default=0.2,
+                            help="Khoang cach giua cac goi do (giay) (mac dinh: 0.2).")
+    ping_group.add_argument("--probe-port", type=int, default=DEFAULT_TCP_PROBE_PORT,
+                            help=f"Cong TCP dung khi phai do bang TCP connect (mac dinh: {DEFAULT_TCP_PROBE_PORT}).")
+    scan_group = parser.add_argument_group('Tuy chon quet cong (--scan)')
+    scan_group.add_argument("--scan", nargs='+', metavar="HOST",
+                            help="Chi quet cong TCP tren cac host/IP/dai CIDR nay (vd: 127.0.0.1 192.168.1.0/24).")
+    scan_group.add_argument("--ports", default="1-1024",
+                            help="Danh sach cong can quet, vd: 22,80,8000-8100 (mac dinh: 1-1024).")
+    scan_group.add_argument("--concurrency", type=int, default=DEFAULT_SCAN_CONCURRENCY,
+                            help=f"So ket noi dong thoi toi da (mac dinh: {DEFAULT_SCAN_CONCURRENCY}).")
+    scan_group.add_argument("--timeout", type=float, default=0.5,
+                            help="Thoi gian cho moi ket noi (giay) (mac dinh: 0.5).")
+    args = parser.parse_args()
+
+    if args.monitor:
+        if args.duration <= 0 or args.interval <= 0:
+            parser.error("--duration va --interval phai lon hon 0.")
+        bandwidth_threshold = args.bandwidth_threshold * 1_000_000 / 8 if args.bandwidth_threshold else None
+        monitor_network(duration=args.duration, interval=args.interval,
+                        bandwidth_threshold=bandwidth_threshold,
+                        error_threshold=args.error_threshold,
+                        interfaces=args.interface,
+                        jitter=args.jitter,
+                        history_dir=args.history_dir,
+                        sample_log=args.sample_log)
+        return
+
+    if args.ping:
+        if args.count <= 0 or args.ping_interval < 0:
+            parser.error("--count phai lon hon 0 va --ping-interval khong duoc am.")
+        display_latency(args.ping, args.count, args.ping_interval, args.probe_port)
+        return
+
+    if args.scan:
+        try:
+            ports = parse_port_range(args.ports)
+        except ValueError as e:
+            parser.error(f"--ports khong hop le: {e}")
+        if args.concurrency <= 0:
+            parser.error("--concurrency phai lon hon 0.")
+        display_port_scan(args.scan, ports, args.concurrency, args.timeout)
+        return
+
     print_separator()
     print("CONG CU KIEM TRA MANG")
     print_separator()
@@ -241,12 +1022,10 @@ def main():
         if ping_result:
             if "error" in ping_result:
                 print(f"   [✗] Loi Ping: {ping_result['error']}")
-            elif "raw_output" in ping_result:
-                 print(f"   [!] Khong the phan tich chi tiet output ping. Output tho:")
-                 print(f"     {ping_result['raw_output']}")
             else:
-                print(f"   [✓] Ping toi {ping_result['host']}:")
+                print(f"   [✓] Ping toi {ping_result['host']} (phuong thuc: {ping_result.get('method', 'N/A')}):")
                 print(f"       - Thoi gian phan hoi (RTT): Min={ping_result.get('min_rtt', 'N/A')}ms, Avg={ping_result.get('avg_rtt', 'N/A')}ms, Max={ping_result.get('max_rtt', 'N/A')}ms")
+                print(f"       - Do dao dong: Mdev={ping_result.get('mdev_rtt', 'N/A')}ms, Jitter={ping_result.get('jitter', 'N/A')}ms, P90={ping_result.get('p90_rtt', 'N/A')}ms")
                 print(f"       - Goi tin: Gui={ping_result.get('packets_sent', 'N/A')}, Nhan={ping_result.get('packets_received', 'N/A')}, Mat={ping_result.get('packets_lost', 'N/A')} ({ping_result.get('packet_loss_percent', 'N/A')}%)")
         else:
             print("   [✗] Khong nhan duoc ket qua ping.")
@@ -284,18 +1063,23 @@ def main():
 
     # 5. Liet ke ket noi TCP dang hoat dong
     print("\n--- 5. Ket noi TCP dang hoat dong (Established) ---")
-    connections = get_network_connections()
-    if connections:
-        print(f"   Tim thay {len(connections)} ket noi:")
-        # Hien thi toi da 15 ket noi de tranh tran man hinh
-        display_limit = 15
-        for i, conn in enumerate(connections[:display_limit], 1):
+    # Hien thi toi da 15 ket noi de tranh tran man hinh; tong so va thong ke van tinh tren tat ca
+    display_limit = 15
+    summary = get_connection_summary(limit=display_limit)
+    if summary and summary["total"]:
+        print(f"   Tim thay {summary['total']} ket noi:")
+        for i, conn in enumerate(summary["connections"], 1):
             print(f"   {i}. Local: {conn['local_addr']:<22} -> Remote: {conn['remote_addr']:<22} | Process: {conn['process']} (PID: {conn['pid']})")
-        if len(connections) > display_limit:
-            print(f"   ... va {len(connections) - display_limit} ket noi khac.")
-    elif connections is not None: # Neu ham tra ve list rong (khong co loi)
+            tcp_info = conn.get("tcp_info")
+            if tcp_info:
+                print(f"      RTT: {tcp_info['rtt_ms']:.2f}ms (+/-{tcp_info['rttvar_ms']:.2f}), "
+                      f"cwnd: {tcp_info['snd_cwnd']}, truyen lai: {tcp_info['total_retrans']}")
+        if summary["total"] > display_limit:
+            print(f"   ... va {summary['total'] - display_limit} ket noi khac.")
+        print("   Remote host nhieu ket noi nhat: " + ", ".join(f"{host} ({count})" for host, count in summary["by_remote"]))
+    elif summary is not None: # Khong co loi, chi la khong co ket noi
          print("   [i] Khong co ket noi TCP nao dang o trang thai ESTABLISHED.")
-    # Neu connections la None thi loi da duoc in ra trong ham get_network_connections
+    # Neu summary la None thi loi da duoc in ra trong ham get_connection_summary
 
     # 6. Kiem tra cac cong mo tren localhost (pham vi nho de nhanh)
     print("\n--- 6. Kiem tra cong TCP mo tren Localhost (Cong 1-100) ---")
@@ -6,7 +6,6 @@ Script kiểm tra, phân tích và giám sát tình trạng RAM và SWAP.
 import time
 import datetime
 import argparse
-import os
 import sys
 
 # --- Bổ sung: Kiểm tra và xử lý lỗi thiếu thư viện ---
@@ -17,6 +16,12 @@ except ImportError:
     print("Vui lòng cài đặt bằng lệnh: pip install psutil")
     sys.exit(1) # Thoát chương trình với mã lỗi
 
+from log_sink import AsyncLogSink
+from proc_snapshot import get_snapshot
+from psi import DEFAULT_STALL_MS, DEFAULT_WINDOW_MS, PSI_RESOURCES, PressureTriggers, read_pressure
+from sample_store import open_history, format_stats
+from scheduler import FixedRateScheduler
+
 # --- Hàm tiện ích ---
 def get_size(bytes_val, suffix="B"):
     """
@@ -68,6 +73,38 @@ def get_memory_info():
         print(f"Lỗi khi lấy thông tin bộ nhớ: {e}", file=sys.stderr)
         return None
 
+class ProcessMemoryRanker:
+    """
+    Xếp hạng process theo RSS trên ảnh chụp process dùng chung (proc_snapshot).
+
+    RSS lấy từ /proc/<pid>/statm qua ảnh chụp, top N được chọn bằng heapq.nlargest
+    (không sắp xếp toàn bộ). Tên process chỉ được tra cho các process lọt vào top và
+    được cache theo (pid, start_time) trong ảnh chụp, nên ở các tick sau chỉ process mới
+    (hoặc pid bị tái sử dụng) mới phải đọc lại tên.
+    """
+
+    def __init__(self, snapshot=None):
+        self._snapshot = snapshot
+
+    @property
+    def snapshot(self):
+        # Lấy ảnh chụp dùng chung khi cần lần đầu, để mọi công cụ trong tiến trình quét /proc chung một lần
+        if self._snapshot is None:
+            self._snapshot = get_snapshot()
+        return self._snapshot
+
+    def top(self, num_processes):
+        """Trả về list dict (pid, name, memory_percent) của num_processes process dùng nhiều RAM nhất."""
+        snapshot = self.snapshot
+        return [{
+            "pid": info.pid,
+            "name": snapshot.name(info.pid, default=info.name),
+            "memory_percent": snapshot.memory_percent(info)
+        } for info in snapshot.top_by_rss(num_processes)]
+
+# Dùng chung giữa các lần gọi
+_process_ranker = ProcessMemoryRanker()
+
 def get_top_processes(num_processes=5):
     """
     Lấy danh sách các process sử dụng nhiều RAM nhất.
@@ -79,24 +116,8 @@ def get_top_processes(num_processes=5):
         list: Danh sách các dictionary chứa thông tin process (pid, name, memory_percent),
               hoặc danh sách rỗng nếu có lỗi.
     """
-    processes = []
     try:
-        # Lấy các thuộc tính cần thiết để tối ưu hiệu năng
-        for proc in psutil.process_iter(['pid', 'name', 'memory_percent']):
-            try:
-                # Lấy thông tin process
-                proc_info = proc.info
-                # Bỏ qua các process hệ thống không có memory_percent hoặc giá trị âm (ít gặp)
-                if proc_info.get('memory_percent') is not None and proc_info['memory_percent'] >= 0:
-                    processes.append(proc_info)
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                # Bỏ qua các process không truy cập được hoặc đã chết
-                pass
-
-        # Sắp xếp theo tỷ lệ sử dụng RAM giảm dần
-        processes = sorted(processes, key=lambda p: p.get('memory_percent', 0), reverse=True)
-
-        return processes[:num_processes]
+        return _process_ranker.top(num_processes)
     except Exception as e:
         print(f"Lỗi khi lấy thông tin process: {e}", file=sys.stderr)
         return []
@@ -158,7 +179,7 @@ def display_memory_info(show_swap=True, show_top_procs=False, num_top_procs=5):
 
 
 # --- Hàm giám sát ---
-def monitor_memory(duration=60, interval=5, ram_threshold=80, swap_threshold=80, log_file=None, show_procs_on_alert=False, num_top_procs=3):
+def monitor_memory(duration=60, interval=5, ram_threshold=80, swap_threshold=80, log_file=None, show_procs_on_alert=False, num_top_procs=3, jitter=0.0, history_dir=None, sample_log=None):
     """
     Giám sát RAM và SWAP trong khoảng thời gian xác định, ghi log và cảnh báo.
 
@@ -170,6 +191,9 @@ def monitor_memory(duration=60, interval=5, ram_threshold=80, swap_threshold=80,
         log_file (str): Đường dẫn file log (nếu có).
         show_procs_on_alert (bool): Hiển thị top process khi có cảnh báo.
         num_top_procs (int): Số process hiển thị khi có cảnh báo.
+        jitter (float): Độ lệch pha ngẫu nhiên tối đa (giây) của lần kiểm tra đầu tiên.
+        history_dir (str): Thư mục lưu lịch sử mẫu (mmap) để giữ lại giữa các lần chạy (nếu có).
+        sample_log (str): File log mẫu nhị phân (xem sample_log.py) để ghi thêm mọi mẫu (nếu có).
     """
     if duration <= 0 or interval <= 0:
         print("Lỗi: Thời gian giám sát (duration) và khoảng cách (interval) phải lớn hơn 0.", file=sys.stderr)
@@ -178,41 +202,42 @@ def monitor_memory(duration=60, interval=5, ram_threshold=80, swap_threshold=80,
          print("Lỗi: Ngưỡng (threshold) phải nằm trong khoảng (0, 100].", file=sys.stderr)
          return
 
-    start_time = time.time()
-    end_time = start_time + duration
+    scheduler = FixedRateScheduler(interval, duration, jitter=jitter)
+    history = open_history(history_dir, duration, interval, sample_log)
 
     print(f"Bắt đầu giám sát Bộ nhớ (RAM > {ram_threshold}%, SWAP > {swap_threshold}%) trong {duration}s...")
     print(f"Kiểm tra mỗi {interval}s. Ghi log vào: {'Bật (' + log_file + ')' if log_file else 'Tắt'}")
     print("-" * 30)
 
-    log_handle = None
+    log_sink = None
     if log_file:
         try:
-            # --- Bổ sung: Tạo thư mục nếu chưa tồn tại ---
-            log_dir = os.path.dirname(log_file)
-            if log_dir and not os.path.exists(log_dir):
-                os.makedirs(log_dir, exist_ok=True) # exist_ok=True để không báo lỗi nếu thư mục đã tồn tại
-            log_handle = open(log_file, "a", encoding='utf-8') # Mở file với encoding utf-8
-            log_handle.write(f"\n--- Giám sát Bộ nhớ bắt đầu lúc {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
-            log_handle.write(f"Ngưỡng RAM: {ram_threshold}%, Ngưỡng SWAP: {swap_threshold}%\n")
-        except IOError as e:
+            # Ghi log qua thread nền: vòng lặp không bao giờ phải chờ đĩa (tự tạo thư mục nếu chưa có)
+            log_sink = AsyncLogSink(log_file)
+            log_sink.write(f"\n--- Giám sát Bộ nhớ bắt đầu lúc {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n"
+                           f"Ngưỡng RAM: {ram_threshold}%, Ngưỡng SWAP: {swap_threshold}%")
+        except OSError as e:
             # --- Bổ sung: Xử lý lỗi ghi log ---
             print(f"\n\033[91mLỗi khi mở file log '{log_file}': {e}\033[0m", file=sys.stderr)
             print("Giám sát sẽ tiếp tục mà không ghi log.")
-            log_handle = None # Đảm bảo không cố ghi vào file bị lỗi
+            log_sink = None # Đảm bảo không cố ghi vào file bị lỗi
 
     alerts_ram_count = 0
     alerts_swap_count = 0
     try:
-        while time.time() < end_time:
+        for tick in scheduler:
+            if tick.missed:
+                print(f"  -> Bỏ lỡ {tick.missed} lần kiểm tra do vòng lặp chạy chậm hơn chu kỳ.", file=sys.stderr)
             mem_info = get_memory_info()
             if not mem_info:
-                # Nếu không lấy được thông tin, đợi interval tiếp theo
-                time.sleep(interval)
+                # Nếu không lấy được thông tin, đợi tick tiếp theo
                 continue
 
             ram = mem_info['ram']
             swap = mem_info['swap']
+            history.record("ram", ram['percent'])
+            if swap['total'] > 0:
+                history.record("swap", swap['percent'])
             timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             ram_status = "OK"
@@ -246,41 +271,28 @@ def monitor_memory(duration=60, interval=5, ram_threshold=80, swap_threshold=80,
             print(message)
 
             # Ghi log
-            if log_handle:
+            if log_sink:
                 # Ghi message gốc (không màu) vào log
                 log_ram_status = f"CẢNH BÁO ({ram['percent']:.1f}%)" if ram['percent'] >= ram_threshold else "OK"
                 log_swap_status = f"CẢNH BÁO ({swap['percent']:.1f}%)" if swap['total'] > 0 and swap['percent'] >= swap_threshold else "OK"
                 log_status_str = f"RAM: {log_ram_status}, SWAP: {log_swap_status}" if swap['total'] > 0 else f"RAM: {log_ram_status}"
-                log_message = f"[{timestamp}] {ram_str} | {swap_str} | Status: {log_status_str}\n"
-                log_handle.write(log_message)
+                log_sink.write(f"[{timestamp}] {ram_str} | {swap_str} | Status: {log_status_str}")
 
             # --- Bổ sung: Hiển thị top process khi có cảnh báo ---
             if is_alert and show_procs_on_alert:
                 top_processes = get_top_processes(num_top_procs)
                 if top_processes:
-                    proc_alert_header = f"  -> Top {len(top_processes)} process gây tải ({', '.join(alert_messages)}):"
-                    print(proc_alert_header)
-                    if log_handle:
-                        log_handle.write(proc_alert_header + "\n")
+                    proc_lines = [f"  -> Top {len(top_processes)} process gây tải ({', '.join(alert_messages)}):"]
                     for i, proc in enumerate(top_processes):
-                        proc_line = f"     {i+1}. {proc.get('name', 'N/A')} (PID: {proc.get('pid', 'N/A')}) - {proc.get('memory_percent', 0):.2f}% RAM"
-                        print(proc_line)
-                        if log_handle:
-                            log_handle.write(proc_line + "\n")
+                        proc_lines.append(f"     {i+1}. {proc.get('name', 'N/A')} (PID: {proc.get('pid', 'N/A')}) - {proc.get('memory_percent', 0):.2f}% RAM")
+                    proc_block = "\n".join(proc_lines)
+                    print(proc_block)
+                    if log_sink:
+                        log_sink.write(proc_block) # Cả khối trong một bản ghi
                 else:
                     print("  -> Không thể lấy thông tin process khi cảnh báo.")
-                    if log_handle:
-                        log_handle.write("  -> Không thể lấy thông tin process khi cảnh báo.\n")
-
-            # --- Bổ sung: Flush log thường xuyên hơn ---
-            if log_handle:
-                log_handle.flush()
-
-            # Ngủ đến lần kiểm tra tiếp theo
-            # Tính toán thời gian ngủ chính xác hơn để bù đắp thời gian xử lý
-            elapsed = time.time() - start_time
-            remaining_interval = interval - (elapsed % interval)
-            time.sleep(max(0.1, remaining_interval)) # Ngủ ít nhất 0.1s
+                    if log_sink:
+                        log_sink.write("  -> Không thể lấy thông tin process khi cảnh báo.")
 
     except KeyboardInterrupt:
         print("\nĐã dừng giám sát bởi người dùng.")
@@ -289,11 +301,140 @@ def monitor_memory(duration=60, interval=5, ram_threshold=80, swap_threshold=80,
         summary = f"\n--- Kết thúc giám sát lúc {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---"
         summary += f"\nTổng số cảnh báo RAM: {alerts_ram_count}"
         summary += f"\nTổng số cảnh báo SWAP: {alerts_swap_count}"
+        summary += f"\nLập lịch: {scheduler.summary()}"
+        for name in history.names():
+            summary += f"\n{name.upper()}: {format_stats(history.stats(name), lambda v: f'{v:.1f}%')}"
+        history.close()
+        print(summary)
+
+        if log_sink:
+            log_sink.write(summary)
+            log_sink.close()
+            if log_sink.dropped:
+                print(f"Cảnh báo: {log_sink.dropped} bản ghi log bị bỏ do ghi file không kịp.", file=sys.stderr)
+            print(f"Đã ghi log chi tiết vào: {log_file}")
+        print("-" * 30)
+
+
+def monitor_pressure(duration=60, resources=PSI_RESOURCES, stall_ms=DEFAULT_STALL_MS, window_ms=DEFAULT_WINDOW_MS,
+                     log_file=None, num_top_procs=3, history_dir=None, sample_log=None):
+    """
+    Giám sát áp lực bộ nhớ/CPU/IO theo sự kiện qua trigger PSI (/proc/pressure/*).
+
+    Vòng lặp ngủ trong poll() cho đến khi kernel báo một tài nguyên bị nghẽn quá stall_ms
+    trong cửa sổ window_ms, nên bắt được cả những lần nghẽn ngắn dưới một giây mà không
+    phải thức dậy theo chu kỳ. Mỗi sự kiện in thời gian nghẽn (avg10, mức tăng total) cạnh
+    RAM/SWAP và top process tại đúng thời điểm đó.
+
+    Args:
+        duration (int): Thời gian giám sát (giây).
+        resources (sequence): Các tài nguyên PSI cần theo dõi ("memory", "cpu", "io").
+        stall_ms (int): Ngưỡng tổng thời gian nghẽn "some" trong một cửa sổ (ms).
+        window_ms (int): Cửa sổ tính ngưỡng (ms, 500-10000).
+        log_file (str): Đường dẫn file log (nếu có).
+        num_top_procs (int): Số process hiển thị khi có sự kiện.
+        history_dir (str): Thư mục lưu lịch sử mẫu (mmap) để giữ lại giữa các lần chạy (nếu có).
+        sample_log (str): File log mẫu nhị phân (xem sample_log.py) để ghi thêm mọi mẫu (nếu có).
+    """
+    try:
+        triggers = PressureTriggers(resources, stall_ms, window_ms)
+    except ValueError as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return
+    for resource, reason in triggers.unavailable.items():
+        print(f"  -> PSI {resource}: {reason}", file=sys.stderr)
+    if not triggers.resources:
+        print("Lỗi: Kernel không hỗ trợ PSI (/proc/pressure), không thể giám sát áp lực.", file=sys.stderr)
+        triggers.close()
+        return
+
+    history = open_history(history_dir, duration, window_ms / 1000, sample_log)
+    print(f"Bắt đầu giám sát áp lực PSI ({', '.join(triggers.resources)}: nghẽn > {stall_ms}ms / {window_ms}ms) trong {duration}s...")
+    print(f"Trigger của kernel: {', '.join(triggers.triggered) or 'không'}. Ghi log vào: {'Bật (' + log_file + ')' if log_file else 'Tắt'}")
+    print("-" * 30)
+
+    log_sink = None
+    if log_file:
+        try:
+            log_sink = AsyncLogSink(log_file)
+            log_sink.write(f"\n--- Giám sát áp lực PSI bắt đầu lúc {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n"
+                           f"Ngưỡng: nghẽn > {stall_ms}ms trong {window_ms}ms ({', '.join(triggers.resources)})")
+        except OSError as e:
+            print(f"\n\033[91mLỗi khi mở file log '{log_file}': {e}\033[0m", file=sys.stderr)
+            print("Giám sát sẽ tiếp tục mà không ghi log.")
+            log_sink = None
+
+    last_totals = {}
+    for resource in triggers.resources:
+        pressure = read_pressure(resource)
+        if pressure:
+            last_totals[resource] = pressure["some"]["total"]
+    event_counts = dict.fromkeys(triggers.resources, 0)
+    end_time = time.monotonic() + duration
+    try:
+        while True:
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                break
+            fired = triggers.wait(remaining)
+            if not fired:
+                continue
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            psi_parts = []
+            for resource in fired:
+                pressure = read_pressure(resource)
+                if not pressure:
+                    continue
+                event_counts[resource] += 1
+                some = pressure["some"]
+                stall_ms_delta = (some["total"] - last_totals.get(resource, some["total"])) / 1000
+                last_totals[resource] = some["total"]
+                history.record(f"psi.{resource}.avg10", some["avg10"])
+                history.record(f"psi.{resource}.stall_ms", stall_ms_delta)
+                full = pressure.get("full")
+                full_str = f", full avg10 {full['avg10']:.2f}%" if full and resource != "cpu" else ""
+                psi_parts.append(f"{resource}: nghẽn +{stall_ms_delta:.0f}ms (some avg10 {some['avg10']:.2f}%{full_str})")
+
+            mem_info = get_memory_info()
+            ram_str = swap_str = "N/A"
+            if mem_info:
+                ram, swap = mem_info['ram'], mem_info['swap']
+                history.record("ram", ram['percent'])
+                ram_str = f"{get_size(ram['used'])}/{get_size(ram['total'])} ({ram['percent']:.1f}%)"
+                if swap['total'] > 0:
+                    history.record("swap", swap['percent'])
+                    swap_str = f"{get_size(swap['used'])}/{get_size(swap['total'])} ({swap['percent']:.1f}%)"
+
+            lines = [f"[{timestamp}] ÁP LỰC {' | '.join(psi_parts)} | RAM: {ram_str} | SWAP: {swap_str}"]
+            top_processes = get_top_processes(num_top_procs)
+            if top_processes:
+                lines.append(f"  -> Top {len(top_processes)} process theo RAM lúc xảy ra:")
+                for i, proc in enumerate(top_processes):
+                    lines.append(f"     {i+1}. {proc.get('name', 'N/A')} (PID: {proc.get('pid', 'N/A')}) - {proc.get('memory_percent', 0):.2f}% RAM")
+            block = "\n".join(lines)
+            print(block)
+            if log_sink:
+                log_sink.write(block)
+
+    except KeyboardInterrupt:
+        print("\nĐã dừng giám sát bởi người dùng.")
+    finally:
+        triggers.close()
+        summary = f"\n--- Kết thúc giám sát áp lực lúc {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---"
+        for resource, count in event_counts.items():
+            summary += f"\nSố sự kiện áp lực {resource}: {count}"
+        for name in history.names():
+            formatter = (lambda v: f"{v:.0f}ms") if name.endswith(".stall_ms") else (lambda v: f"{v:.1f}%")
+            summary += f"\n{name.upper()}: {format_stats(history.stats(name), formatter)}"
+        history.close()
         print(summary)
 
-        if log_handle:
-            log_handle.write(summary + "\n")
-            log_handle.close()
+        if log_sink:
+            log_sink.write(summary)
+            log_sink.close()
+            if log_sink.dropped:
+                print(f"Cảnh báo: {log_sink.dropped} bản ghi log bị bỏ do ghi file không kịp.", file=sys.stderr)
             print(f"Đã ghi log chi tiết vào: {log_file}")
         print("-" * 30)
 
@@ -355,6 +496,45 @@ def main():
         type=int, default=3, metavar='SỐ_LƯỢNG',
         help="Số lượng process hiển thị khi có cảnh báo (dùng với --show-procs-on-alert). Mặc định: 3"
     )
+    monitor_group.add_argument(
+        "--jitter",
+        type=float, default=0.0, metavar='GIÂY',
+        help="Độ lệch pha ngẫu nhiên tối đa của lần kiểm tra đầu tiên, tránh nhiều máy lấy mẫu cùng lúc. Mặc định: 0"
+    )
+    monitor_group.add_argument(
+        "--history-dir",
+        metavar='THƯ_MỤC',
+        help="Thư mục lưu lịch sử mẫu dạng bộ đệm vòng (mmap), giữ lại giữa các lần chạy."
+    )
+    monitor_group.add_argument(
+        "--sample-log",
+        metavar='ĐƯỜNG_DẪN_FILE',
+        help="Ghi mọi mẫu vào log nhị phân nén theo block (đọc lại bằng sample_log.py)."
+    )
+
+    # Tùy chọn cho chế độ giám sát áp lực PSI (--monitor --psi)
+    psi_group = parser.add_argument_group('Tùy chọn giám sát áp lực PSI (--monitor --psi)')
+    psi_group.add_argument(
+        "--psi",
+        action="store_true",
+        help="Giám sát theo sự kiện qua trigger PSI (/proc/pressure/*) thay vì lấy mẫu theo chu kỳ.\n"
+             "Bắt được các lần nghẽn ngắn dưới 1 giây; in RAM/SWAP và top process khi có sự kiện."
+    )
+    psi_group.add_argument(
+        "--psi-resources",
+        nargs='+', choices=PSI_RESOURCES, default=list(PSI_RESOURCES), metavar='TÀI_NGUYÊN',
+        help="Tài nguyên PSI cần theo dõi (memory, cpu, io). Mặc định: tất cả"
+    )
+    psi_group.add_argument(
+        "--psi-stall",
+        type=int, default=DEFAULT_STALL_MS, metavar='MS',
+        help=f"Ngưỡng tổng thời gian nghẽn trong một cửa sổ (ms). Mặc định: {DEFAULT_STALL_MS}"
+    )
+    psi_group.add_argument(
+        "--psi-window",
+        type=int, default=DEFAULT_WINDOW_MS, metavar='MS',
+        help=f"Cửa sổ tính ngưỡng (ms, 500-10000; không phải root cần bội số 2000). Mặc định: {DEFAULT_WINDOW_MS}"
+    )
 
     # Tùy chọn cho chế độ thông tin (--info)
     info_group = parser.add_argument_group('Tùy chọn thông tin (--info)')
@@ -391,6 +571,19 @@ def main():
         if args.num_procs <= 0:
              parser.error("Số lượng process (--num-procs) phải lớn hơn 0.")
 
+        if args.psi:
+            monitor_pressure(
+                duration=args.duration,
+                resources=args.psi_resources,
+                stall_ms=args.psi_stall,
+                window_ms=args.psi_window,
+                log_file=args.log,
+                num_top_procs=args.num_procs,
+                history_dir=args.history_dir,
+                sample_log=args.sample_log
+            )
+            return
+
         monitor_memory(
             duration=args.duration,
             interval=args.interval,
@@ -398,7 +591,10 @@ def main():
             swap_threshold=args.swap_threshold, # Sử dụng tham số mới
             log_file=args.log,
             show_procs_on_alert=args.show_procs_on_alert, # Thêm tham số mới
-            num_top_procs=args.num_procs # Thêm tham số mới
+            num_top_procs=args.num_procs, # Thêm tham số mới
+            jitter=args.jitter,
+            history_dir=args.history_dir,
+            sample_log=args.sample_log
         )
     elif args.info:
          # --- Bổ sung: Validation input cho info ---
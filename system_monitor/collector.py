@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Bộ thu thập hợp nhất: giám sát CPU, RAM, ổ cứng và mạng trong một tiến trình duy nhất.
+
+Thay vì chạy check_cpu.py, check_ram.py, check_disk.py và check_network.py thành bốn
+tiến trình với bốn vòng lặp sleep riêng, collector gọi lại các hàm get_* sẵn có từ
+một timer wheel dùng chung: mỗi nhóm chỉ số có chu kỳ riêng nhưng cả tiến trình chỉ
+thức dậy một lần mỗi tick.
+"""
+
+import argparse
+import datetime
+import math
+import sys
+import time
+
+import check_cpu
+import check_disk
+import check_network
+import check_ram
+from scheduler import FixedRateScheduler
+
+DEFAULT_INTERVALS = {"cpu": 5, "ram": 5, "disk": 60, "net": 10}
+DEFAULT_THRESHOLD_PERCENT = 80
+DEFAULT_WHEEL_SLOTS = 64
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: mỗi slot ứng với một tick, job được đặt vào slot
+    (tick hiện tại + số tick chờ) % số slot, kèm số vòng quay còn lại nếu
+    chu kỳ dài hơn một vòng bánh xe. Mỗi tick chỉ duyệt đúng một slot.
+    """
+
+    def __init__(self, slots=DEFAULT_WHEEL_SLOTS):
+        self.slots = [[] for _ in range(slots)]
+        self.current_tick = 0
+
+    def schedule(self, name, period_ticks, callback, delay_ticks=0):
+        """Đăng ký job lặp lại mỗi period_ticks tick, lần đầu sau delay_ticks tick."""
+        self._insert([name, max(1, period_ticks), callback, 0], delay_ticks)
+
+    def _insert(self, job, delay_ticks):
+        target = self.current_tick + delay_ticks
+        # Số vòng quay còn phải chờ: slot đích được duyệt lần đầu sau ((delay - 1) % số slot) + 1 tick
+        job[3] = (delay_ticks - 1) // len(self.slots) if delay_ticks > 0 else 0
+        self.slots[target % len(self.slots)].append(job)
+
+    def advance(self):
+        """
+        Xử lý tick hiện tại rồi tiến bánh xe thêm một tick.
+
+        Returns:
+            list: Danh sách (name, callback) đến hạn ở tick này.
+        """
+        slot_index = self.current_tick % len(self.slots)
+        slot = self.slots[slot_index]
+        due = []
+        waiting = []
+        for job in slot:
+            if job[3] > 0:
+                job[3] -= 1
+                waiting.append(job)
+            else:
+                due.append(job)
+        self.slots[slot_index] = waiting
+        for job in due:
+            self._insert(job, job[1])
+        self.current_tick += 1
+        return [(job[0], job[2]) for job in due]
+
+
+class MetricsCollector:
+    """
+    Gọi các hàm get_* của từng công cụ và giữ lại mẫu mới nhất của mỗi nhóm chỉ số.
+
+    Vì mọi nhóm chạy trong cùng tiến trình nên trạng thái lấy mẫu được dùng chung
+    giữa các tick: CPU được tính bằng CpuTimesSampler (chênh lệch cpu_times so với lần
+    trước) nên không cần chặn chờ mà vẫn là trung bình của toàn bộ chu kỳ.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD_PERCENT, ignore_fstypes=None, include_devices=None, verbose=True):
+        self.threshold = threshold
+        self.ignore_fstypes = ignore_fstypes
+        self.include_devices = include_devices
+        self.verbose = verbose
+        self.latest = {}
+        self.alerts = 0
+        self._last_net = None
+        self._cpu_sampler = check_cpu.CpuTimesSampler()
+
+    def _report(self, family, message, alert=False):
+        if alert:
+            self.alerts += 1
+        if self.verbose:
+            status = "CẢNH BÁO" if alert else "OK"
+            print(f"[{datetime.datetime.now():%Y-%m-%d %H:%M:%S}] {family.upper():<4} {message} - {status}")
+
+    def collect_cpu(self):
+        sample = self._cpu_sampler.sample()
+        total = sample["percent"]
+        self.latest["cpu"] = dict(sample, time=time.time())
+        self._report("cpu", f"Tổng: {total:.1f}% (cao nhất một lõi: {max(sample['per_cpu'], default=0.0):.1f}%) "
+                            f"[{check_cpu.format_cpu_times(sample['times'])}]",
+                     alert=total >= self.threshold)
+
+    def collect_ram(self):
+        memory_info = check_ram.get_memory_info()
+        if not memory_info:
+            return
+        self.latest["ram"] = dict(memory_info, time=time.time())
+        ram, swap = memory_info["ram"], memory_info["swap"]
+        self._report("ram", f"RAM: {ram['percent']:.1f}% ({check_ram.get_size(ram['used'])}/{check_ram.get_size(ram['total'])}), "
+                            f"SWAP: {swap['percent']:.1f}%",
+                     alert=ram["percent"] >= self.threshold)
+
+    def collect_disk(self):
+        disk_info = check_disk.get_disk_info(self.ignore_fstypes, self.include_devices)
+        self.latest["disk"] = {"time": time.time(), "partitions": disk_info, "io": check_disk.get_io_stats()}
+        for disk in disk_info:
+            if disk["unreachable"]:
+                self._report("disk", f"{disk['mountpoint']} ({disk['device']}): không phản hồi", alert=True)
+                continue
+            self._report("disk", f"{disk['mountpoint']} ({disk['device']}): {disk['percent']:.1f}% "
+                                 f"- {check_disk.get_size(disk['used'])}/{check_disk.get_size(disk['total'])}",
+                         alert=disk["percent"] >= self.threshold)
+
+    def collect_net(self):
+        stats = check_network.get_network_stats()
+        if not stats:
+            return
+        now = time.monotonic()
+        rates = {}
+        if self._last_net:
+            last_time, last_stats = self._last_net
+            elapsed = now - last_time
+            if elapsed > 0:
+                rates = {key: check_network._counter_delta(stats[key], last_stats[key]) / elapsed for key in stats}
+        self._last_net = (now, stats)
+        self.latest["net"] = {"time": time.time(), "totals": stats, "rates": rates}
+        if rates:
+            self._report("net", f"Nhận: {check_network.format_bytes(rates['bytes_recv'])}/s, "
+                                f"Gửi: {check_network.format_bytes(rates['bytes_sent'])}/s, "
+                                f"Lỗi: {rates['errin'] + rates['errout']:.1f}/s, Hủy: {rates['dropin'] + rates['dropout']:.1f}/s")
+
+
+def run_collector(collector, intervals, duration=0, tick=None, jitter=0.0, on_tick=None):
+    """
+    Chạy các nhóm chỉ số trên một timer wheel dùng chung.
+
+    Args:
+        collector (MetricsCollector): Đối tượng thu thập.
+        intervals (dict): Chu kỳ (giây, số nguyên) của từng nhóm: {"cpu": 5, ...}. Bỏ qua nhóm có chu kỳ <= 0.
+        duration (int): Thời gian chạy (giây), 0 = chạy đến khi bị dừng.
+        tick (int, optional): Độ dài một tick (giây). Mặc định là ước chung lớn nhất của các chu kỳ,
+                              để tiến trình không thức dậy khi không có việc.
+        jitter (float): Độ lệch pha ngẫu nhiên tối đa (giây) của tick đầu tiên.
+        on_tick (callable, optional): Gọi với danh sách nhóm vừa thu thập sau mỗi tick có việc
+                                      (ví dụ exporter dựng lại nội dung /metrics).
+    """
+    families = {name: period for name, period in intervals.items() if period > 0}
+    if not families:
+        print("Lỗi: Không có nhóm chỉ số nào được bật.", file=sys.stderr)
+        return
+    if tick is None:
+        tick = 0
+        for period in families.values():
+            tick = math.gcd(tick, period)
+
+    wheel = TimerWheel()
+    for name, period in families.items():
+        wheel.schedule(name, period // tick, getattr(collector, f"collect_{name}"))
+
+    print(f"Bắt đầu thu thập ({', '.join(f'{name}: {period}s' for name, period in families.items())}, tick {tick}s)"
+          + (f" trong {duration}s..." if duration else "..."))
+    scheduler = FixedRateScheduler(tick, duration or None, jitter=jitter)
+    try:
+        for scheduled_tick in scheduler:
+            # Các tick bị lỡ vẫn phải quay bánh xe để giữ đúng pha của từng nhóm;
+            # job đến hạn nhiều lần trong lúc lỡ chỉ chạy một lần.
+            due = {}
+            for _ in range(scheduled_tick.missed + 1):
+                due.update(wheel.advance())
+            for name, callback in due.items():
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"Lỗi khi thu thập {name}: {e}", file=sys.stderr)
+            if due and on_tick:
+                try:
+                    on_tick(list(due))
+                except Exception as e:
+                    print(f"Lỗi khi xử lý sau tick: {e}", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("\nThu thập bị dừng bởi người dùng.")
+    finally:
+        print(f"\nKết thúc thu thập. Tổng số cảnh báo: {collector.alerts}")
+        print(f"Lập lịch: {scheduler.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bộ thu thập hợp nhất CPU, RAM, ổ cứng và mạng trong một tiến trình.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("-d", "--duration", type=int, default=0, help="Thời gian thu thập (giây), 0 = chạy liên tục.")
+    parser.add_argument("-t", "--threshold", type=int, default=DEFAULT_THRESHOLD_PERCENT, help="Ngưỡng cảnh báo CPU/RAM/ổ cứng (%%).")
+    for name, period in DEFAULT_INTERVALS.items():
+        parser.add_argument(f"--{name}-interval", type=int, default=period,
+                            help=f"Chu kỳ thu thập nhóm {name} (giây), 0 = tắt.")
+    parser.add_argument("--tick", type=int, default=None, help="Độ dài một tick (giây). Mặc định: ước chung lớn nhất của các chu kỳ.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Độ lệch pha ngẫu nhiên tối đa (giây) của tick đầu tiên, tránh nhiều máy lấy mẫu cùng lúc.")
+    parser.add_argument("--ignore-fstype", nargs='+', default=['tmpfs', 'devtmpfs', 'squashfs', 'iso9660', 'udf', 'overlay', 'fuse.portal'],
+                        help="Danh sách các loại hệ thống file (fstype) cần bỏ qua.")
+    parser.add_argument("--include-device", nargs='+', default=None,
+                        help="Chỉ bao gồm các thiết bị có đường dẫn bắt đầu bằng các pattern này.")
+    args = parser.parse_args()
+
+    intervals = {name: getattr(args, f"{name}_interval") for name in DEFAULT_INTERVALS}
+    if any(period < 0 for period in intervals.values()):
+        parser.error("Chu kỳ thu thập không được âm.")
+    if args.duration < 0:
+        parser.error("Thời gian thu thập (--duration) không được âm.")
+    if args.tick is not None:
+        if args.tick <= 0:
+            parser.error("--tick phải lớn hơn 0.")
+        if any(period % args.tick for period in intervals.values()):
+            parser.error("Mọi chu kỳ thu thập phải là bội số của --tick.")
+
+    collector = MetricsCollector(threshold=args.threshold,
+                                 ignore_fstypes=args.ignore_fstype,
+                                 include_devices=args.include_device)
+    run_collector(collector, intervals, duration=args.duration, tick=args.tick, jitter=args.jitter)
+
+
+if __name__ == "__main__":
+    main()
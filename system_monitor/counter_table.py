@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Bảng bộ đếm dạng ma trận cho các bộ đếm theo thiết bị (ổ đĩa, card mạng).
+
+Mỗi thiết bị được gán một hàng cố định (theo thứ tự xuất hiện lần đầu) nên hai lần đọc
+liên tiếp trừ nhau bằng một phép toán NumPy duy nhất, thay vì lặp Python qua từng
+thiết bị và từng trường. Thiết bị mới xuất hiện hoặc đã biến mất có hàng NaN và bị
+đánh dấu không hợp lệ trong lần đó; khi hơn nửa số hàng là thiết bị đã biến mất, bảng
+được thu gọn lại chỉ còn thiết bị hiện có.
+
+NumPy là tùy chọn: khi không có (HAVE_NUMPY = False) các công cụ dùng lại đường tính
+bằng Python thuần.
+"""
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+
+class CounterTable:
+    """
+    Ma trận (thiết bị x trường) của lần đọc trước và phép tính chênh lệch vector hóa.
+
+    Ví dụ:
+        table = CounterTable(("bytes_sent", "bytes_recv"), wrap_bits=32)
+        names, delta, valid = table.update({"eth0": (100, 200)})
+    """
+
+    def __init__(self, fields, wrap_bits=None):
+        """
+        Args:
+            fields (sequence): Tên các trường, theo đúng thứ tự giá trị truyền vào update().
+            wrap_bits (int, optional): Độ rộng bộ đếm có thể tràn (ví dụ 32). Bộ đếm giảm mà giá trị
+                                       cũ nằm ở nửa trên của khoảng này được coi là tràn; các trường
+                                       hợp giảm khác được coi là reset và tính từ 0.
+        """
+        if not HAVE_NUMPY:
+            raise RuntimeError("CounterTable cần NumPy")
+        self.fields = tuple(fields)
+        self.field_index = {field: i for i, field in enumerate(self.fields)}
+        self.wrap_bits = wrap_bits
+        self.index = {} # tên thiết bị -> hàng
+        self.names = []
+        self._previous = None
+
+    def column(self, field):
+        return self.field_index[field]
+
+    def update(self, counters):
+        """
+        Ghi nhận lần đọc mới và trả về chênh lệch so với lần trước.
+
+        Args:
+            counters (dict): {tên thiết bị: dãy giá trị theo thứ tự fields} (namedtuple cũng được).
+
+        Returns:
+            tuple: (names, delta, valid) - names là danh sách tên theo hàng, delta là ma trận
+                   float64 (hàng x trường), valid là mảng bool các hàng có mặt ở cả hai lần đọc.
+                   Ma trận giá trị hiện tại có ở thuộc tính `current`.
+        """
+        for name in counters:
+            if name not in self.index:
+                self.index[name] = len(self.names)
+                self.names.append(name)
+        rows, cols = len(self.names), len(self.fields)
+
+        current = np.full((rows, cols), np.nan)
+        if counters:
+            row_index = np.fromiter((self.index[name] for name in counters), dtype=np.intp, count=len(counters))
+            current[row_index] = np.array([tuple(values)[:cols] for values in counters.values()], dtype=np.float64)
+
+        previous = self._previous
+        if previous is None:
+            previous = np.full((rows, cols), np.nan)
+        elif previous.shape[0] < rows:
+            previous = np.vstack([previous, np.full((rows - previous.shape[0], cols), np.nan)])
+
+        delta = current - previous
+        valid = ~np.isnan(delta).any(axis=1)
+        with np.errstate(invalid="ignore"):
+            decreased = delta < 0
+        if decreased.any():
+            if self.wrap_bits:
+                wrap = float(2 ** self.wrap_bits)
+                wrapped = decreased & (previous >= wrap / 2) & (previous < wrap)
+                delta[wrapped] += wrap
+                decreased &= ~wrapped
+            delta[decreased] = current[decreased] # Bộ đếm bị reset: tính từ 0
+
+        if counters and rows - len(counters) > rows // 2:
+            # Hơn nửa số hàng là thiết bị đã biến mất (ví dụ veth của container): dựng lại chỉ mục
+            # chỉ gồm thiết bị hiện có để ma trận không phình mãi. Hàng bị bỏ vốn đã không hợp lệ.
+            keep = np.sort(row_index)
+            self.names = [self.names[row] for row in keep]
+            self.index = {name: row for row, name in enumerate(self.names)}
+            current, delta, valid = current[keep], delta[keep], valid[keep]
+        elif not counters:
+            self.names, self.index = [], {}
+            current, delta, valid = current[:0], delta[:0], valid[:0]
+
+        self._previous = current
+        self.current = current
+        return self.names, delta, valid
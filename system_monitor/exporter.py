@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Exporter Prometheus: phục vụ /metrics từ bộ nhớ đệm do một thread thu thập nền cập nhật.
+
+Thread nền chạy MetricsCollector của collector.py (get_memory_info, get_disk_info,
+get_io_stats, get_network_stats và CpuTimesSampler) trên timer wheel dùng chung; sau mỗi
+tick có dữ liệu mới, toàn bộ nội dung /metrics được dựng lại thành bytes một lần. Mỗi lần
+scrape chỉ trả về bytes đã dựng sẵn: không gọi psutil, không chạm đĩa. Ngoài thread HTTP
+(chính) và thread thu thập, chỉ có vài thread statvfs dùng lại khi máy có mount mạng/FUSE
+(xem UsageProber trong check_disk.py).
+
+Nếu thread thu thập dừng hẳn, /metrics trả về 503 thay vì phục vụ mãi bản dựng cuối;
+gauge itsupport_exporter_last_render_timestamp_seconds cũng ngừng tiến lên.
+
+Kiểm tra nhanh:
+    python exporter.py --port 9110 &
+    curl -s http://127.0.0.1:9110/metrics
+"""
+
+import argparse
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import check_cpu
+from collector import DEFAULT_INTERVALS, MetricsCollector, run_collector
+
+DEFAULT_LISTEN_ADDRESS = "0.0.0.0"
+DEFAULT_PORT = 9110
+METRIC_PREFIX = "itsupport"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsRenderer:
+    """Dựng văn bản định dạng Prometheus (text exposition 0.0.4), mỗi metric một khối HELP/TYPE."""
+
+    def __init__(self):
+        self._families = {} # tên -> (type, help, [dòng mẫu])
+
+    def add(self, name, metric_type, help_text, value, labels=None):
+        if value is None:
+            return
+        name = f"{METRIC_PREFIX}_{name}"
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (metric_type, help_text, [])
+        label_str = ""
+        if labels:
+            label_str = "{" + ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels.items()) + "}"
+        family[2].append(f"{name}{label_str} {float(value)!r}")
+
+    def render(self):
+        lines = []
+        for name, (metric_type, help_text, samples) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(samples)
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def render_metrics(latest, collect_times, rendered_at=None):
+    """
+    Chuyển MetricsCollector.latest thành nội dung /metrics.
+
+    Args:
+        latest (dict): Mẫu mới nhất của từng nhóm ("cpu", "ram", "disk", "net").
+        collect_times (dict): Thời điểm (time.time()) thu thập thành công gần nhất của từng nhóm.
+        rendered_at (float, optional): Thời điểm (time.time()) dựng nội dung.
+
+    Returns:
+        bytes: Nội dung đã mã hóa UTF-8.
+    """
+    m = MetricsRenderer()
+    cpu = latest.get("cpu")
+    if cpu:
+        m.add("cpu_usage_percent", "gauge", "Tổng mức sử dụng CPU trong chu kỳ thu thập gần nhất.", cpu["percent"])
+        for core, percent in enumerate(cpu["per_cpu"]):
+            m.add("cpu_core_usage_percent", "gauge", "Mức sử dụng từng lõi CPU.", percent, {"core": core})
+        for mode in check_cpu.CpuTimesSampler.BREAKDOWN_FIELDS:
+            m.add("cpu_mode_percent", "gauge", "Phân rã thời gian CPU theo chế độ.", cpu["times"].get(mode), {"mode": mode})
+
+    ram = latest.get("ram")
+    if ram:
+        for kind in ("ram", "swap"):
+            for key, value in ram[kind].items():
+                if key == "percent":
+                    m.add(f"{kind}_usage_percent", "gauge", f"Tỷ lệ sử dụng {kind.upper()}.", value)
+                else:
+                    m.add(f"{kind}_{key}_bytes", "gauge", f"{kind.upper()} {key} (byte).", value)
+
+    disk = latest.get("disk")
+    if disk:
+        for part in disk["partitions"]:
+            labels = {"device": part["device"], "mountpoint": part["mountpoint"], "fstype": part["fstype"]}
+            m.add("filesystem_size_bytes", "gauge", "Dung lượng phân vùng (byte).", part["total"], labels)
+            m.add("filesystem_used_bytes", "gauge", "Dung lượng đã dùng (byte).", part["used"], labels)
+            m.add("filesystem_free_bytes", "gauge", "Dung lượng còn trống (byte).", part["free"], labels)
+            m.add("filesystem_usage_percent", "gauge", "Tỷ lệ sử dụng phân vùng.", part["percent"], labels)
+            m.add("filesystem_unreachable", "gauge", "1 nếu phân vùng không phản hồi statvfs trong hạn (mount treo).",
+                  int(part["unreachable"]), labels)
+        for device, io in (disk["io"] or {}).items():
+            labels = {"device": device}
+            m.add("disk_read_bytes_total", "counter", "Tổng số byte đã đọc.", io.read_bytes, labels)
+            m.add("disk_written_bytes_total", "counter", "Tổng số byte đã ghi.", io.write_bytes, labels)
+            m.add("disk_reads_total", "counter", "Tổng số lần đọc.", io.read_count, labels)
+            m.add("disk_writes_total", "counter", "Tổng số lần ghi.", io.write_count, labels)
+
+    net = latest.get("net")
+    if net:
+        for key, value in net["totals"].items():
+            m.add(f"network_{key}_total", "counter", f"Tổng {key} trên mọi card mạng.", value)
+
+    for family, timestamp in collect_times.items():
+        m.add("collector_last_success_timestamp_seconds", "gauge",
+              "Thời điểm thu thập thành công gần nhất của từng nhóm chỉ số.", timestamp, {"family": family})
+    m.add("exporter_last_render_timestamp_seconds", "gauge",
+          "Thời điểm dựng lại /metrics gần nhất; ngừng tiến lên nếu thread thu thập bị dừng.", rendered_at)
+    return m.render()
+
+
+class MetricsCache:
+    """Giữ bytes /metrics đã dựng sẵn; thay thế nguyên khối nên không cần khóa khi đọc."""
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.collect_times = {}
+        self.payload = b""
+        self.renders = 0
+
+    def update(self, families):
+        # Thời điểm do chính hàm collect_* ghi vào mẫu: tick lỗi hoặc bỏ qua không làm nó tiến lên
+        self.collect_times = {family: sample["time"] for family, sample in self.collector.latest.items()}
+        self.payload = render_metrics(self.collector.latest, self.collect_times, time.time())
+        self.renders += 1
+
+
+def make_handler(cache, worker=None):
+    """worker: thread thu thập; khi nó đã dừng, /metrics trả về 503 thay vì dữ liệu cũ."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics" and worker is not None and not worker.is_alive():
+                body, content_type, status = b"Collector thread stopped\n", "text/plain", 503
+            elif path == "/metrics":
+                body, content_type, status = cache.payload, CONTENT_TYPE, 200
+            elif path == "/":
+                body, content_type, status = b'<html><body><a href="/metrics">/metrics</a></body></html>', "text/html", 200
+            else:
+                body, content_type, status = b"Not found\n", "text/plain", 404
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Không in một dòng cho mỗi lần scrape
+
+    return MetricsHandler
+
+
+def serve(listen, port, intervals, ignore_fstypes=None, include_devices=None, jitter=0.0):
+    """Khởi động thread thu thập rồi phục vụ HTTP trên thread hiện tại đến khi bị dừng."""
+    collector = MetricsCollector(ignore_fstypes=ignore_fstypes, include_devices=include_devices, verbose=False)
+    cache = MetricsCache(collector)
+    worker = threading.Thread(target=run_collector, name="collector", daemon=True,
+                              args=(collector, intervals), kwargs={"jitter": jitter, "on_tick": cache.update})
+    worker.start()
+
+    try:
+        server = HTTPServer((listen, port), make_handler(cache, worker))
+    except OSError as e:
+        print(f"Lỗi: Không thể lắng nghe trên {listen}:{port}: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Exporter đang phục vụ http://{listen}:{port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nExporter bị dừng bởi người dùng.")
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exporter Prometheus cho CPU, RAM, ổ cứng và mạng (phục vụ /metrics từ bộ nhớ đệm).",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--listen", default=DEFAULT_LISTEN_ADDRESS, help="Địa chỉ lắng nghe.")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT, help="Cổng HTTP.")
+    for name, period in DEFAULT_INTERVALS.items():
+        parser.add_argument(f"--{name}-interval", type=int, default=period,
+                            help=f"Chu kỳ thu thập nhóm {name} (giây), 0 = tắt.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Độ lệch pha ngẫu nhiên tối đa (giây) của tick đầu tiên.")
+    parser.add_argument("--ignore-fstype", nargs='+', default=['tmpfs', 'devtmpfs', 'squashfs', 'iso9660', 'udf', 'overlay', 'fuse.portal'],
+                        help="Danh sách các loại hệ thống file (fstype) cần bỏ qua.")
+    parser.add_argument("--include-device", nargs='+', default=None,
+                        help="Chỉ bao gồm các thiết bị có đường dẫn bắt đầu bằng các pattern này.")
+    args = parser.parse_args()
+
+    intervals = {name: getattr(args, f"{name}_interval") for name in DEFAULT_INTERVALS}
+    if any(period < 0 for period in intervals.values()):
+        parser.error("Chu kỳ thu thập không được âm.")
+    if not 0 < args.port < 65536:
+        parser.error("Cổng (--port) phải trong khoảng 1-65535.")
+
+    serve(args.listen, args.port, intervals, args.ignore_fstype, args.include_device, args.jitter)
+
+
+if __name__ == "__main__":
+    main()
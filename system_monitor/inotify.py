@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Bọc tối giản inotify(7) của Linux qua ctypes, không cần thư viện ngoài.
+
+Chỉ gồm phần các công cụ giám sát cần: tạo instance, thêm/bỏ watch và đọc sự kiện
+có hạn chờ. Trên hệ thống không có inotify (không phải Linux), khởi tạo Inotify báo
+OSError để nơi gọi chuyển sang quét định kỳ.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+from collections import namedtuple
+
+# Các cờ sự kiện (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+MAX_WATCHES_PATH = "/proc/sys/fs/inotify/max_user_watches"
+READ_BUFFER_SIZE = 64 * 1024
+# struct inotify_event: wd, mask, cookie, len, sau đó là tên (len byte, đệm bằng \0)
+EVENT_HEADER = struct.Struct("iIII")
+
+# name là chuỗi rỗng với sự kiện của chính thư mục được watch
+InotifyEvent = namedtuple("InotifyEvent", ["wd", "mask", "cookie", "name"])
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        if not hasattr(_libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "libc không hỗ trợ inotify")
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return _libc
+
+
+def _raise_errno(message):
+    err = ctypes.get_errno()
+    raise OSError(err, f"{message}: {os.strerror(err)}")
+
+
+def max_user_watches():
+    """Giới hạn số watch của mỗi user (fs.inotify.max_user_watches), None nếu không đọc được."""
+    try:
+        with open(MAX_WATCHES_PATH) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+class Inotify:
+    """
+    Một instance inotify.
+
+    Ví dụ:
+        with Inotify() as ino:
+            wd = ino.add_watch("/var/log", IN_CREATE | IN_MODIFY)
+            for event in ino.read_events(timeout=1.0):
+                ...
+    """
+
+    def __init__(self):
+        libc = _get_libc()
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            _raise_errno("inotify_init1")
+        self._poller = select.poll()
+        self._poller.register(self.fd, select.POLLIN)
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask):
+        """
+        Thêm (hoặc cập nhật) watch cho path và trả về watch descriptor.
+
+        Raises:
+            OSError: errno ENOSPC khi vượt giới hạn max_user_watches, ENOENT/EACCES/ENOTDIR...
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            _raise_errno(f"inotify_add_watch '{path}'")
+        return wd
+
+    def rm_watch(self, wd):
+        """Bỏ watch; bỏ qua lỗi nếu watch đã tự mất (thư mục bị xóa)."""
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout=None):
+        """
+        Đọc các sự kiện đang chờ, chờ tối đa timeout giây nếu chưa có (None = chờ mãi).
+
+        Returns:
+            list: Danh sách InotifyEvent (rỗng nếu hết hạn chờ).
+        """
+        if not self._poller.poll(None if timeout is None else max(0, int(timeout * 1000))):
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, READ_BUFFER_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                events.append(InotifyEvent(wd, mask, cookie, os.fsdecode(name)))
+            if len(data) < READ_BUFFER_SIZE // 2:
+                break # Đã lấy hết phần đang chờ
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
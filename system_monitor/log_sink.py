@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Ghi log bất đồng bộ cho các vòng lặp giám sát.
+
+Vòng lặp chỉ đưa dòng log vào một hàng đợi có giới hạn (không bao giờ chờ I/O); một
+thread nền gom các dòng lại và ghi ra file theo lô, khi đủ flush_bytes hoặc sau
+flush_interval giây. Nếu đĩa chậm đến mức hàng đợi đầy, dòng mới bị bỏ và được đếm
+trong `dropped` thay vì làm chậm việc lấy mẫu.
+"""
+
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+DEFAULT_MAX_QUEUE = 10000 # dòng
+DEFAULT_FLUSH_BYTES = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 1.0 # giây
+_STOP = object()
+
+
+class AsyncLogSink:
+    """
+    File log ghi bởi thread nền.
+
+    Ví dụ:
+        with AsyncLogSink("/var/log/ram.log") as sink:
+            sink.write("RAM: 42%")
+    """
+
+    def __init__(self, path, max_queue=DEFAULT_MAX_QUEUE, flush_bytes=DEFAULT_FLUSH_BYTES,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, encoding="utf-8"):
+        """
+        Args:
+            path (str): File log (ghi nối tiếp, tạo thư mục nếu chưa có).
+            max_queue (int): Số dòng tối đa chờ ghi; vượt quá thì dòng mới bị bỏ.
+            flush_bytes (int): Ghi ra file khi lô đang gom đạt số byte này.
+            flush_interval (float): Ghi ra file ít nhất mỗi flush_interval giây nếu có dữ liệu.
+
+        Raises:
+            OSError: Nếu không tạo được thư mục hoặc mở được file (báo ngay, không để thread nền nuốt lỗi).
+        """
+        log_dir = os.path.dirname(path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._file = open(path, "a", encoding=encoding)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"log-sink:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def write(self, line):
+        """Đưa một dòng (hoặc nhiều dòng nối bằng '\\n') vào hàng đợi, không chờ."""
+        if self._closed:
+            return
+        if not line.endswith("\n"):
+            line += "\n"
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self):
+        batch = []
+        batch_bytes = 0
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+                    batch_bytes += len(item)
+                    # Lấy luôn những gì đang chờ để ghi một lần thay vì từng dòng
+                    while batch_bytes < self.flush_bytes:
+                        item = self._queue.get_nowait()
+                        if item is _STOP:
+                            stopping = True
+                            break
+                        batch.append(item)
+                        batch_bytes += len(item)
+            except queue.Empty:
+                pass
+            if batch and (stopping or batch_bytes >= self.flush_bytes or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                batch_bytes = 0
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+        self._file.close()
+
+    def _flush(self, batch):
+        try:
+            self._file.write("".join(batch))
+            self._file.flush()
+            self.written += len(batch)
+        except OSError as e:
+            with self._lock:
+                self.dropped += len(batch)
+            print(f"Lỗi khi ghi log '{self.path}': {e}", file=sys.stderr)
+
+    def close(self, timeout=5.0):
+        """Ghi nốt các dòng còn lại rồi đóng file (chờ tối đa timeout giây)."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SinkHandler(logging.Handler):
+    """logging.Handler ghi qua AsyncLogSink, dùng thay cho logging.FileHandler."""
+
+    def __init__(self, path, **sink_options):
+        super().__init__()
+        self.sink = AsyncLogSink(path, **sink_options)
+        self.baseFilename = os.path.abspath(path)
+
+    def emit(self, record):
+        try:
+            self.sink.write(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.sink.close()
+        super().close()
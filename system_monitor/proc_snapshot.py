@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Ảnh chụp bảng process dùng chung cho các công cụ giám sát (CPU, RAM, mạng).
+
+Trên Linux mỗi lần làm mới đọc /proc/<pid>/stat (comm, trạng thái, ppid, thời gian CPU,
+thời điểm khởi động) và /proc/<pid>/statm (RSS) cho mỗi process. Ảnh chụp được
+giữ trong ttl giây nên nhiều lần tra cứu trong cùng một tick (ví dụ một PID sở hữu hàng
+nghìn socket) chỉ tốn một lần quét. Tên đầy đủ và cmdline được đọc khi cần lần đầu và
+cache theo (pid, start_time), tự bị xóa khi process kết thúc hoặc PID bị tái sử dụng.
+Nền tảng không có /proc dùng psutil.process_iter làm nguồn dữ liệu.
+"""
+
+import heapq
+import os
+import sys
+import time
+from collections import namedtuple
+
+try:
+    import psutil
+except ImportError:
+    print("Lỗi: Thư viện 'psutil' chưa được cài đặt.")
+    print("Vui lòng cài đặt bằng lệnh: pip install psutil")
+    sys.exit(1)
+
+DEFAULT_TTL = 1.0 # giây
+PROC_DIR = "/proc"
+COMM_MAX_LEN = 15 # Kernel cắt comm còn 15 ký tự
+
+# start_time: số clock tick kể từ khi khởi động máy (Linux) hoặc create_time (psutil);
+# cpu_user/cpu_system: giây; rss: byte
+ProcessInfo = namedtuple("ProcessInfo", ["pid", "ppid", "name", "state", "start_time", "cpu_user", "cpu_system", "rss"])
+
+
+class ProcessSnapshot:
+    """
+    Bảng process được làm mới tối đa một lần mỗi ttl giây.
+
+    Ví dụ:
+        snapshot = get_snapshot()
+        for info in snapshot.top_by_rss(5):
+            print(info.pid, snapshot.name(info.pid), info.rss)
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._use_proc = os.path.exists(os.path.join(PROC_DIR, "self", "stat"))
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self._clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self._processes = {} # pid -> ProcessInfo
+        self._names = {} # (pid, start_time) -> tên đầy đủ
+        self._cmdlines = {} # (pid, start_time) -> list tham số
+        self._taken_at = None
+        self._total_memory = None
+        self.refreshes = 0
+
+    # --- Làm mới ---
+    def refresh(self, force=False):
+        """Quét lại bảng process nếu ảnh chụp đã cũ hơn ttl giây (hoặc force=True)."""
+        now = self._clock()
+        if not force and self._taken_at is not None and now - self._taken_at < self.ttl:
+            return
+        if self._use_proc:
+            processes = {}
+            for entry in os.listdir(PROC_DIR):
+                if entry.isdigit():
+                    info = self._read_proc(int(entry))
+                    if info is not None:
+                        processes[info.pid] = info
+        else:
+            processes = self._read_psutil()
+        self._processes = processes
+        self._taken_at = now
+        self.refreshes += 1
+
+        # Xóa cache của các process đã kết thúc hoặc PID đã bị tái sử dụng
+        for cache in (self._names, self._cmdlines):
+            for key in [key for key in cache if self._key(key[0]) != key]:
+                del cache[key]
+
+    def _read_proc(self, pid):
+        """Đọc một dòng /proc/<pid>/stat thành ProcessInfo, None nếu process đã kết thúc."""
+        try:
+            with open(f"{PROC_DIR}/{pid}/stat", "rb") as f:
+                data = f.read()
+            # comm nằm trong ngoặc và có thể chứa khoảng trắng hoặc ')'
+            comm_end = data.rindex(b")")
+            comm = data[data.index(b"(") + 1:comm_end].decode(errors="replace")
+            fields = data[comm_end + 2:].split()
+            # statm: size resident shared ... (đơn vị trang); resident là RSS
+            with open(f"{PROC_DIR}/{pid}/statm", "rb") as f:
+                rss_pages = int(f.read().split()[1])
+            # fields[0] là trường thứ 3 (state) trong proc(5)
+            return ProcessInfo(pid=pid,
+                               ppid=int(fields[1]),
+                               name=comm,
+                               state=fields[0].decode(),
+                               start_time=int(fields[19]),
+                               cpu_user=int(fields[11]) / self._clock_ticks,
+                               cpu_system=int(fields[12]) / self._clock_ticks,
+                               rss=rss_pages * self._page_size)
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def _read_psutil(self):
+        processes = {}
+        attrs = ['pid', 'ppid', 'name', 'status', 'create_time', 'cpu_times', 'memory_info']
+        for proc in psutil.process_iter(attrs):
+            info = proc.info
+            cpu, mem = info.get('cpu_times'), info.get('memory_info')
+            processes[info['pid']] = ProcessInfo(pid=info['pid'],
+                                                 ppid=info.get('ppid'),
+                                                 name=info.get('name') or "",
+                                                 state=info.get('status'),
+                                                 start_time=info.get('create_time'),
+                                                 cpu_user=cpu.user if cpu else 0.0,
+                                                 cpu_system=cpu.system if cpu else 0.0,
+                                                 rss=mem.rss if mem else 0)
+        return processes
+
+    def _key(self, pid):
+        info = self._processes.get(pid)
+        return (pid, info.start_time) if info else None
+
+    # --- Tra cứu ---
+    def processes(self):
+        """Danh sách ProcessInfo của ảnh chụp hiện tại."""
+        self.refresh()
+        return list(self._processes.values())
+
+    def get(self, pid):
+        """
+        ProcessInfo của pid, hoặc None nếu không tồn tại.
+
+        Process xuất hiện sau lần quét gần nhất (ví dụ chủ của một socket vừa mở)
+        được đọc riêng lẻ rồi bổ sung vào ảnh chụp thay vì quét lại toàn bộ.
+        """
+        self.refresh()
+        info = self._processes.get(pid)
+        if info is None and pid and self._use_proc:
+            info = self._read_proc(pid)
+            if info is not None:
+                self._processes[pid] = info
+        return info
+
+    def cmdline(self, pid):
+        """Danh sách tham số dòng lệnh của pid (rỗng với kernel thread hoặc khi không đọc được)."""
+        info = self.get(pid)
+        if info is None:
+            return []
+        key = (pid, info.start_time)
+        cmdline = self._cmdlines.get(key)
+        if cmdline is None:
+            try:
+                if self._use_proc:
+                    with open(f"{PROC_DIR}/{pid}/cmdline", "rb") as f:
+                        cmdline = [arg.decode(errors="replace") for arg in f.read().split(b"\0") if arg]
+                else:
+                    cmdline = psutil.Process(pid).cmdline()
+            except (OSError, psutil.Error):
+                cmdline = []
+            self._cmdlines[key] = cmdline
+        return cmdline
+
+    def name(self, pid, default=None):
+        """
+        Tên process của pid, hoặc default nếu không tồn tại.
+
+        comm bị kernel cắt còn 15 ký tự; khi đó tên đầy đủ được lấy từ argv[0]
+        (cùng cách psutil làm) và cache lại để chỉ đọc cmdline một lần.
+        """
+        info = self.get(pid)
+        if info is None:
+            return default
+        key = (pid, info.start_time)
+        name = self._names.get(key)
+        if name is None:
+            name = info.name
+            if self._use_proc and len(name) >= COMM_MAX_LEN:
+                cmdline = self.cmdline(pid)
+                if cmdline:
+                    exe_name = os.path.basename(cmdline[0])
+                    if exe_name.startswith(name):
+                        name = exe_name
+            self._names[key] = name
+        return name
+
+    def cpu_times(self, pid):
+        """(user, system) giây CPU đã dùng của pid, hoặc None nếu không tồn tại."""
+        info = self.get(pid)
+        return (info.cpu_user, info.cpu_system) if info else None
+
+    def memory_percent(self, info):
+        """Tỷ lệ RSS của process so với tổng RAM (%), cùng cách tính với psutil."""
+        if self._total_memory is None:
+            self._total_memory = psutil.virtual_memory().total
+        return info.rss * 100 / self._total_memory
+
+    def top_by_rss(self, n):
+        """n process dùng nhiều RAM (RSS) nhất, chọn bằng heap thay vì sắp xếp toàn bộ."""
+        self.refresh()
+        # Bỏ qua kernel thread (RSS = 0)
+        return heapq.nlargest(n, (info for info in self._processes.values() if info.rss > 0),
+                              key=lambda info: info.rss)
+
+
+_shared_snapshot = None
+
+def get_snapshot():
+    """Ảnh chụp dùng chung trong tiến trình, để mọi công cụ chạy cùng nhau chỉ quét /proc một lần mỗi tick."""
+    global _shared_snapshot
+    if _shared_snapshot is None:
+        _shared_snapshot = ProcessSnapshot()
+    return _shared_snapshot
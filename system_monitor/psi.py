@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Pressure Stall Information (PSI) của Linux: đọc /proc/pressure/* và đăng ký trigger.
+
+Trigger PSI ("some <stall_us> <window_us>" ghi vào /proc/pressure/<tài nguyên>) khiến
+kernel báo POLLPRI khi tổng thời gian bị nghẽn trong một cửa sổ vượt ngưỡng, nên vòng
+giám sát chỉ thức dậy khi thực sự có áp lực. Tài nguyên không đặt được trigger (kernel
+cũ, thiếu quyền CAP_SYS_RESOURCE với cửa sổ không phải bội số 2 giây...) được đọc định
+kỳ mỗi cửa sổ và so sánh mức tăng của bộ đếm total với cùng ngưỡng.
+
+Xem Documentation/accounting/psi.rst.
+"""
+
+import os
+import select
+import time
+
+PSI_DIR = "/proc/pressure"
+PSI_RESOURCES = ("memory", "cpu", "io")
+DEFAULT_STALL_MS = 150
+DEFAULT_WINDOW_MS = 2000 # Bội số 2 giây: người dùng thường cũng đặt được trigger (kernel >= 6.5)
+MIN_WINDOW_MS = 500
+MAX_WINDOW_MS = 10000
+
+
+def read_pressure(resource):
+    """
+    Đọc /proc/pressure/<resource>.
+
+    Returns:
+        dict: {"some": {"avg10", "avg60", "avg300", "total"}, "full": {...}} - avg là %,
+              total là micro giây tích lũy. None nếu không đọc được (kernel không có PSI).
+    """
+    try:
+        with open(os.path.join(PSI_DIR, resource)) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    result = {}
+    for line in lines:
+        kind, _, fields = line.partition(" ")
+        values = dict(field.split("=", 1) for field in fields.split())
+        result[kind] = {key: (int(value) if key == "total" else float(value)) for key, value in values.items()}
+    return result
+
+
+class PressureTriggers:
+    """
+    Chờ sự kiện áp lực trên nhiều tài nguyên PSI cùng lúc.
+
+    Ví dụ:
+        with PressureTriggers(("memory", "io"), stall_ms=150, window_ms=2000) as triggers:
+            while True:
+                for resource in triggers.wait(timeout=60):
+                    print(resource, read_pressure(resource))
+    """
+
+    def __init__(self, resources=PSI_RESOURCES, stall_ms=DEFAULT_STALL_MS, window_ms=DEFAULT_WINDOW_MS):
+        """
+        Raises:
+            ValueError: stall_ms/window_ms ngoài giới hạn kernel cho phép.
+        """
+        if not MIN_WINDOW_MS <= window_ms <= MAX_WINDOW_MS:
+            raise ValueError(f"Cửa sổ PSI phải trong khoảng {MIN_WINDOW_MS}-{MAX_WINDOW_MS}ms")
+        if not 0 < stall_ms <= window_ms:
+            raise ValueError("Ngưỡng nghẽn PSI phải lớn hơn 0 và không vượt quá cửa sổ")
+        self.stall_us = int(stall_ms * 1000)
+        self.window_us = int(window_ms * 1000)
+        self.triggered = [] # tài nguyên dùng trigger của kernel
+        self.polled = {} # tài nguyên đọc định kỳ -> total "some" lần đọc trước
+        self.unavailable = {} # tài nguyên không dùng được -> lý do
+        self._fds = {}
+        self._poller = select.poll()
+        self._next_poll = time.monotonic() + window_ms / 1000
+
+        for resource in resources:
+            pressure = read_pressure(resource)
+            if pressure is None or "some" not in pressure:
+                self.unavailable[resource] = "không đọc được " + os.path.join(PSI_DIR, resource)
+                continue
+            try:
+                fd = os.open(os.path.join(PSI_DIR, resource), os.O_RDWR | os.O_NONBLOCK | os.O_CLOEXEC)
+            except OSError as e:
+                self.polled[resource] = pressure["some"]["total"]
+                self.unavailable[resource] = f"không mở được để đặt trigger ({e.strerror}), đọc định kỳ"
+                continue
+            try:
+                os.write(fd, f"some {self.stall_us} {self.window_us}\0".encode())
+            except OSError as e:
+                os.close(fd)
+                self.polled[resource] = pressure["some"]["total"]
+                self.unavailable[resource] = f"không đặt được trigger ({e.strerror}), đọc định kỳ"
+                continue
+            self._fds[fd] = resource
+            self._poller.register(fd, select.POLLPRI)
+            self.triggered.append(resource)
+
+    @property
+    def resources(self):
+        return self.triggered + list(self.polled)
+
+    def _poll_fallback(self):
+        fired = []
+        for resource, last_total in self.polled.items():
+            pressure = read_pressure(resource)
+            if pressure is None:
+                continue
+            total = pressure["some"]["total"]
+            self.polled[resource] = total
+            if total - last_total >= self.stall_us:
+                fired.append(resource)
+        return fired
+
+    def wait(self, timeout=None):
+        """
+        Chờ đến khi có tài nguyên vượt ngưỡng, tối đa timeout giây (None = chờ mãi).
+
+        Returns:
+            list: Tên các tài nguyên vừa vượt ngưỡng (rỗng nếu hết hạn chờ).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            wake = deadline
+            if self.polled:
+                wake = self._next_poll if wake is None else min(wake, self._next_poll)
+            wait_ms = None if wake is None else max(0, int((wake - now) * 1000))
+            if not self._fds and wait_ms is None:
+                raise RuntimeError("Không có tài nguyên PSI nào để chờ")
+            fired = []
+            for fd, events in self._poller.poll(wait_ms):
+                resource = self._fds[fd]
+                if events & select.POLLERR:
+                    # Trigger không còn hiệu lực: chuyển sang đọc định kỳ
+                    self._poller.unregister(fd)
+                    os.close(fd)
+                    del self._fds[fd]
+                    self.triggered.remove(resource)
+                    pressure = read_pressure(resource)
+                    self.polled[resource] = pressure["some"]["total"] if pressure else 0
+                elif events & select.POLLPRI:
+                    fired.append(resource)
+            now = time.monotonic()
+            if self.polled and now >= self._next_poll:
+                fired += self._poll_fallback()
+                self._next_poll = now + self.window_us / 1e6
+            if fired or (deadline is not None and now >= deadline):
+                return fired
+
+    def close(self):
+        for fd in self._fds:
+            os.close(fd)
+        self._fds.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
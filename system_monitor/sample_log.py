@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Log mẫu giám sát dạng nhị phân, chỉ ghi nối tiếp (append-only), lưu theo cột.
+
+Cấu trúc file: header SAMPLE_LOG_MAGIC, sau đó là chuỗi các block. Mỗi block chứa các mẫu
+liên tiếp của một chỉ số: header cố định (số mẫu, khoảng thời gian, min/max/tổng của giá
+trị, CRC32) + tên chỉ số + payload nén zlib gồm cột thời điểm float64 rồi cột giá trị
+float64. Nhờ thống kê nằm sẵn trong header, việc tổng hợp chỉ phải giải nén các block ở
+biên khoảng thời gian; phát lại (replay) cũng chỉ là giải nén rồi array.frombytes.
+
+Dùng từ dòng lệnh:
+    python sample_log.py /var/log/itsupport/samples.bin --since 86400
+    python sample_log.py samples.bin --metric cpu --replay
+"""
+
+import argparse
+import datetime
+import heapq
+import itertools
+import math
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+SAMPLE_LOG_MAGIC = b"SMLOG1\0\0"
+BLOCK_MAGIC = b"BLK1"
+# magic, độ dài tên, số mẫu, độ dài payload nén, crc32 payload, t_first, t_last, v_min, v_max, v_sum
+BLOCK_HEADER = struct.Struct("=4sHIIIddddd")
+DEFAULT_BLOCK_SAMPLES = 4096
+DEFAULT_FLUSH_INTERVAL = 60 # giây
+COMPRESSION_LEVEL = 6
+
+
+class SampleLogWriter:
+    """
+    Ghi mẫu vào log nhị phân. Mẫu được gom trong bộ nhớ theo từng chỉ số và chỉ ghi ra đĩa
+    thành block khi đủ block_samples mẫu hoặc sau flush_interval giây, nên mỗi tick giám sát
+    không phát sinh lần ghi file nào.
+    """
+
+    def __init__(self, path, block_samples=DEFAULT_BLOCK_SAMPLES, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        log_dir = os.path.dirname(path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        self.path = path
+        self.block_samples = block_samples
+        self.flush_interval = flush_interval
+        self._file = open(path, "ab")
+        size = self._file.tell()
+        if size < len(SAMPLE_LOG_MAGIC):
+            self._file.truncate(0) # File mới, hoặc header chưa ghi xong
+            self._file.write(SAMPLE_LOG_MAGIC)
+        else:
+            # Bỏ block cuối ghi dở (ví dụ do mất điện) để block mới nối ngay sau block hoàn chỉnh
+            end = len(SAMPLE_LOG_MAGIC)
+            for block in SampleLogReader(path)._blocks():
+                end = block[7] + block[8]
+            if end < size:
+                self._file.truncate(end)
+        self._pending = {} # tên chỉ số -> (array thời điểm, array giá trị)
+        self._last_flush = time.monotonic()
+        self.blocks_written = 0
+
+    def append(self, metric, value, timestamp=None):
+        """Thêm một mẫu. timestamp mặc định là time.time()."""
+        columns = self._pending.get(metric)
+        if columns is None:
+            columns = self._pending[metric] = (array("d"), array("d"))
+        columns[0].append(time.time() if timestamp is None else timestamp)
+        columns[1].append(value)
+        if len(columns[0]) >= self.block_samples:
+            self._write_block(metric)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _write_block(self, metric):
+        times, values = self._pending.pop(metric)
+        if not times:
+            return
+        payload = zlib.compress(times.tobytes() + values.tobytes(), COMPRESSION_LEVEL)
+        name = metric.encode("utf-8")
+        self._file.write(BLOCK_HEADER.pack(BLOCK_MAGIC, len(name), len(times), len(payload), zlib.crc32(payload),
+                                           times[0], times[-1], min(values), max(values), math.fsum(values)))
+        self._file.write(name)
+        self._file.write(payload)
+        self.blocks_written += 1
+
+    def flush(self):
+        """Ghi mọi mẫu đang gom thành block và đẩy xuống file."""
+        for metric in list(self._pending):
+            self._write_block(metric)
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SampleLogReader:
+    """Đọc log do SampleLogWriter tạo ra. Block cuối bị ghi dở (ví dụ do mất điện) được bỏ qua."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _blocks(self):
+        """
+        Duyệt header các block mà không giải nén.
+
+        Yields:
+            tuple: (metric, count, t_first, t_last, v_min, v_max, v_sum, payload_offset, payload_len, crc)
+        """
+        with open(self.path, "rb") as f:
+            if f.read(len(SAMPLE_LOG_MAGIC)) != SAMPLE_LOG_MAGIC:
+                raise ValueError(f"'{self.path}' không phải file log mẫu")
+            while True:
+                header = f.read(BLOCK_HEADER.size)
+                if len(header) < BLOCK_HEADER.size:
+                    return
+                magic, name_len, count, payload_len, crc, t_first, t_last, v_min, v_max, v_sum = BLOCK_HEADER.unpack(header)
+                if magic != BLOCK_MAGIC:
+                    return
+                name = f.read(name_len)
+                offset = f.tell()
+                f.seek(payload_len, os.SEEK_CUR)
+                if f.tell() > os.fstat(f.fileno()).st_size:
+                    return # Block cuối chưa ghi xong
+                yield (name.decode("utf-8", errors="replace"), count, t_first, t_last,
+                       v_min, v_max, v_sum, offset, payload_len, crc)
+
+    def _decode(self, f, count, offset, payload_len, crc):
+        f.seek(offset)
+        payload = f.read(payload_len)
+        if zlib.crc32(payload) != crc:
+            return None, None
+        data = zlib.decompress(payload)
+        times, values = array("d"), array("d")
+        times.frombytes(data[:count * times.itemsize])
+        values.frombytes(data[count * times.itemsize:])
+        return times, values
+
+    def metrics(self):
+        """Danh sách tên chỉ số có trong log."""
+        return sorted({block[0] for block in self._blocks()})
+
+    def series(self, metric, start=None, end=None):
+        """
+        Toàn bộ mẫu của một chỉ số trong [start, end] (theo time.time()).
+
+        Returns:
+            tuple: (array thời điểm, array giá trị) theo thứ tự ghi.
+        """
+        all_times, all_values = array("d"), array("d")
+        with open(self.path, "rb") as f:
+            for name, count, t_first, t_last, _, _, _, offset, payload_len, crc in self._blocks():
+                if name != metric or (start is not None and t_last < start) or (end is not None and t_first > end):
+                    continue
+                times, values = self._decode(f, count, offset, payload_len, crc)
+                if times is None:
+                    continue
+                if (start is None or t_first >= start) and (end is None or t_last <= end):
+                    all_times.extend(times)
+                    all_values.extend(values)
+                else:
+                    for t, v in zip(times, values):
+                        if (start is None or t >= start) and (end is None or t <= end):
+                            all_times.append(t)
+                            all_values.append(v)
+        return all_times, all_values
+
+    def replay(self, metrics=None, start=None, end=None):
+        """
+        Phát lại mẫu theo thứ tự thời gian trên mọi chỉ số (hoặc các chỉ số được chọn).
+
+        Yields:
+            tuple: (timestamp, metric, value)
+        """
+        streams = [zip(times, itertools.repeat(metric), values)
+                   for metric in (metrics or self.metrics())
+                   for times, values in [self.series(metric, start, end)]]
+        return heapq.merge(*streams)
+
+    def aggregate(self, metrics=None, start=None, end=None):
+        """
+        Thống kê count/min/max/mean của từng chỉ số trong [start, end].
+
+        Block nằm trọn trong khoảng dùng thống kê sẵn trong header; chỉ block ở biên
+        mới phải giải nén.
+
+        Returns:
+            dict: {metric: {"count", "min", "max", "mean", "first", "last"}}
+        """
+        wanted = set(metrics) if metrics else None
+        result = {}
+        with open(self.path, "rb") as f:
+            for name, count, t_first, t_last, v_min, v_max, v_sum, offset, payload_len, crc in self._blocks():
+                if (wanted is not None and name not in wanted) or \
+                        (start is not None and t_last < start) or (end is not None and t_first > end):
+                    continue
+                if not ((start is None or t_first >= start) and (end is None or t_last <= end)):
+                    times, values = self._decode(f, count, offset, payload_len, crc)
+                    if times is None:
+                        continue
+                    selected = [(t, v) for t, v in zip(times, values)
+                                if (start is None or t >= start) and (end is None or t <= end)]
+                    if not selected:
+                        continue
+                    count = len(selected)
+                    t_first, t_last = selected[0][0], selected[-1][0]
+                    values = [v for _, v in selected]
+                    v_min, v_max, v_sum = min(values), max(values), math.fsum(values)
+                stats = result.get(name)
+                if stats is None:
+                    result[name] = {"count": count, "min": v_min, "max": v_max, "sum": v_sum,
+                                    "first": t_first, "last": t_last}
+                else:
+                    stats["count"] += count
+                    stats["min"] = min(stats["min"], v_min)
+                    stats["max"] = max(stats["max"], v_max)
+                    stats["sum"] += v_sum
+                    stats["first"] = min(stats["first"], t_first)
+                    stats["last"] = max(stats["last"], t_last)
+        for stats in result.values():
+            stats["mean"] = stats.pop("sum") / stats["count"]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đọc, tổng hợp hoặc phát lại log mẫu nhị phân của các công cụ giám sát.")
+    parser.add_argument("path", help="File log mẫu (--sample-log của check_cpu/check_ram/check_disk).")
+    parser.add_argument("--metric", nargs='+', help="Chỉ xử lý các chỉ số này (mặc định: tất cả).")
+    parser.add_argument("--since", type=float, help="Chỉ lấy mẫu trong N giây gần nhất.")
+    parser.add_argument("--replay", action="store_true", help="In từng mẫu theo thứ tự thời gian thay vì bảng tổng hợp.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"Lỗi: Không tìm thấy file '{args.path}'.", file=sys.stderr)
+        sys.exit(1)
+    reader = SampleLogReader(args.path)
+    start = time.time() - args.since if args.since else None
+    try:
+        if args.replay:
+            for timestamp, metric, value in reader.replay(args.metric, start):
+                print(f"{datetime.datetime.fromtimestamp(timestamp):%Y-%m-%d %H:%M:%S} {metric} {value:.2f}")
+            return
+        began = time.perf_counter()
+        stats = reader.aggregate(args.metric, start)
+        elapsed = time.perf_counter() - began
+    except ValueError as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if not stats:
+        print("Không có mẫu nào trong khoảng đã chọn.")
+        return
+    print(f"{'Chỉ số':<30} {'Số mẫu':>10} {'Min':>12} {'TB':>12} {'Max':>12}  Khoảng thời gian")
+    for metric in sorted(stats):
+        s = stats[metric]
+        print(f"{metric:<30} {s['count']:>10} {s['min']:>12.2f} {s['mean']:>12.2f} {s['max']:>12.2f}  "
+              f"{datetime.datetime.fromtimestamp(s['first']):%Y-%m-%d %H:%M} -> {datetime.datetime.fromtimestamp(s['last']):%Y-%m-%d %H:%M}")
+    print(f"Tổng hợp trong {elapsed * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Lưu lịch sử mẫu giám sát trong bộ đệm vòng kích thước cố định.
+
+Mỗi chỉ số (metric) có một RingBuffer gồm hai cột float64 (thời điểm, giá trị) đặt trong
+array hoặc trong file ánh xạ bộ nhớ (mmap): 16 byte mỗi mẫu, ghi O(1), không tạo đối
+tượng Python cho từng mẫu. Một tuần mẫu 1 giây của một chỉ số chỉ tốn khoảng 9.7MB.
+Các truy vấn min/max/trung bình/phân vị trên cửa sổ trượt dùng NumPy nếu có cài đặt.
+"""
+
+import math
+import mmap
+import os
+import re
+import struct
+import time
+from array import array
+
+from sample_log import SampleLogWriter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None # Không bắt buộc: dùng Python thuần nếu không có NumPy
+
+DEFAULT_CAPACITY = 7 * 24 * 3600 # Một tuần mẫu 1 giây
+DEFAULT_PERCENTILES = (50, 95, 99)
+RING_FILE_SUFFIX = ".ring"
+# Header file: magic, dung lượng, số mẫu hiện có, vị trí ghi tiếp theo
+RING_HEADER = struct.Struct("=8sQQQ")
+RING_MAGIC = b"SMRING1\0"
+ITEM_SIZE = array("d").itemsize
+
+
+def _percentile(sorted_values, percent):
+    """Phân vị (nội suy tuyến tính, giống numpy.percentile mặc định) trên danh sách đã sắp xếp."""
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class RingBuffer:
+    """
+    Bộ đệm vòng (thời điểm, giá trị) với dung lượng cố định.
+
+    Khi đầy, mẫu mới ghi đè mẫu cũ nhất. Thời điểm được giả định tăng dần theo thứ tự ghi,
+    nhờ đó cửa sổ "N giây gần nhất" được tìm bằng tìm kiếm nhị phân.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, path=None):
+        """
+        Args:
+            capacity (int): Số mẫu tối đa giữ lại.
+            path (str, optional): File mmap để lưu bền vững. File đã có với cùng dung lượng
+                                  được mở lại và tiếp tục ghi; khác dung lượng thì báo ValueError.
+        """
+        if capacity <= 0:
+            raise ValueError("capacity phải lớn hơn 0")
+        self.capacity = capacity
+        self.path = path
+        self._mmap = None
+        self.count = 0
+        self.head = 0 # Vị trí sẽ ghi mẫu tiếp theo
+
+        if path is None:
+            self._times = memoryview(array("d", bytes(capacity * ITEM_SIZE)))
+            self._values = memoryview(array("d", bytes(capacity * ITEM_SIZE)))
+            return
+
+        size = RING_HEADER.size + 2 * capacity * ITEM_SIZE
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            existing = os.fstat(fd).st_size
+            if existing == 0:
+                os.ftruncate(fd, size)
+            elif existing != size:
+                raise ValueError(f"File lịch sử '{path}' có dung lượng khác ({existing} byte, cần {size} byte)")
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, stored_capacity, count, head = RING_HEADER.unpack_from(self._mmap, 0)
+        if magic == RING_MAGIC and stored_capacity == capacity:
+            self.count, self.head = count, head
+        else:
+            RING_HEADER.pack_into(self._mmap, 0, RING_MAGIC, capacity, 0, 0)
+        view = memoryview(self._mmap)
+        data_start = RING_HEADER.size
+        self._times = view[data_start:data_start + capacity * ITEM_SIZE].cast("d")
+        self._values = view[data_start + capacity * ITEM_SIZE:].cast("d")
+        view.release()
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value, timestamp=None):
+        """Thêm một mẫu (O(1)). timestamp mặc định là time.time()."""
+        self._times[self.head] = time.time() if timestamp is None else timestamp
+        self._values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        if self._mmap is not None:
+            RING_HEADER.pack_into(self._mmap, 0, RING_MAGIC, self.capacity, self.count, self.head)
+
+    def _physical(self, logical):
+        """Chỉ số vật lý của mẫu thứ `logical` (0 = cũ nhất)."""
+        return (self.head - self.count + logical) % self.capacity
+
+    def _window_start(self, seconds, now):
+        """Chỉ số logic của mẫu đầu tiên có thời điểm >= now - seconds (tìm kiếm nhị phân)."""
+        if seconds is None:
+            return 0
+        cutoff = now - seconds
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self._times[self._physical(mid)] < cutoff:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def _slices(self, start):
+        """Các đoạn vật lý liên tục [(a, b), ...] chứa mẫu từ chỉ số logic start đến mới nhất."""
+        n = self.count - start
+        if n <= 0:
+            return []
+        first = self._physical(start)
+        if first + n <= self.capacity:
+            return [(first, first + n)]
+        return [(first, self.capacity), (0, first + n - self.capacity)]
+
+    def window(self, seconds=None, now=None):
+        """
+        Giá trị trong `seconds` giây gần nhất (None = toàn bộ), theo thứ tự thời gian.
+
+        Returns:
+            numpy.ndarray nếu có NumPy, ngược lại list.
+        """
+        start = self._window_start(seconds, time.time() if now is None else now)
+        slices = self._slices(start)
+        if np is not None:
+            # Luôn trả về bản sao: view trên vùng mmap sẽ chặn close() (BufferError)
+            if not slices:
+                return np.empty(0, dtype=np.float64)
+            values = np.frombuffer(self._values, dtype=np.float64)
+            return np.concatenate([values[a:b] for a, b in slices])
+        result = []
+        for a, b in slices:
+            result.extend(self._values[a:b])
+        return result
+
+    def latest(self):
+        """(thời điểm, giá trị) của mẫu mới nhất, hoặc None nếu chưa có mẫu."""
+        if not self.count:
+            return None
+        index = (self.head - 1) % self.capacity
+        return self._times[index], self._values[index]
+
+    def stats(self, seconds=None, percentiles=DEFAULT_PERCENTILES, now=None):
+        """
+        Thống kê trên cửa sổ trượt.
+
+        Returns:
+            dict: {"count", "min", "max", "mean", "p50", ...} hoặc None nếu cửa sổ rỗng.
+        """
+        values = self.window(seconds, now)
+        if len(values) == 0:
+            return None
+        if np is not None:
+            result = {"count": len(values), "min": float(values.min()), "max": float(values.max()),
+                      "mean": float(values.mean())}
+            if percentiles:
+                for p, v in zip(percentiles, np.percentile(values, percentiles)):
+                    result[f"p{p}"] = float(v)
+            return result
+        result = {"count": len(values), "min": min(values), "max": max(values),
+                  "mean": math.fsum(values) / len(values)}
+        if percentiles:
+            ordered = sorted(values)
+            for p in percentiles:
+                result[f"p{p}"] = _percentile(ordered, p)
+        return result
+
+    def close(self):
+        if self._mmap is not None:
+            self._times.release()
+            self._values.release()
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+
+
+class SampleStore:
+    """
+    Tập các RingBuffer, mỗi chỉ số một bộ đệm, tạo khi ghi mẫu đầu tiên.
+
+    Ví dụ:
+        with SampleStore("/var/lib/itsupport/history") as store:
+            store.record("cpu", 12.5)
+            print(store.stats("cpu", seconds=3600))
+    """
+
+    def __init__(self, directory=None, capacity=DEFAULT_CAPACITY, log=None):
+        """
+        Args:
+            directory (str, optional): Thư mục chứa các file mmap ("<metric>.ring"). None = chỉ trong RAM.
+            capacity (int): Số mẫu tối đa của mỗi chỉ số.
+            log (SampleLogWriter, optional): Ghi thêm mọi mẫu vào log nhị phân (sample_log) để lưu lâu dài.
+        """
+        self.directory = directory
+        self.capacity = capacity
+        self.log = log
+        self._series = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def series(self, name):
+        """RingBuffer của chỉ số `name` (tạo mới nếu chưa có)."""
+        ring = self._series.get(name)
+        if ring is None:
+            path = None
+            if self.directory:
+                # Tên chỉ số có thể chứa '/' (mountpoint): thay bằng ký tự an toàn cho tên file
+                path = os.path.join(self.directory, re.sub(r"[^\w.-]", "_", name) + RING_FILE_SUFFIX)
+            ring = self._series[name] = RingBuffer(self.capacity, path)
+        return ring
+
+    def record(self, name, value, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.series(name).append(value, timestamp)
+        if self.log is not None:
+            self.log.append(name, value, timestamp)
+
+    def names(self):
+        return list(self._series)
+
+    def stats(self, name, seconds=None, percentiles=DEFAULT_PERCENTILES):
+        ring = self._series.get(name)
+        return ring.stats(seconds, percentiles) if ring else None
+
+    def close(self):
+        for ring in self._series.values():
+            ring.close()
+        if self.log is not None:
+            self.log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_history(directory=None, duration=None, interval=1, sample_log=None):
+    """
+    Tạo SampleStore cho một vòng giám sát.
+
+    Không có thư mục: chỉ giữ đủ mẫu cho lần chạy này (duration / interval). Có thư mục:
+    dùng dung lượng mặc định để lịch sử nhiều ngày được giữ lại giữa các lần chạy.
+    sample_log là đường dẫn log mẫu nhị phân (xem sample_log.py) nếu muốn ghi thêm.
+    """
+    log = SampleLogWriter(sample_log) if sample_log else None
+    if directory:
+        return SampleStore(directory, DEFAULT_CAPACITY, log)
+    if duration:
+        return SampleStore(None, min(DEFAULT_CAPACITY, int(duration / interval) + 2), log)
+    return SampleStore(None, DEFAULT_CAPACITY, log)
+
+
+def format_stats(stats, formatter=lambda v: f"{v:.1f}"):
+    """Chuỗi tóm tắt thống kê, ví dụ "TB 12.3, min 1.0, max 50.0, p95 40.0 (12 mẫu)"."""
+    if not stats:
+        return "chưa có mẫu"
+    parts = [f"TB {formatter(stats['mean'])}", f"min {formatter(stats['min'])}", f"max {formatter(stats['max'])}"]
+    parts += [f"{key} {formatter(value)}" for key, value in stats.items() if key.startswith("p")]
+    return ", ".join(parts) + f" ({stats['count']} mẫu)"
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Bộ lập lịch tick cố định dùng chung cho các vòng lặp giám sát.
+
+Dựa trên time.monotonic nên không bị trôi hoặc chạy dồn khi đồng hồ hệ thống bị chỉnh.
+Tick được đặt theo mốc cố định (start + k * interval) thay vì "ngủ interval giây sau
+mỗi lần lấy mẫu", vì vậy thời gian xử lý mỗi vòng không làm lệch dần chu kỳ.
+"""
+
+import random
+import time
+from collections import namedtuple
+
+# index: số thứ tự tick; scheduled: mốc monotonic dự kiến; lag: trễ so với mốc (giây);
+# missed: số tick bị bỏ qua ngay trước tick này do vòng lặp chạy chậm hơn chu kỳ
+Tick = namedtuple("Tick", ["index", "scheduled", "lag", "missed"])
+
+
+class FixedRateScheduler:
+    """
+    Sinh các tick theo chu kỳ cố định.
+
+    Ví dụ:
+        scheduler = FixedRateScheduler(interval=5, duration=60, jitter=1)
+        for tick in scheduler:
+            ...lấy mẫu...
+        print(scheduler.summary())
+
+    Nếu một lần xử lý kéo dài quá một chu kỳ, các tick đã lỡ không bị chạy dồn mà được
+    bỏ qua và đếm vào missed_ticks; tick kế tiếp vẫn bám theo lưới mốc ban đầu.
+    """
+
+    def __init__(self, interval, duration=None, jitter=0.0, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            interval (float): Chu kỳ giữa hai tick (giây), phải > 0.
+            duration (float, optional): Tổng thời gian chạy (giây). None = chạy vô hạn.
+            jitter (float): Độ lệch pha ngẫu nhiên tối đa (giây) cho tick đầu tiên, để nhiều
+                            máy chạy cùng cấu hình không lấy mẫu đúng cùng một thời điểm.
+            clock (callable): Nguồn thời gian đơn điệu (mặc định time.monotonic).
+            sleep (callable): Hàm ngủ (mặc định time.sleep).
+        """
+        if interval <= 0:
+            raise ValueError("interval phải lớn hơn 0")
+        self.interval = interval
+        self.duration = duration
+        self.jitter = max(0.0, jitter)
+        self._clock = clock
+        self._sleep = sleep
+        self.ticks = 0
+        self.missed_ticks = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+
+    @property
+    def mean_lag(self):
+        """Độ trễ lịch trung bình (giây) của các tick đã chạy."""
+        return self._total_lag / self.ticks if self.ticks else 0.0
+
+    def __iter__(self):
+        start = self._clock()
+        end_time = start + self.duration if self.duration is not None else None
+        next_time = start + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        index = 0
+        missed = 0
+        while end_time is None or next_time < end_time:
+            now = self._clock()
+            if now < next_time:
+                self._sleep(next_time - now)
+                now = self._clock()
+
+            lag = max(0.0, now - next_time)
+            self.ticks += 1
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._total_lag += lag
+            yield Tick(index, next_time, lag, missed)
+
+            index += 1
+            next_time += self.interval
+            # Đã trễ qua một hoặc nhiều mốc: bỏ qua chúng, chỉ chạy mốc gần nhất
+            overdue = self._clock() - next_time
+            missed = int(overdue // self.interval) if overdue >= self.interval else 0
+            if missed:
+                self.missed_ticks += missed
+                index += missed
+                next_time += missed * self.interval
+
+    def summary(self):
+        """Chuỗi tóm tắt tình trạng lập lịch (số tick, tick bị lỡ, độ trễ)."""
+        return (f"Số tick: {self.ticks}, bỏ lỡ: {self.missed_ticks}, "
+                f"độ trễ lịch trung bình: {self.mean_lag * 1000:.1f}ms, tối đa: {self.max_lag * 1000:.1f}ms")
@@ -0,0 +1,38 @@
+import socket
+
+import pytest
+
+pytest.importorskip("psutil")
+
+from check_network import scan_ports
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+@pytest.fixture
+def closed_port():
+    # Cổng vừa được cấp rồi đóng ngay, không có ai lắng nghe
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_scan_reports_open_port_once(listener, closed_port):
+    # Ba target chồng lấn cùng trỏ tới 127.0.0.1, cổng mở bị lặp lại
+    results = scan_ports(["127.0.0.1", "127.0.0.1/32", "127.0.0.0/30"],
+                         [listener, closed_port, listener], timeout=1.0)
+    assert list(results) == ["127.0.0.1"]
+    assert [port for port, _ in results["127.0.0.1"]] == [listener]
+
+
+def test_scan_closed_port_only(closed_port):
+    assert scan_ports(["127.0.0.1"], [closed_port], timeout=1.0) == {}
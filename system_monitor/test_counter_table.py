@@ -0,0 +1,30 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from counter_table import CounterTable
+
+
+def test_delta_wrap_and_reset():
+    table = CounterTable(("rx", "tx"), wrap_bits=32)
+    table.update({"eth0": (2 ** 32 - 10, 100), "eth1": (5, 5)})
+    names, delta, valid = table.update({"eth0": (5, 40), "eth1": (7, 9)})
+    rows = {name: row for row, name in enumerate(names)}
+    assert valid.all()
+    assert delta[rows["eth0"]].tolist() == [15, 40] # tràn 32-bit, rồi reset
+    assert delta[rows["eth1"]].tolist() == [2, 4]
+
+
+def test_churned_devices_are_compacted():
+    table = CounterTable(("rx", "tx"))
+    table.update({"eth0": (0, 0)})
+    for i in range(1000):
+        names, delta, valid = table.update({"eth0": (i + 1, i + 1), f"veth{i}": (0, 0)})
+        assert len(names) <= 4
+        assert table.current.shape == (len(names), 2)
+        assert delta[names.index("eth0")].tolist() == [1, 1]
+        assert valid[names.index("eth0")]
+        assert not valid[names.index(f"veth{i}")]
+    names, delta, valid = table.update({"eth0": (1001, 1001), "veth999": (3, 3)})
+    assert delta[names.index("veth999")].tolist() == [3, 3]
+    assert valid.all()
@@ -0,0 +1,75 @@
+import threading
+import urllib.error
+import urllib.request
+from http.server import HTTPServer
+
+import pytest
+
+pytest.importorskip("psutil")
+
+from collector import MetricsCollector, run_collector
+from exporter import MetricsCache, make_handler
+
+
+@pytest.fixture
+def serve_cache():
+    servers = []
+
+    def start(cache, worker=None):
+        server = HTTPServer(("127.0.0.1", 0), make_handler(cache, worker))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode("utf-8")
+
+
+def test_metrics_served_over_http(serve_cache):
+    collector = MetricsCollector(verbose=False)
+    collector.collect_cpu()
+    collector.collect_ram()
+    cache = MetricsCache(collector)
+    cache.update(["cpu", "ram"])
+    base = serve_cache(cache)
+
+    status, body = _get(base + "/metrics?format=text")
+    assert status == 200
+    assert "# TYPE itsupport_cpu_usage_percent gauge" in body
+    assert "itsupport_ram_usage_percent " in body
+    assert 'itsupport_collector_last_success_timestamp_seconds{family="cpu"}' in body
+    assert "itsupport_exporter_last_render_timestamp_seconds" in body
+    assert _get(base + "/?x")[0] == 200
+    assert _get(base + "/missing")[0] == 404
+
+
+def test_dead_collector_fails_scrape(serve_cache):
+    cache = MetricsCache(MetricsCollector(verbose=False))
+    cache.update([])
+    worker = threading.Thread(target=lambda: None)
+    worker.start()
+    worker.join()
+    status, body = _get(serve_cache(cache, worker) + "/metrics")
+    assert status == 503
+
+
+def test_on_tick_error_does_not_stop_collector():
+    collector = MetricsCollector(verbose=False)
+    ticks = []
+
+    def failing_on_tick(families):
+        ticks.append(families)
+        raise ValueError("render failed")
+
+    run_collector(collector, {"cpu": 1}, duration=2, on_tick=failing_on_tick)
+    assert len(ticks) == 2